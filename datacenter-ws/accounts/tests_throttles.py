@@ -9,6 +9,7 @@ from accounts.throttles import (
     PortTrainingThrottle,
     PortCorrectionThrottle,
     PortAnalysisThrottle,
+    PortBatchAnalysisThrottle,
     PortClickAnalysisThrottle,
     ModelTrainingStatusThrottle,
 )
@@ -44,6 +45,12 @@ class ThrottleTestCase(TestCase):
         self.assertEqual(throttle.scope, 'port_analysis')
         self.assertEqual(throttle.rate, '100/h')
 
+    def test_port_batch_analysis_throttle_scope(self):
+        """Verify PortBatchAnalysisThrottle has correct scope and rate."""
+        throttle = PortBatchAnalysisThrottle()
+        self.assertEqual(throttle.scope, 'port_batch_analysis')
+        self.assertEqual(throttle.rate, '20/h')
+
     def test_port_click_analysis_throttle_scope(self):
         """Verify PortClickAnalysisThrottle has correct scope and rate."""
         throttle = PortClickAnalysisThrottle()
@@ -73,6 +80,7 @@ class ThrottleTestCase(TestCase):
             PortTrainingThrottle(),
             PortCorrectionThrottle(),
             PortAnalysisThrottle(),
+            PortBatchAnalysisThrottle(),
             PortClickAnalysisThrottle(),
             ModelTrainingStatusThrottle(),
         ]
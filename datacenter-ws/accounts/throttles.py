@@ -57,10 +57,36 @@ class PortAnalysisThrottle(UserRateThrottle):
     - Attacker pattern: 1000+ inferences/minute on single GPU/CPU
     - Threshold: 100/hour allows normal usage
     - If user needs more: can batch-analyze via management command
+    - Repeat analyses served from the result cache, and panels matching an
+      already mapped layout, cost no inference and are not counted (the
+      view exposes ``is_cached_analysis(request)``)
     """
     scope = 'port_analysis'
     rate = '100/h'
 
+    def allow_request(self, request, view):
+        is_cached = getattr(view, 'is_cached_analysis', None)
+        if is_cached is not None and is_cached(request):
+            return True
+        return super().allow_request(request, view)
+
+
+class PortBatchAnalysisThrottle(UserRateThrottle):
+    """
+    Rate limit for batched port analysis (many images per request).
+
+    - Authenticated users: 20 batches/hour
+    - Anonymous users: blocked (requires IsAuthenticated)
+
+    Rationale:
+    - Normal workflow: vendor onboarding submits front + rear images for a
+      handful of models at a time (≤ PORT_BATCH_MAX_IMAGES per batch)
+    - Each batch is far heavier than a single analysis, so the hourly budget
+      is lower than PortAnalysisThrottle's
+    """
+    scope = 'port_batch_analysis'
+    rate = '20/h'
+
 
 class PortClickAnalysisThrottle(UserRateThrottle):
     """
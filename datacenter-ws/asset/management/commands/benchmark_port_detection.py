@@ -0,0 +1,239 @@
+"""
+Management command: benchmark_port_detection
+
+Measures the cost of feeding a panel photo to YOLO through a temporary
+JPEG (decode → preprocess → encode q95 → write → decode → unlink, the
+pre-in-memory pipeline) versus passing the preprocessed array straight to
+``model.predict``, and versus downsampling to the inference size before
+enhancement (the current pipeline, ``prepare_for_inference``).
+
+Without ``--image`` a synthetic 4000-px panel photo is generated so the
+numbers are comparable across machines.
+
+``--compare-backends`` instead compares the ``.pt`` weights with their
+exported ONNX / OpenVINO artefacts (``PORT_YOLO_BACKEND``) on the training
+validation split: per-image latency, detections per image, and mAP50 /
+mAP50-95 from ``model.val``.
+
+Usage:
+    python manage.py benchmark_port_detection
+    python manage.py benchmark_port_detection --image components/switch.jpg
+    python manage.py benchmark_port_detection --width 6000 --repeat 20 --predict
+    python manage.py benchmark_port_detection --compare-backends --limit 50
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.port_detection.preprocessing import (
+    prepare_for_inference,
+    preprocess_for_inference,
+)
+from catalog.port_detection.security import get_media_root, resolve_safe_path
+
+
+def _synthetic_panel(width: int):
+    """A grey 48-port (2 × 24) panel with dark port cavities and sensor noise."""
+    import cv2
+    import numpy as np
+
+    height = max(64, width // 4)
+    rng = np.random.default_rng(0)
+    img = np.full((height, width, 3), 170, dtype=np.uint8)
+    pitch = width / 26
+    pw, ph = int(pitch * 0.7), int(height * 0.22)
+    for row in range(2):
+        y = int(height * (0.22 + row * 0.38))
+        for col in range(24):
+            x = int(pitch * (1 + col))
+            cv2.rectangle(img, (x, y), (x + pw, y + ph), (35, 35, 35), -1)
+    noise = rng.normal(0, 6, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def _summary(samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return (f'media {statistics.mean(samples):8.1f} ms   '
+            f'p95 {p95:8.1f} ms')
+
+
+class Command(BaseCommand):
+    help = 'Confronta la latenza dell\'input YOLO via JPEG temporaneo e in memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--image', type=str, default=None,
+            help='Immagine relativa a MEDIA_ROOT (default: pannello sintetico)',
+        )
+        parser.add_argument('--width', type=int, default=4000,
+                            help='Larghezza del pannello sintetico in px')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--predict', action='store_true',
+            help='Include anche model.predict (richiede port-yolo.pt)',
+        )
+        parser.add_argument(
+            '--compare-backends', action='store_true',
+            help='Confronta .pt e artefatti esportati (ONNX/OpenVINO) sullo split di validazione',
+        )
+        parser.add_argument('--limit', type=int, default=0,
+                            help='Numero massimo di immagini di validazione (0 = tutte)')
+
+    def handle(self, *args, **options):
+        try:
+            import cv2
+        except ImportError:
+            raise CommandError('opencv-python non installato')
+
+        if options['compare_backends']:
+            self._compare_backends(options['limit'])
+            return
+
+        cleanup = None
+        if options['image']:
+            src = resolve_safe_path(options['image'])
+            if src is None or not os.path.isfile(src):
+                raise CommandError(f'Immagine non valida: {options["image"]}')
+        else:
+            tmp = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+            tmp.close()
+            cv2.imwrite(tmp.name, _synthetic_panel(options['width']),
+                        [cv2.IMWRITE_JPEG_QUALITY, 92])
+            src = cleanup = tmp.name
+
+        model = None
+        if options['predict']:
+            from catalog.port_detection.model_cache import get_yolo_model
+            model = get_yolo_model()
+            if model is None:
+                raise CommandError('port-yolo.pt non trovato: esegui il training')
+
+        try:
+            self._run(src, options['repeat'], model)
+        finally:
+            if cleanup:
+                os.remove(cleanup)
+
+    def _run(self, src: str, repeat: int, model) -> None:
+        import cv2
+
+        probe = cv2.imread(src)
+        if probe is None:
+            raise CommandError(f'Impossibile decodificare {src}')
+        h, w = probe.shape[:2]
+        self.stdout.write(f'Immagine: {w}×{h} px, {os.path.getsize(src) / 1e6:.1f} MB')
+
+        def _predict(source):
+            if model is not None:
+                model.predict(source, verbose=False, conf=0.25, iou=0.30,
+                              agnostic_nms=True, imgsz=1280, max_det=512)
+
+        legacy, in_memory, downsampled, written = [], [], [], []
+        for _ in range(repeat):
+            # ── Temporary JPEG round-trip ────────────────────────────────────
+            t0 = time.perf_counter()
+            enhanced = preprocess_for_inference(cv2.imread(src))
+            tmp = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+            tmp.close()
+            cv2.imwrite(tmp.name, enhanced, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            written.append(os.path.getsize(tmp.name))
+            if model is not None:
+                _predict(tmp.name)
+            else:
+                # What ultralytics does with a path source.
+                cv2.imread(tmp.name)
+            os.remove(tmp.name)
+            legacy.append((time.perf_counter() - t0) * 1000)
+
+            # ── In-memory array ──────────────────────────────────────────────
+            t0 = time.perf_counter()
+            enhanced = preprocess_for_inference(cv2.imread(src))
+            _predict(enhanced)
+            in_memory.append((time.perf_counter() - t0) * 1000)
+
+            # ── Downsample to imgsz, then enhance ───────────────────────────
+            t0 = time.perf_counter()
+            enhanced, _ = prepare_for_inference(cv2.imread(src), 1280)
+            _predict(enhanced)
+            downsampled.append((time.perf_counter() - t0) * 1000)
+
+        scope = 'con predict' if model is not None else 'solo I/O'
+        saved = statistics.mean(legacy) - statistics.mean(in_memory)
+        self.stdout.write(
+            f'\nRipetizioni: {repeat} ({scope})\n'
+            f'  JPEG temporaneo: {_summary(legacy)}\n'
+            f'  In memoria:      {_summary(in_memory)}\n'
+            f'  Ridotta prima:   {_summary(downsampled)}\n'
+            f'  Risparmio:       {saved:8.1f} ms/analisi, '
+            f'{statistics.mean(written) / 1e6:.1f} MB scritti e riletti in meno'
+        )
+
+    def _compare_backends(self, limit: int) -> None:
+        from catalog.port_detection.batch_detector import (
+            _PREDICT_KWARGS,
+            _extract_yolo_detections,
+            _prepare_yolo_source,
+        )
+        from catalog.port_detection.constants import YOLO_ID_TO_TYPE
+        from catalog.port_detection.model_cache import (
+            BACKENDS,
+            default_model_path,
+            load_uncached,
+        )
+        from catalog.port_detection.training_state import write_data_yaml
+
+        model_path = default_model_path()
+        if not os.path.isfile(model_path):
+            raise CommandError('port-yolo.pt non trovato: esegui il training')
+
+        training_dir = os.path.join(get_media_root(), 'training')
+        data_yaml = write_data_yaml(training_dir)
+        val_dir = os.path.join(training_dir, 'images', 'val')
+        if not os.path.isdir(val_dir) or not os.listdir(val_dir):
+            val_dir = os.path.join(training_dir, 'images', 'train')
+        images = sorted(
+            os.path.join(val_dir, f) for f in os.listdir(val_dir)
+            if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+        ) if os.path.isdir(val_dir) else []
+        if limit:
+            images = images[:limit]
+        if not images:
+            raise CommandError(f'Nessuna immagine di validazione in {val_dir}')
+        sources = [_prepare_yolo_source(p) for p in images]
+
+        rows = []
+        baseline_counts = None
+        for backend in BACKENDS:
+            model = load_uncached(model_path, backend)
+            if model is None:
+                self.stdout.write(f'{backend}: artefatto non presente, saltato')
+                continue
+
+            # Warm-up pass, not timed (graph build / session init).
+            model.predict(sources[0][0], imgsz=sources[0][1], **_PREDICT_KWARGS)
+            latencies, counts = [], []
+            for source, imgsz in sources:
+                t0 = time.perf_counter()
+                results = model.predict(source, imgsz=imgsz, **_PREDICT_KWARGS)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                counts.append(len(_extract_yolo_detections(results, YOLO_ID_TO_TYPE)))
+
+            metrics = model.val(data=data_yaml, split='val', imgsz=640, batch=1,
+                                device='cpu', plots=False, verbose=False)
+            if baseline_counts is None:
+                baseline_counts = counts
+            drift = statistics.mean(
+                abs(a - b) for a, b in zip(counts, baseline_counts))
+            rows.append((backend, _summary(latencies), metrics.box.map50,
+                         metrics.box.map, drift))
+
+        self.stdout.write(f'\nImmagini di validazione: {len(images)} ({val_dir})')
+        for backend, latency, map50, map5095, drift in rows:
+            self.stdout.write(
+                f'  {backend:<9} {latency}   mAP50 {map50:.3f}   '
+                f'mAP50-95 {map5095:.3f}   Δ rilevamenti/img vs .pt {drift:.2f}'
+            )
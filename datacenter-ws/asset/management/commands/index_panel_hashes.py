@@ -0,0 +1,42 @@
+"""
+Management command: index_panel_hashes
+
+(Re)computes the perceptual hash (``PanelHash``) of every AssetModel front /
+rear image, so PortAnalyzeView can reuse the port layout of an already
+mapped, near-identical panel.  New uploads are indexed automatically by
+``catalog.preanalyze_ports``; run this once for an existing catalog, or
+after restoring media.
+
+Usage:
+    python manage.py index_panel_hashes
+    python manage.py index_panel_hashes --missing
+"""
+from django.core.management.base import BaseCommand
+
+from catalog.models import AssetModel
+from catalog.port_detection.panel_hash import index_model
+
+
+class Command(BaseCommand):
+    help = 'Calcola gli hash percettivi delle immagini dei modelli'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Indicizza solo i modelli senza hash',
+        )
+
+    def handle(self, *args, **options):
+        models = AssetModel.objects.all()
+        if options['missing']:
+            models = models.filter(panel_hashes__isnull=True)
+
+        indexed = images = 0
+        for asset_model in models.iterator():
+            written = index_model(asset_model)
+            images += written
+            indexed += bool(written)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indicizzate {images} immagini di {indexed} modelli'
+        ))
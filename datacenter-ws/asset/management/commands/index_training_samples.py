@@ -0,0 +1,33 @@
+"""
+Management command: index_training_samples
+
+Brings the training-set manifest (``TrainingSample``) in line with the files
+under ``MEDIA_ROOT/training``: label files without a row are recorded
+(their images moved into the content-addressed store), rows whose label
+file is gone are dropped, and stored images no sample uses are deleted.
+PortAnnotateView, PortCorrectionView and ``train_port_detector`` keep the
+manifest current on their own; run this once for a dataset created before
+the manifest existed, or after copying samples in by hand.
+
+Usage:
+    python manage.py index_training_samples
+"""
+from django.core.management.base import BaseCommand
+
+from catalog.port_detection.dataset import (
+    index_existing,
+    prune_objects,
+    sample_count,
+)
+
+
+class Command(BaseCommand):
+    help = 'Allinea il manifest del dataset di training con i file su disco'
+
+    def handle(self, *args, **options):
+        added, removed = index_existing()
+        pruned = prune_objects()
+        self.stdout.write(self.style.SUCCESS(
+            f'Campioni aggiunti: {added}, rimossi: {removed}, '
+            f'totale: {sample_count()}; immagini non usate eliminate: {pruned}'
+        ))
@@ -0,0 +1,65 @@
+"""
+Management command: serve_port_inference
+
+Starts the local inference service used by PortAnalyzeView and
+PortClickAnalyzeView when ``PORT_INFERENCE_SOCKET`` is configured.
+
+Usage:
+    python manage.py serve_port_inference
+    python manage.py serve_port_inference --workers 2 --queue-size 8
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.port_detection.inference_service import (
+    InferenceServer,
+    service_address,
+)
+
+
+class Command(BaseCommand):
+    help = 'Avvia il servizio locale di inferenza YOLO/OCR per l\'analisi delle porte'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=int(getattr(settings, 'PORT_INFERENCE_WORKERS', 1)),
+            help='Processi di inferenza (ognuno tiene in memoria il modello)',
+        )
+        parser.add_argument(
+            '--queue-size', type=int,
+            default=int(getattr(settings, 'PORT_INFERENCE_QUEUE_SIZE', 4)),
+            help='Job in attesa ammessi oltre a quelli in esecuzione',
+        )
+        parser.add_argument(
+            '--timeout', type=float,
+            default=float(getattr(settings, 'PORT_INFERENCE_TIMEOUT', 30)),
+            help='Tempo massimo (s) per un singolo job',
+        )
+
+    def handle(self, *args, **options):
+        address = service_address()
+        if address is None:
+            raise CommandError(
+                'PORT_INFERENCE_SOCKET non configurato: '
+                'imposta un percorso socket Unix o host:porta.'
+            )
+        if options['workers'] < 1 or options['queue_size'] < 0:
+            raise CommandError('--workers deve essere ≥ 1 e --queue-size ≥ 0')
+
+        server = InferenceServer(
+            address,
+            workers=options['workers'],
+            queue_size=options['queue_size'],
+            job_timeout=options['timeout'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Servizio di inferenza in ascolto su {address} '
+            f'(workers={options["workers"]}, coda={options["queue_size"]})'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
@@ -8,24 +8,44 @@ Usage:
     python manage.py train_port_detector              # label generation only
     python manage.py train_port_detector --train      # generate + train
     python manage.py train_port_detector --train --epochs 100 --imgsz 640
+    python manage.py train_port_detector --workers 8 --chunk-size 16
 """
 import hashlib
 import os
-import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 
 # Shared constants — kept in sync with the detection/correction pipeline.
 from catalog.port_detection.constants import (
-    CLASS_NAMES,
     PORT_BH_BY_ID as PORT_BH,
     PORT_BW_BY_ID as PORT_BW,
     PORT_CLASS_ID,
     PORT_H_MM,
     PORT_W_MM,
 )
-from catalog.port_detection.training_state import best_device
+from catalog.port_detection.dataset import (
+    read_label,
+    sample_count,
+    sample_key,
+    sample_paths,
+    save_sample,
+    split_for,
+    store_bytes,
+    training_dir,
+)
+from catalog.port_detection.model_cache import publish_weights
+from catalog.port_detection.training_state import (
+    TRAIN_FULL,
+    best_device,
+    record_run,
+    training_metrics,
+    write_data_yaml,
+)
 
 
 # ── MPS training patch ────────────────────────────────────────────────────────
@@ -117,53 +137,105 @@ def _transform_label_r270(line: str) -> str:
     return f'{cls} {cy:.4f} {1 - cx:.4f} {bh:.4f} {bw:.4f}\n'
 
 
-def _write_augmented_rotations(
-    src_img: str,
-    label_lines: list[str],
-    train_imgs: str,
-    train_labs: str,
-    base_h: str,
-    force: bool,
-) -> int:
-    """Write 180°/90° CW/CCW rotated copies of *src_img* into the train split.
+# (suffix, cv2 rotation constant, label transform); cv2 is imported lazily.
+_ROTATIONS = (
+    ('r180', 'ROTATE_180',                 _transform_label_r180),
+    ('r090', 'ROTATE_90_CLOCKWISE',        _transform_label_r090),
+    ('r270', 'ROTATE_90_COUNTERCLOCKWISE', _transform_label_r270),
+)
 
-    Validation images are never augmented so that validation metrics reflect
-    real-world image orientation.
 
-    Returns the number of newly written pairs (skips existing ones unless
-    *force* is ``True``).
-    """
-    try:
-        import cv2
-    except ImportError:
-        return 0
+def _augmentation_input(sample) -> str:
+    """Hash of the image and label the rotated copies of *sample* come from."""
+    return hashlib.sha256(
+        f'{sample.image_sha256}:{sample.label_sha256}'.encode()
+    ).hexdigest()
 
-    img = cv2.imread(src_img)
-    if img is None:
-        return 0
 
-    rotations = [
-        ('r180', cv2.ROTATE_180,                 _transform_label_r180),
-        ('r090', cv2.ROTATE_90_CLOCKWISE,        _transform_label_r090),
-        ('r270', cv2.ROTATE_90_COUNTERCLOCKWISE, _transform_label_r270),
-    ]
+def _augment_chunk(jobs: list[tuple], root: str) -> list[tuple]:
+    """Store the rotated copies for each ``(key, image, label lines)`` job.
 
-    count = 0
-    for suffix, rot_code, transform in rotations:
-        aug_key = f'{base_h}_{suffix}'
-        dest_img = os.path.join(train_imgs, 'train', f'{aug_key}.jpg')
-        dest_lbl = os.path.join(train_labs, 'train', f'{aug_key}.txt')
+    Runs in a pool process, so it only adds images to the dataset store
+    under *root*: the parent links them into the train split and records
+    the returned ``(key, augmented key, image sha256, label lines)`` tuples
+    in the manifest, in job order.
+    """
+    import cv2
 
-        if os.path.isfile(dest_lbl) and not force:
+    written = []
+    for base_key, src_img, label_lines in jobs:
+        img = cv2.imread(src_img)
+        if img is None:
             continue
+        for suffix, rotation, transform in _ROTATIONS:
+            rotated = cv2.rotate(img, getattr(cv2, rotation))
+            ok, encoded = cv2.imencode('.jpg', rotated,
+                                       [cv2.IMWRITE_JPEG_QUALITY, 95])
+            if not ok:
+                continue
+            written.append((base_key, f'{base_key}_{suffix}',
+                            store_bytes(encoded.tobytes(), root),
+                            [transform(l) for l in label_lines]))
+    return written
+
+
+def _augment(samples, force: bool, workers: int, chunk_size: int) -> tuple[int, int]:
+    """Write 180°/90° CW/CCW rotated copies of the train *samples*.
+
+    Validation images are never augmented so that validation metrics reflect
+    real-world image orientation.
 
-        rotated = cv2.rotate(img, rot_code)
-        cv2.imwrite(dest_img, rotated, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        with open(dest_lbl, 'w') as f:
-            f.writelines(transform(l) for l in label_lines)
-        count += 1
+    Samples whose copies were made from the same image and label
+    (``source_sha256``) are skipped unless *force* is ``True``; the rest are
+    cut into chunks of *chunk_size* and spread over *workers* processes.
+    Rotation and encoding involve no randomness and results are recorded in
+    key order, so a rerun writes identical files and rows.
+
+    Returns ``(augmented, current)`` sample counts.
+    """
+    from catalog.models import TrainingSample
 
-    return count
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        return 0, 0
+
+    current = dict(
+        TrainingSample.objects
+        .filter(source=TrainingSample.Source.AUGMENTATION)
+        .values_list('key', 'source_sha256')
+    )
+    train = sorted((s for s in samples if s.split == 'train'),
+                   key=lambda s: s.key)
+    jobs, inputs = [], {}
+    for sample in train:
+        wanted = _augmentation_input(sample)
+        if not force and all(current.get(f'{sample.key}_{suffix}') == wanted
+                             for suffix, _, _ in _ROTATIONS):
+            continue
+        image_path, _ = sample_paths(sample.key, 'train')
+        jobs.append((sample.key, image_path, read_label(sample.key, 'train')))
+        inputs[sample.key] = wanted
+
+    root = training_dir()
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    if workers > 1 and len(chunks) > 1:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+        results = pool.map(_augment_chunk, chunks, repeat(root))
+    else:
+        pool = None
+        results = (_augment_chunk(chunk, root) for chunk in chunks)
+    try:
+        for written in results:
+            for base_key, aug_key, image_sha256, label_lines in written:
+                save_sample(aug_key, 'train', None, label_lines,
+                            source=TrainingSample.Source.AUGMENTATION,
+                            image_sha256=image_sha256,
+                            source_sha256=inputs[base_key])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return len(jobs), len(train) - len(jobs)
 
 
 # ── Management command ────────────────────────────────────────────────────────
@@ -186,14 +258,21 @@ class Command(BaseCommand):
             '--device', type=str, default=None,
             help='Device YOLO: cuda, mps, cpu, 0, 0,1, … (default: auto-detect)',
         )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processi per la generazione delle rotazioni (default: numero di CPU)',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=8,
+            help='Immagini per unità di lavoro dei processi di augmentation',
+        )
 
     def handle(self, *args, **options):
-        from catalog.models import AssetModelPort
+        from catalog.models import AssetModelPort, TrainingSample
 
         media_root = os.path.realpath(settings.MEDIA_ROOT)
         train_imgs = os.path.join(media_root, 'training', 'images')
         train_labs = os.path.join(media_root, 'training', 'labels')
-        data_yaml = os.path.join(media_root, 'training', 'data.yaml')
         models_dir = os.path.join(media_root, 'models')
 
         for split in ('train', 'val'):
@@ -232,6 +311,7 @@ class Command(BaseCommand):
 
         generated = 0
         skipped = 0
+        keys = set()
 
         for (img_rel, side), ports in groups.items():
             abs_img = os.path.join(media_root, img_rel)
@@ -241,15 +321,15 @@ class Command(BaseCommand):
                 ))
                 continue
 
-            # Unique hash for this (image, side) pair.
-            h = hashlib.sha256(f'{img_rel}|{side}'.encode()).hexdigest()[:16]
-            # Deterministic 80/20 split: first hex char mod 5 == 0 → val (~20 %).
-            split = 'val' if int(h[0], 16) % 5 == 0 else 'train'
-            dest_img = os.path.join(train_imgs, split, f'{h}.jpg')
-            dest_lbl = os.path.join(train_labs, split, f'{h}.txt')
+            # Unique hash for this (image, side) pair; deterministic ~80/20
+            # split, kept by the dataset manifest.
+            h = sample_key(img_rel, side)
+            split = split_for(h)
+            _, dest_lbl = sample_paths(h, split)
 
             if os.path.isfile(dest_lbl) and not options['force']:
                 skipped += 1
+                keys.add(h)
                 continue
 
             valid = [
@@ -259,62 +339,47 @@ class Command(BaseCommand):
             if not valid:
                 continue
 
-            if not os.path.isfile(dest_img):
-                shutil.copy2(abs_img, dest_img)
-
             am = valid[0][0].asset_model
             device_w = float(am.width_mm) if am.width_mm else None
             device_h = float(am.height_mm) if am.height_mm else None
 
             label_lines = []
-            with open(dest_lbl, 'w') as f:
-                for p, cls_id in valid:
-                    bw, bh = _bbox_fractions(cls_id, device_w, device_h)
-                    cx = max(bw / 2, min(1 - bw / 2, p.pos_x / 100.0))
-                    cy = max(bh / 2, min(1 - bh / 2, p.pos_y / 100.0))
-                    line = f'{cls_id} {cx:.4f} {cy:.4f} {bw:.4f} {bh:.4f}\n'
-                    f.write(line)
-                    label_lines.append(line)
+            for p, cls_id in valid:
+                bw, bh = _bbox_fractions(cls_id, device_w, device_h)
+                cx = max(bw / 2, min(1 - bw / 2, p.pos_x / 100.0))
+                cy = max(bh / 2, min(1 - bh / 2, p.pos_y / 100.0))
+                label_lines.append(f'{cls_id} {cx:.4f} {cy:.4f} {bw:.4f} {bh:.4f}\n')
+            save_sample(h, split, abs_img, label_lines,
+                        source=TrainingSample.Source.CATALOG,
+                        image_name=img_rel, side=side)
 
             generated += 1
-            _write_augmented_rotations(
-                abs_img, label_lines, train_imgs, train_labs, h, options['force']
-            )
+            keys.add(h)
 
             self.stdout.write(
                 f'  {img_rel} [{side}] → {len(valid)} porte su {len(ports)}'
             )
 
-        # Count total labelled images across all splits.
-        total_labeled = sum(
-            sum(1 for fn in os.listdir(os.path.join(train_labs, sub))
-                if fn.endswith('.txt'))
-            for sub in ('train', 'val')
-            if os.path.isdir(os.path.join(train_labs, sub))
+        # ── 3. Rotated copies of the train split ──────────────────────────────
+        samples = [
+            s for s in (TrainingSample.objects.filter(split='train')
+                        .exclude(source=TrainingSample.Source.AUGMENTATION))
+            if s.key in keys
+        ]
+        augmented, current = _augment(
+            samples, options['force'],
+            max(1, options['workers']), max(1, options['chunk_size']),
         )
 
-        # ── 3. Update data.yaml ───────────────────────────────────────────────
-        import yaml
-
-        train_img_split = os.path.join(train_imgs, 'train')
-        val_img_split = os.path.join(train_imgs, 'val')
-        # Fall back to train images when no val split exists yet.
-        if not os.path.isdir(val_img_split) or not os.listdir(val_img_split):
-            val_img_split = train_img_split
-        with open(data_yaml, 'w') as f:
-            yaml.dump(
-                {
-                    'train': train_img_split,
-                    'val':   val_img_split,
-                    'nc':    len(CLASS_NAMES),
-                    'names': CLASS_NAMES,
-                },
-                f,
-                default_flow_style=False,
-            )
+        # Count total labelled images across all splits.
+        total_labeled = sample_count()
+
+        # ── 4. Update data.yaml ───────────────────────────────────────────────
+        data_yaml = write_data_yaml(os.path.join(media_root, 'training'))
 
         self.stdout.write(self.style.SUCCESS(
             f'\nLabel generate: {generated} nuove, {skipped} già presenti\n'
+            f'Rotazioni: {augmented} immagini aumentate, {current} già aggiornate\n'
             f'Totale immagini etichettate: {total_labeled}\n'
             f'data.yaml: {data_yaml}'
         ))
@@ -326,7 +391,7 @@ class Command(BaseCommand):
             )
             return
 
-        # ── 4. Train YOLOv8 ──────────────────────────────────────────────────
+        # ── 5. Train YOLOv8 ──────────────────────────────────────────────────
         if total_labeled == 0:
             self.stdout.write(self.style.ERROR('Nessun dato per il training.'))
             return
@@ -351,8 +416,9 @@ class Command(BaseCommand):
         if device == 'mps':
             _apply_mps_training_patch()
 
+        start = time.monotonic()
         model = YOLO('yolov8n.pt')
-        model.train(
+        results = model.train(
             data=data_yaml,
             epochs=epochs,
             patience=20,          # early stopping: stop when val loss stalls
@@ -374,14 +440,29 @@ class Command(BaseCommand):
             exist_ok=True,
         )
 
+        report = {
+            'mode': TRAIN_FULL,
+            'finished_at': datetime.now(tz=timezone.utc).isoformat(),
+            'wall_s': round(time.monotonic() - start, 1),
+            'epochs': epochs,
+            **training_metrics(results, model),
+            'weights': None,
+        }
+
         # Promote the best checkpoint to port-yolo.pt
         best = os.path.join(models_dir, 'port-yolo', 'weights', 'best.pt')
         dest = os.path.join(models_dir, 'port-yolo.pt')
         if os.path.isfile(best):
-            shutil.copy2(best, dest)
+            publish_weights(best, dest)
+            report['weights'] = dest
             self.stdout.write(self.style.SUCCESS(
                 f'\nModello salvato in: {dest}'))
         else:
             self.stdout.write(self.style.WARNING(
                 f'best.pt non trovato in {best}'
             ))
+        record_run(report)
+        self.stdout.write(
+            f"Durata: {report['wall_s']} s, mAP50: {report['map50']}, "
+            f"mAP50-95: {report['map50_95']}"
+        )
@@ -7,23 +7,18 @@ class CatalogConfig(AppConfig):
     verbose_name = 'Catalog'
 
     def ready(self):
-        """Reset any stuck is_training flag left by a mid-training server restart."""
-        try:
-            import json
-            import os
-            from django.conf import settings
+        self._start_warmup()
 
-            media_root = os.path.realpath(settings.MEDIA_ROOT)
-            state_path = os.path.join(media_root, 'models', 'training_state.json')
-            if not os.path.isfile(state_path):
-                return
-            with open(state_path) as f:
-                state = json.load(f)
-            if state.get('is_training'):
-                state['is_training'] = False
-                with open(state_path, 'w') as f:
-                    json.dump(state, f, indent=2)
-        except Exception:
-            # Best-effort cleanup at startup; a corrupt/missing state file
-            # must never prevent the app from starting.
-            pass
+    @staticmethod
+    def _start_warmup():
+        """
+        Preload the detection models in the background (PORT_WARMUP), in
+        web server processes only.
+        """
+        from django.conf import settings
+
+        if getattr(settings, 'RUNNING_TESTS', False):
+            return
+        from catalog.port_detection import warmup
+        if warmup.is_enabled() and warmup.is_server_process():
+            warmup.start_background_warmup()
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.6 on 2026-10-17 04:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_portanalysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PanelHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('front', 'Front'), ('rear', 'Rear')], max_length=5)),
+                ('image_name', models.CharField(max_length=255)),
+                ('dhash', models.BigIntegerField()),
+                ('band0', models.PositiveIntegerField(db_index=True)),
+                ('band1', models.PositiveIntegerField(db_index=True)),
+                ('band2', models.PositiveIntegerField(db_index=True)),
+                ('band3', models.PositiveIntegerField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('asset_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='panel_hashes', to='catalog.assetmodel')),
+            ],
+            options={
+                'db_table': 'panel_hash',
+                'unique_together': {('asset_model', 'side')},
+            },
+        ),
+    ]
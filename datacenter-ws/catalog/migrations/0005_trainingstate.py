@@ -0,0 +1,28 @@
+# Generated by Django 6.0.6 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_panelhash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corrections_since_last_train', models.PositiveIntegerField(default=0)),
+                ('total_corrections', models.PositiveIntegerField(default=0)),
+                ('last_training_at', models.DateTimeField(blank=True, null=True)),
+                ('lease_token', models.UUIDField(blank=True, null=True)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('corrections_at_lease', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'training_state',
+            },
+        ),
+    ]
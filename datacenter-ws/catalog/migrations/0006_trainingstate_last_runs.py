@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_trainingstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingstate',
+            name='last_runs',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
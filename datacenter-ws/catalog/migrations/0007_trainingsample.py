@@ -0,0 +1,34 @@
+# Generated by Django 6.0.6 on 2026-10-17 04:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_trainingstate_last_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('split', models.CharField(choices=[('train', 'Train'), ('val', 'Validation')], db_index=True, max_length=5)),
+                ('source', models.CharField(choices=[('annotation', 'Annotation'), ('correction', 'Correction'), ('catalog', 'Catalog ports'), ('augmentation', 'Augmentation'), ('imported', 'Imported from disk')], max_length=12)),
+                ('image_name', models.CharField(blank=True, default='', max_length=255)),
+                ('side', models.CharField(blank=True, default='', max_length=5)),
+                ('image_sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('label_sha256', models.CharField(max_length=64)),
+                ('label_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('asset_model', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='training_samples', to='catalog.assetmodel')),
+            ],
+            options={
+                'db_table': 'training_sample',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_trainingsample'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trainingsample',
+            name='source_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import models
+from catalog.models.AssetModel import AssetModel
+
+
+class PanelHash(models.Model):
+    """
+    Perceptual hash (64-bit dHash) of one AssetModel panel image.
+
+    Lets PortAnalyzeView recognise a near-identical panel and suggest that
+    model's existing port layout instead of running detection (see
+    ``catalog.port_detection.panel_hash``).  ``image_name`` records which
+    upload was hashed, so a row whose image has since been replaced is
+    ignored until it is re-indexed.
+    """
+
+    SIDE_CHOICES = [
+        ('front', 'Front'),
+        ('rear', 'Rear'),
+    ]
+
+    asset_model = models.ForeignKey(
+        AssetModel,
+        on_delete=models.CASCADE,
+        related_name='panel_hashes',
+    )
+    side = models.CharField(max_length=5, choices=SIDE_CHOICES)
+    image_name = models.CharField(max_length=255)
+    # Signed two's complement of the unsigned hash (BigIntegerField is
+    # signed); band0..band3 are its 16-bit slices, indexed for the Hamming
+    # prefilter in find_layout.
+    dhash = models.BigIntegerField()
+    band0 = models.PositiveIntegerField(db_index=True)
+    band1 = models.PositiveIntegerField(db_index=True)
+    band2 = models.PositiveIntegerField(db_index=True)
+    band3 = models.PositiveIntegerField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'catalog'
+        db_table = 'panel_hash'
+        unique_together = ('asset_model', 'side')
+
+    def __str__(self):
+        return f"{self.asset_model} ({self.side}): {self.dhash & 0xFFFFFFFFFFFFFFFF:016x}"
+
+    def is_current(self) -> bool:
+        """True while the hashed upload is still the model's image."""
+        image = getattr(self.asset_model, f'{self.side}_image')
+        return bool(image) and image.name == self.image_name
@@ -0,0 +1,62 @@
+import uuid as _uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class PortAnalysisJob(models.Model):
+    """
+    An asynchronous full-image port analysis (``POST asset/port-analyze/jobs``).
+
+    The ``catalog.run_port_analysis`` Celery task advances ``stage`` through
+    :attr:`STAGES` while it runs and stores the named port list in
+    ``result`` when it finishes.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    STAGES = ('preprocess', 'infer', 'dedup', 'naming')
+
+    id = models.UUIDField(primary_key=True, default=_uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='port_analysis_jobs',
+    )
+    image_path = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=8,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    stage = models.CharField(max_length=16, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'catalog'
+        db_table = 'port_analysis_job'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.image_path} ({self.status})"
+
+    def set_stage(self, stage: str) -> None:
+        """Record that the pipeline has entered *stage*."""
+        self.status = self.Status.RUNNING
+        self.stage = stage
+        self.save(update_fields=['status', 'stage', 'updated_at'])
+
+    def progress(self) -> int:
+        """Completion percentage derived from the current stage."""
+        if self.status == self.Status.DONE:
+            return 100
+        if self.stage not in self.STAGES:
+            return 0
+        return int(100 * self.STAGES.index(self.stage) / len(self.STAGES))
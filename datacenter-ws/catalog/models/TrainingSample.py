@@ -0,0 +1,57 @@
+from django.db import models
+from catalog.models.AssetModel import AssetModel
+
+
+class TrainingSample(models.Model):
+    """
+    One image / label pair of the YOLO training set (``media/training``).
+
+    The manifest of the dataset on disk: written in the same transaction
+    that moves the label file into place (see
+    ``catalog.port_detection.dataset``), so sample counts and the split of
+    an image are database lookups instead of directory scans.  ``key`` is
+    the file stem shared by ``images/<split>/<key>.jpg`` and
+    ``labels/<split>/<key>.txt``.
+    """
+
+    SPLIT_CHOICES = [
+        ('train', 'Train'),
+        ('val', 'Validation'),
+    ]
+
+    class Source(models.TextChoices):
+        ANNOTATION = 'annotation', 'Annotation'
+        CORRECTION = 'correction', 'Correction'
+        CATALOG = 'catalog', 'Catalog ports'
+        AUGMENTATION = 'augmentation', 'Augmentation'
+        IMPORTED = 'imported', 'Imported from disk'
+
+    key = models.CharField(max_length=32, unique=True)
+    split = models.CharField(max_length=5, choices=SPLIT_CHOICES, db_index=True)
+    source = models.CharField(max_length=12, choices=Source.choices)
+    # Source image relative to MEDIA_ROOT and panel side; empty for samples
+    # imported from an existing dataset.
+    image_name = models.CharField(max_length=255, blank=True, default='')
+    side = models.CharField(max_length=5, blank=True, default='')
+    asset_model = models.ForeignKey(
+        AssetModel,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='training_samples',
+    )
+    image_sha256 = models.CharField(max_length=64, blank=True, default='')
+    label_sha256 = models.CharField(max_length=64)
+    label_count = models.PositiveIntegerField(default=0)
+    # Augmented samples: hash of the image and label they were derived
+    # from, so unchanged inputs are not augmented again.
+    source_sha256 = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'catalog'
+        db_table = 'training_sample'
+
+    def __str__(self):
+        return f"{self.key} ({self.split}, {self.label_count} boxes)"
@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class TrainingState(models.Model):
+    """
+    Correction counters and the retraining lease (single row, ``pk=1``).
+
+    Shared by every web and Celery process, so it must only be changed
+    through ``catalog.port_detection.training_state``: counters with
+    ``F()`` updates, the lease under a row lock.  A training run holds the
+    lease (``lease_token``) until it finishes or ``lease_expires_at``
+    passes, so a crashed worker cannot block retraining for good.
+    """
+
+    corrections_since_last_train = models.PositiveIntegerField(default=0)
+    total_corrections = models.PositiveIntegerField(default=0)
+    last_training_at = models.DateTimeField(null=True, blank=True)
+    lease_token = models.UUIDField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    # corrections_since_last_train when the lease was taken; subtracted on
+    # release so corrections that arrive during training are kept.
+    corrections_at_lease = models.PositiveIntegerField(default=0)
+    # Last run report per training mode ('full' / 'finetune'): wall time,
+    # epochs and validation mAP (see training_state.run_training).
+    last_runs = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        app_label = 'catalog'
+        db_table = 'training_state'
+
+    def __str__(self):
+        return f"{self.corrections_since_last_train} corrections since last train"
+
+    @property
+    def is_training(self) -> bool:
+        return (self.lease_expires_at is not None
+                and self.lease_expires_at > timezone.now())
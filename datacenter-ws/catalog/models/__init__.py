@@ -4,6 +4,10 @@ from .CustomFieldName import CustomFieldName
 from .AssetModel import AssetModel
 from .AssetModelPort import AssetModelPort
 from .NetworkSwitchAssetModel import NetworkSwitchAssetModel
+from .PortAnalysisJob import PortAnalysisJob
+from .PanelHash import PanelHash
+from .TrainingState import TrainingState
+from .TrainingSample import TrainingSample
 
 __all__ = [
     'Vendor',
@@ -12,4 +16,8 @@ __all__ = [
     'AssetModel',
     'AssetModelPort',
     'NetworkSwitchAssetModel',
+    'PortAnalysisJob',
+    'PanelHash',
+    'TrainingState',
+    'TrainingSample',
 ]
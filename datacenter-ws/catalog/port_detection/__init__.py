@@ -1,7 +1,14 @@
 # Port detection subpackage.
 # Exposes the public API used by the view layer.
-from .batch_detector import detect_with_opencv, detect_with_yolo
-from .naming import assign_names
+from .batch_detector import (
+    detect_with_opencv,
+    detect_with_yolo,
+    detect_with_yolo_batch,
+    postprocess_yolo,
+    raw_yolo_detections,
+)
+from .naming import apply_ocr_labels, assign_names
+from .panel_hash import find_layout
 from .security import (
     can_access_private_media,
     get_media_root,
@@ -16,5 +23,10 @@ __all__ = [
     'can_access_private_media',
     'detect_with_opencv',
     'detect_with_yolo',
+    'detect_with_yolo_batch',
+    'raw_yolo_detections',
+    'postprocess_yolo',
     'assign_names',
+    'apply_ocr_labels',
+    'find_layout',
 ]
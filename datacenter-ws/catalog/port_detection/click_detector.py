@@ -6,8 +6,11 @@ already-loaded BGR image and the click coordinates (percent of image width/
 height) and return ``(port_type, confidence)``.
 """
 from .constants import AR_RANGES, YOLO_ID_TO_TYPE
+from .contour_features import contour_prefilter, darkness_scores, integral_image
+from .image_cache import enhanced
 from .model_cache import get_yolo_model
-from .preprocessing import auto_canny, preprocess_for_inference
+from .preprocessing import auto_canny, prepare_for_inference
+from .timing import stage
 
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
@@ -54,7 +57,28 @@ def _ar_to_type(ar: float) -> str:
 
 # ── YOLO click detection ───────────────────────────────────────────────────────
 
-def detect_with_yolo(img, click_x: float, click_y: float):
+# Crop half-sizes (fraction of image width/height) evaluated per click.
+_CLICK_PADS = (0.14, 0.22, 0.32)
+
+# Inference size for click crops (ultralytics' default imgsz).
+_CLICK_IMGSZ = 640
+
+
+def _whole_image_source(image_path: str, img):
+    """
+    Enhanced whole image at the click scale, from the image cache.
+
+    The scale only depends on the image size (crops are fixed fractions of
+    it), so every click on the same photo shares one enhancement.
+    """
+    h, w = img.shape[:2]
+    inner = 2 * max(int(h * min(_CLICK_PADS)), int(w * min(_CLICK_PADS)))
+    scale = min(1.0, _CLICK_IMGSZ / max(1, inner))
+    return enhanced(image_path, max(1, round(max(h, w) * scale)))
+
+
+def detect_with_yolo(img, click_x: float, click_y: float,
+                     image_path: str | None = None):
     """
     Multi-scale YOLO detection centred on the click point.
 
@@ -62,12 +86,29 @@ def detect_with_yolo(img, click_x: float, click_y: float):
     and selects the detection closest to the click with the highest combined
     score (confidence − 0.3 × normalised distance).
 
+    Only the largest crop is preprocessed; the two smaller crops are cut from
+    the already-enhanced array (they are nested windows around the same
+    click), and all three go through the model in a single batched call, so
+    each click pays for one enhancement pass and one forward pass.
+
+    Before enhancement the outer crop is downsampled so that the *smallest*
+    crop still reaches ``_CLICK_IMGSZ`` on its longer side: no crop loses
+    resolution the model would have used, but a 6000 px photo's 3800 px
+    outer crop is no longer enhanced at full size.
+
+    When *image_path* is given, the crops are instead cut from the whole
+    image enhanced once at that scale and kept in :mod:`.image_cache`, so
+    further clicks on the same photo skip enhancement entirely.
+
     Parameters
     ----------
     img:
         Full BGR image.
     click_x / click_y:
         Click position as percentages (0–100).
+    image_path:
+        Absolute path *img* was loaded from, enabling the cached whole-image
+        enhancement.
 
     Returns
     -------
@@ -79,17 +120,41 @@ def detect_with_yolo(img, click_x: float, click_y: float):
         return None, 0.0
 
     try:
-        best_type, best_conf, best_dist = None, 0.0, float('inf')
-
-        for pad in (0.14, 0.22, 0.32):
-            crop, _, _, crop_cx, crop_cy = _crop_around_click(
+        outer, ox1, oy1, _, _ = _crop_around_click(
+            img, click_x, click_y, pad_pct=max(_CLICK_PADS))
+        if outer.size == 0:
+            return None, 0.0
+        cached = _whole_image_source(image_path, img) if image_path else None
+        if cached is not None:
+            outer_proc, scale = cached
+            ox1 = oy1 = 0
+        else:
+            inner, _, _, _, _ = _crop_around_click(
+                img, click_x, click_y, pad_pct=min(_CLICK_PADS))
+            scale = min(1.0, _CLICK_IMGSZ / max(1, *inner.shape[:2]))
+            with stage('preprocess'):
+                outer_proc, scale = prepare_for_inference(
+                    outer, max(1, round(max(outer.shape[:2]) * scale)))
+
+        crops = []
+        for pad in _CLICK_PADS:
+            crop, x1, y1, crop_cx, crop_cy = _crop_around_click(
                 img, click_x, click_y, pad_pct=pad)
             if crop.size == 0:
                 continue
+            # Map the nested window and click into the scaled source.
+            h, w = crop.shape[:2]
+            dy, dx = round((y1 - oy1) * scale), round((x1 - ox1) * scale)
+            sh, sw = max(1, round(h * scale)), max(1, round(w * scale))
+            crops.append((outer_proc[dy:dy + sh, dx:dx + sw],
+                          crop_cx * scale, crop_cy * scale))
+
+        with stage('infer'):
+            batch = model([c[0] for c in crops], verbose=False, conf=0.18, iou=0.40)
 
-            crop_proc = preprocess_for_inference(crop)
-            results = model(crop_proc, verbose=False, conf=0.18, iou=0.40)[0]
+        best_type, best_conf, best_dist = None, 0.0, float('inf')
 
+        for (crop, crop_cx, crop_cy), results in zip(crops, batch):
             if results.boxes is None or len(results.boxes) == 0:
                 continue
 
@@ -114,6 +179,7 @@ def detect_with_yolo(img, click_x: float, click_y: float):
 
 # ── OpenCV click detection ─────────────────────────────────────────────────────
 
+@stage('opencv')
 def detect_with_opencv(img, click_x: float, click_y: float):
     """
     Fallback OpenCV detection centred on the click point.
@@ -162,13 +228,20 @@ def detect_with_opencv(img, click_x: float, click_y: float):
         min_area = max(60, W * H * 0.0004)
         max_area = W * H * 0.50   # permissive upper bound for small crops
 
+        idx, areas, xs, ys, ws, hs = contour_prefilter(
+            contours, min_area, max_area, min_side=4,
+            ar_min=0.30, ar_max=7.0, min_fill=0.40)
+        darks = darkness_scores(
+            integral_image(gray), xs, ys, ws, hs, margin_min=3, margin_max=12)
+
         best = None
         best_score = -1.0
 
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            if area < min_area or area > max_area:
-                continue
+        for i in np.flatnonzero(darks >= 0.04):
+            cnt = contours[idx[i]]
+            area = float(areas[i])
+            x, y, cw, ch = int(xs[i]), int(ys[i]), int(ws[i]), int(hs[i])
+            darkness = float(darks[i])
 
             peri = cv2.arcLength(cnt, True)
             if peri < 1:
@@ -178,17 +251,8 @@ def detect_with_opencv(img, click_x: float, click_y: float):
             if len(approx) < 4 or len(approx) > 10:
                 continue
 
-            x, y, cw, ch = cv2.boundingRect(cnt)
-            if cw < 4 or ch < 4:
-                continue
-
             ar = cw / ch
-            if ar < 0.30 or ar > 7.0:
-                continue
-
-            rect_fill = area / (cw * ch) if cw * ch > 0 else 0.0
-            if rect_fill < 0.40:
-                continue
+            rect_fill = area / (cw * ch)
 
             _, (rw, rh), _ = cv2.minAreaRect(cnt)
             mar_area = rw * rh if rw > 0 and rh > 0 else 1.0
@@ -196,18 +260,6 @@ def detect_with_opencv(img, click_x: float, click_y: float):
             if mar_fill < 0.35:
                 continue
 
-            roi_mean = float(np.mean(gray[y:y + ch, x:x + cw]))
-            margin = max(3, min(12, int(min(cw, ch) * 0.30)))
-            sy0, sy1 = max(0, y - margin), min(H, y + ch + margin)
-            sx0, sx1 = max(0, x - margin), min(W, x + cw + margin)
-            surround = gray[sy0:sy1, sx0:sx1]
-            surround_mean = float(
-                np.mean(surround)) if surround.size else roi_mean
-            darkness = max(0.0, (surround_mean - roi_mean) /
-                           (surround_mean + 1.0))
-            if darkness < 0.04:
-                continue
-
             conf = min(1.0, mar_fill * 0.40 + rect_fill * 0.25
                        + min(darkness * 1.75, 0.35))
             if conf < 0.35:
@@ -0,0 +1,332 @@
+"""
+Manifest of the YOLO training set.
+
+Samples live under ``MEDIA_ROOT/training`` as ``images/<split>/<key>.jpg``
+and ``labels/<split>/<key>.txt``; each pair has a
+:class:`catalog.models.TrainingSample` row with its split, source image,
+AssetModel and the sha256 of both files.  Every writer goes through
+:func:`save_sample`, which moves the label into place inside the
+transaction that records it, so the manifest and the directory tree agree
+and counting samples or finding an image's split never lists a directory.
+
+Image content is stored once, under ``objects/<sha[:2]>/<sha>``, and the
+split trees are hard links to it (symlinks where the filesystem has no
+hard links).  Uploads are hard-linked into the store as well – Django
+storage never rewrites a file in place – so adding a sample costs no data
+copy unless the media and training directories are on different
+filesystems, and re-saving an unchanged image touches no file at all.
+
+Datasets written before the manifest existed are imported with
+``manage.py index_training_samples``.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+
+from django.db import transaction
+
+from .security import get_media_root
+
+logger = logging.getLogger(__name__)
+
+SPLITS = ('train', 'val')
+
+
+def training_dir() -> str:
+    return os.path.join(get_media_root(), 'training')
+
+
+def sample_key(image_name: str, side: str) -> str:
+    """Stable file stem of the sample for *image_name* / *side*."""
+    return hashlib.sha256(f'{image_name}|{side}'.encode()).hexdigest()[:16]
+
+
+def split_for(key: str) -> str:
+    """
+    Split of sample *key*: the recorded one, or for a new sample the
+    deterministic ~80/20 split (first hex char mod 5 == 0 → val).
+    """
+    from catalog.models import TrainingSample
+
+    split = (TrainingSample.objects.filter(key=key)
+             .values_list('split', flat=True).first())
+    if split is not None:
+        return split
+    return 'val' if int(key[0], 16) % 5 == 0 else 'train'
+
+
+def sample_paths(key: str, split: str, root: str | None = None) -> tuple[str, str]:
+    """``(image, label)`` paths of sample *key* in *split*."""
+    root = root or training_dir()
+    return (os.path.join(root, 'images', split, f'{key}.jpg'),
+            os.path.join(root, 'labels', split, f'{key}.txt'))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ── Content-addressed image store ─────────────────────────────────────────────
+
+def object_path(sha256: str, root: str | None = None) -> str:
+    root = root or training_dir()
+    return os.path.join(root, 'objects', sha256[:2], sha256)
+
+
+def _staging_path(dest: str) -> str:
+    """Temporary name next to *dest*, unique per process and thread."""
+    return f'{dest}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def _publish(write, dest: str) -> None:
+    """Create *dest* atomically via ``write(tmp_path)``."""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = _staging_path(dest)
+    try:
+        write(tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+
+
+def store_file(path: str, root: str | None = None) -> str:
+    """
+    Add the file at *path* to the store; returns its sha256.  The object
+    is a hard link to *path* when possible, a copy otherwise.
+    """
+    sha256 = file_sha256(path)
+    obj = object_path(sha256, root)
+    if not os.path.exists(obj):
+        def write(tmp):
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+        _publish(write, obj)
+    return sha256
+
+
+def store_bytes(data: bytes, root: str | None = None) -> str:
+    """Add *data* to the store; returns its sha256."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    obj = object_path(sha256, root)
+    if not os.path.exists(obj):
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                f.write(data)
+        _publish(write, obj)
+    return sha256
+
+
+def link_object(sha256: str, dest: str, root: str | None = None) -> bool:
+    """
+    Point *dest* at stored object *sha256*: a hard link, or a symlink when
+    hard links are not supported.  Returns ``False`` when *dest* already
+    is that object.
+    """
+    obj = object_path(sha256, root)
+    if _same_file(obj, dest):
+        return False
+
+    def write(tmp):
+        try:
+            os.link(obj, tmp)
+        except FileNotFoundError:
+            # Never turn a missing object into a dangling symlink.
+            raise
+        except OSError:
+            os.symlink(obj, tmp)
+    _publish(write, dest)
+    return True
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def read_label(key: str, split: str) -> list[str]:
+    """Label lines of sample *key*, or ``[]`` when it has none yet."""
+    _, label_path = sample_paths(key, split)
+    try:
+        with open(label_path) as f:
+            return f.readlines()
+    except FileNotFoundError:
+        return []
+
+
+def _source_model(image_name: str, side: str):
+    from catalog.models import AssetModel
+
+    if not image_name or side not in ('front', 'rear'):
+        return None
+    return AssetModel.objects.filter(**{f'{side}_image': image_name}).first()
+
+
+def lock_sample(key: str, split: str, source: str):
+    """
+    Row-lock sample *key* until the caller's transaction ends, creating its
+    manifest row if needed, so a read-modify-write of the label
+    (:func:`read_label`, then :func:`save_sample`) cannot interleave with
+    another one and lose its lines.  Returns the row.
+    """
+    from catalog.models import TrainingSample
+
+    TrainingSample.objects.get_or_create(
+        key=key, defaults={'split': split, 'source': source})
+    return TrainingSample.objects.select_for_update().get(key=key)
+
+
+def save_sample(key: str, split: str, image, label_lines: list[str], *,
+                source: str, image_name: str = '', side: str = '',
+                source_sha256: str = '', image_sha256: str = '',
+                root: str | None = None):
+    """
+    Write sample *key* and record it in the manifest.
+
+    *image* is the path of the source image, encoded image bytes, or
+    *None* when the caller has already stored the image (:func:`store_bytes`)
+    and passes its *image_sha256*; either way the split tree gets a link to
+    the stored object.  A source image that already is the sample's image
+    (same inode) is not read again.  The label is staged next to its destination and renamed into place
+    inside the transaction that upserts the :class:`TrainingSample` row: if the
+    row cannot be written the previous label is left untouched, and if the
+    rename fails the row is rolled back.  Returns the row.
+    """
+    from catalog.models import TrainingSample
+
+    image_path, label_path = sample_paths(key, split, root)
+    os.makedirs(os.path.dirname(image_path), exist_ok=True)
+    os.makedirs(os.path.dirname(label_path), exist_ok=True)
+
+    existing = TrainingSample.objects.filter(key=key).first()
+    if isinstance(image, bytes):
+        image_sha256 = store_bytes(image, root)
+    elif image is not None:
+        if (existing is not None and existing.image_sha256
+                and _same_file(image, image_path)):
+            image_sha256 = existing.image_sha256
+        else:
+            image_sha256 = store_file(image, root)
+    link_object(image_sha256, image_path, root)
+
+    content = ''.join(label_lines).encode()
+    staged = _staging_path(label_path)
+    with open(staged, 'wb') as f:
+        f.write(content)
+    try:
+        with transaction.atomic():
+            sample, _ = TrainingSample.objects.update_or_create(
+                key=key,
+                defaults={
+                    'split': split,
+                    'source': source,
+                    'image_name': image_name,
+                    'side': side,
+                    'asset_model': _source_model(image_name, side),
+                    'image_sha256': image_sha256,
+                    'label_sha256': hashlib.sha256(content).hexdigest(),
+                    'label_count': sum(1 for line in label_lines if line.strip()),
+                    'source_sha256': source_sha256,
+                },
+            )
+            os.replace(staged, label_path)
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+    return sample
+
+
+# ── Lookups ───────────────────────────────────────────────────────────────────
+
+def sample_count(split: str | None = None) -> int:
+    """Number of samples in the dataset, or in *split*."""
+    from catalog.models import TrainingSample
+
+    samples = TrainingSample.objects.all()
+    if split is not None:
+        samples = samples.filter(split=split)
+    return samples.count()
+
+
+def has_samples(split: str) -> bool:
+    from catalog.models import TrainingSample
+
+    return TrainingSample.objects.filter(split=split).exists()
+
+
+# ── Import ────────────────────────────────────────────────────────────────────
+
+def index_existing(root: str | None = None) -> tuple[int, int]:
+    """
+    Bring the manifest in line with the files under *root*: record label
+    files without a row (``source='imported'``), moving their images into
+    the store, and drop rows whose label file is gone.  Returns
+    ``(added, removed)``.
+    """
+    from catalog.models import TrainingSample
+
+    root = root or training_dir()
+    on_disk = {}
+    for split in SPLITS:
+        labels_dir = os.path.join(root, 'labels', split)
+        if not os.path.isdir(labels_dir):
+            continue
+        for entry in os.scandir(labels_dir):
+            if entry.name.endswith('.txt'):
+                on_disk[entry.name[:-4]] = split
+
+    known = dict(TrainingSample.objects.values_list('key', 'split'))
+    stale = [key for key, split in known.items() if on_disk.get(key) != split]
+    removed, _ = TrainingSample.objects.filter(key__in=stale).delete()
+
+    added = 0
+    for key, split in on_disk.items():
+        if known.get(key) == split:
+            continue
+        image_path, label_path = sample_paths(key, split, root)
+        with open(label_path, 'rb') as f:
+            content = f.read()
+        image_sha256 = ''
+        if os.path.isfile(image_path):
+            image_sha256 = store_file(image_path, root)
+            link_object(image_sha256, image_path, root)
+        TrainingSample.objects.create(
+            key=key,
+            split=split,
+            source=TrainingSample.Source.IMPORTED,
+            image_sha256=image_sha256,
+            label_sha256=hashlib.sha256(content).hexdigest(),
+            label_count=sum(1 for line in content.splitlines() if line.strip()),
+        )
+        added += 1
+    return added, removed
+
+
+def prune_objects(root: str | None = None) -> int:
+    """Delete stored images no sample refers to; returns how many."""
+    from catalog.models import TrainingSample
+
+    root = root or training_dir()
+    objects_dir = os.path.join(root, 'objects')
+    if not os.path.isdir(objects_dir):
+        return 0
+    referenced = set(TrainingSample.objects.values_list('image_sha256', flat=True))
+    removed = 0
+    for bucket in os.scandir(objects_dir):
+        if not bucket.is_dir():
+            continue
+        for entry in os.scandir(bucket.path):
+            if entry.name not in referenced and not entry.name.endswith('.tmp'):
+                os.remove(entry.path)
+                removed += 1
+    return removed
@@ -0,0 +1,142 @@
+"""
+Per-process LRU of decoded and enhanced images.
+
+Mapping a panel means one click per port, and every click used to decode
+the same 8 MB JPEG twice (type detection, then OCR) and re-run CLAHE on an
+overlapping crop.  :func:`load_image` and :func:`enhanced` serve the click,
+OCR and batch paths from one cache instead.
+
+Entries are keyed by ``(path, mtime_ns, size)`` so a replaced file is never
+served stale, and the cache is bounded by the total ``nbytes`` of the arrays
+it holds (``PORT_IMAGE_CACHE_MB``).  Cached arrays are shared between
+callers and therefore marked read-only; take a copy before drawing on one.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .timing import stage
+
+
+class _ImageLRU:
+    def __init__(self):
+        self.entries: OrderedDict = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = {'decoded': 0, 'enhanced': 0}
+        self.misses = {'decoded': 0, 'enhanced': 0}
+
+    def get(self, key):
+        kind = key[0]
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses[kind] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits[kind] += 1
+            return value
+
+    def put(self, key, value, nbytes: int, limit: int) -> None:
+        if nbytes > limit:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > limit:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            for counters in (self.hits, self.misses):
+                for kind in counters:
+                    counters[kind] = 0
+
+
+_cache = _ImageLRU()
+
+
+def _limit() -> int:
+    from django.conf import settings
+    return int(getattr(settings, 'PORT_IMAGE_CACHE_MB', 256)) * 1024 * 1024
+
+
+def _file_id(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_mtime_ns, st.st_size
+
+
+def _freeze(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+def load_image(path: str):
+    """
+    Decoded BGR array for *path* (``cv2.imread``), or *None* when the file
+    cannot be read or decoded.
+    """
+    import cv2
+
+    file_id = _file_id(path)
+    if file_id is None:
+        return None
+    key = ('decoded',) + file_id
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached[0]
+
+    with stage('decode'):
+        img = cv2.imread(path)
+    if img is not None:
+        _cache.put(key, _freeze(img), img.nbytes, _limit())
+    return img
+
+
+def enhanced(path: str, max_side: int):
+    """
+    ``prepare_for_inference(load_image(path), max_side)`` – i.e.
+    ``(enhanced, scale)`` – cached per file and *max_side*.  *None* when the
+    image cannot be decoded.
+    """
+    from .preprocessing import prepare_for_inference
+
+    file_id = _file_id(path)
+    if file_id is None:
+        return None
+    key = ('enhanced', max_side) + file_id
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached[0]
+
+    img = load_image(path)
+    if img is None:
+        return None
+    with stage('preprocess'):
+        out, scale = prepare_for_inference(img, max_side)
+    _cache.put(key, (_freeze(out), scale), out.nbytes, _limit())
+    return out, scale
+
+
+def stats() -> dict:
+    """Hit / miss counters per kind plus current size, for monitoring."""
+    with _cache.lock:
+        return {
+            'hits': dict(_cache.hits),
+            'misses': dict(_cache.misses),
+            'entries': len(_cache.entries),
+            'bytes': _cache.nbytes,
+        }
+
+
+def clear() -> None:
+    """Drop every entry and reset the counters."""
+    _cache.clear()
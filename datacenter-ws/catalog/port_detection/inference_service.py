@@ -0,0 +1,301 @@
+"""
+Local inference service – keeps YOLO / OCR work out of the web workers.
+
+By default every detection call runs inline in the Django request thread, so
+a 2–4 s YOLO + OCR call pins a gunicorn worker and every worker holds its own
+copy of the model.  When ``PORT_INFERENCE_SOCKET`` is configured, the views
+forward those calls to a long-lived service started with::
+
+    python manage.py serve_port_inference
+
+The service owns a small process pool (``PORT_INFERENCE_WORKERS``) in which
+the model is resident once per pool process, and admits at most
+``PORT_INFERENCE_WORKERS + PORT_INFERENCE_QUEUE_SIZE`` jobs at a time.  Jobs
+beyond that are rejected immediately (:class:`InferenceBusy`) so the view can
+answer 503 instead of queueing without bound; jobs that do not finish within
+``PORT_INFERENCE_TIMEOUT`` seconds raise :class:`InferenceTimeout`.
+
+Jobs are addressed by name (see ``_JOBS``) and take only picklable arguments
+(paths and coordinates, never decoded images), so the wire protocol stays a
+single ``(job, args, timeout)`` → ``(status, payload)`` round-trip over a
+:mod:`multiprocessing.connection` socket authenticated with a key derived from
+``SECRET_KEY``.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+from . import timing
+from .model_cache import note_served
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServiceError(Exception):
+    """The inference service could not complete a job."""
+
+
+class InferenceBusy(InferenceServiceError):
+    """All worker and queue slots are taken; the caller should retry later."""
+
+
+class InferenceTimeout(InferenceServiceError):
+    """The job did not complete within ``PORT_INFERENCE_TIMEOUT`` seconds."""
+
+
+class InferenceUnavailable(InferenceServiceError):
+    """The service is configured but not reachable."""
+
+
+# ── Jobs (executed inside the pool worker processes) ──────────────────────────
+
+def _job_detect_yolo(image_path: str, model_path: str | None = None) -> list:
+    from .batch_detector import detect_with_yolo
+    return detect_with_yolo(image_path, model_path)
+
+
+def _job_detect_yolo_raw(image_path: str, model_path: str | None = None) -> list:
+    from .batch_detector import raw_yolo_detections
+    return raw_yolo_detections(image_path, model_path)
+
+
+def _job_detect_yolo_batch(image_paths: list,
+                           model_path: str | None = None) -> list:
+    from .batch_detector import detect_with_yolo_batch
+    batch_size = int(getattr(settings, 'PORT_BATCH_SIZE', 8))
+    return detect_with_yolo_batch(image_paths, model_path, batch_size=batch_size)
+
+
+def _job_click_yolo(image_path: str, click_x: float, click_y: float):
+    from .click_detector import detect_with_yolo
+    from .image_cache import load_image
+    img = load_image(image_path)
+    if img is None:
+        return None, 0.0
+    return detect_with_yolo(img, click_x, click_y, image_path=image_path)
+
+
+def _job_read_label(image_path: str, click_x: float, click_y: float):
+    from .ocr import read_label_ocr
+    return read_label_ocr(image_path, click_x, click_y)
+
+
+def _job_image_text(image_path: str):
+    from .ocr import image_text_boxes
+    return image_text_boxes(image_path)
+
+
+_JOBS = {
+    'detect_yolo': _job_detect_yolo,
+    'detect_yolo_raw': _job_detect_yolo_raw,
+    'detect_yolo_batch': _job_detect_yolo_batch,
+    'click_yolo': _job_click_yolo,
+    'read_label': _job_read_label,
+    'image_text': _job_image_text,
+}
+
+
+def _run_job(job: str, args: tuple) -> tuple:
+    """
+    Pool entry point: ``(result, stage_timings, served_models)`` for the
+    client to merge (see :func:`model_cache.track_served`).
+    """
+    from .model_cache import track_served
+    from .timing import capture
+    with capture() as stages, track_served() as served:
+        result = _JOBS[job](*args)
+    return result, stages, served
+
+
+def _init_worker() -> None:
+    """Pool initializer: set up Django and load the model once per process
+    (plus OCR and a dummy inference when ``PORT_WARMUP`` is set)."""
+    import django
+    django.setup()
+    if getattr(settings, 'PORT_WARMUP', False):
+        from .warmup import warm_up
+        warm_up()
+    else:
+        from .model_cache import get_yolo_model
+        get_yolo_model()
+
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+
+def service_address():
+    """
+    Parse ``PORT_INFERENCE_SOCKET`` into a :mod:`multiprocessing.connection`
+    address: ``'host:port'`` → ``(host, port)``, anything else is treated as
+    a Unix socket path.  Returns *None* when the service is disabled.
+    """
+    raw = (getattr(settings, 'PORT_INFERENCE_SOCKET', '') or '').strip()
+    if not raw:
+        return None
+    if not raw.startswith('/') and ':' in raw:
+        host, _, port = raw.rpartition(':')
+        return host, int(port)
+    return raw
+
+
+def is_enabled() -> bool:
+    """True when the views should forward jobs to the inference service."""
+    return service_address() is not None
+
+
+def _authkey() -> bytes:
+    return hashlib.sha256(
+        f'port-inference:{settings.SECRET_KEY}'.encode()).digest()
+
+
+# ── Client ─────────────────────────────────────────────────────────────────────
+
+def submit(job: str, *args, timeout: float | None = None):
+    """
+    Run *job* with *args* and return its result.
+
+    Runs in-process when the service is disabled, so callers do not need a
+    separate code path for single-process deployments.  *timeout* overrides
+    ``PORT_INFERENCE_TIMEOUT`` for jobs known to be longer (batches).
+
+    Raises
+    ------
+    InferenceBusy
+        The service queue is full.
+    InferenceTimeout
+        No result within ``PORT_INFERENCE_TIMEOUT`` seconds.
+    InferenceUnavailable
+        The service socket could not be reached.
+    InferenceServiceError
+        The job raised inside the service.
+    """
+    if job not in _JOBS:
+        raise ValueError(f'Unknown inference job: {job!r}')
+
+    address = service_address()
+    if address is None:
+        return _JOBS[job](*args)
+
+    if timeout is None:
+        timeout = float(getattr(settings, 'PORT_INFERENCE_TIMEOUT', 30))
+    try:
+        conn = Client(address, authkey=_authkey())
+    except OSError as exc:
+        raise InferenceUnavailable(str(exc)) from exc
+
+    with conn:
+        try:
+            conn.send((job, args, timeout))
+            if not conn.poll(timeout):
+                raise InferenceTimeout(f'{job} exceeded {timeout:.0f}s')
+            status, payload = conn.recv()
+        except (EOFError, OSError) as exc:
+            raise InferenceUnavailable(str(exc)) from exc
+
+    if status == 'ok':
+        result, stages, served = payload
+        timing.merge(stages)
+        note_served(served)
+        return result
+    if status == 'busy':
+        raise InferenceBusy('Inference queue is full')
+    if status == 'timeout':
+        raise InferenceTimeout(f'{job} exceeded the service timeout')
+    raise InferenceServiceError(payload)
+
+
+# ── Server ─────────────────────────────────────────────────────────────────────
+
+class InferenceServer:
+    """
+    Accept jobs on *address* and run them on a bounded process pool.
+
+    Each connection is handled on its own thread, which only waits on the
+    pool future; the CPU work happens in the pool processes.  A job holds its
+    admission slot until it actually finishes – even after the client has
+    timed out – so a burst of slow jobs cannot oversubscribe the pool.
+    """
+
+    def __init__(self, address, workers: int = 1, queue_size: int = 4,
+                 job_timeout: float = 30.0):
+        self.address = address
+        self.job_timeout = job_timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._stopped = threading.Event()
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            # torch / MPS do not survive fork(); see celery_app.py.
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+
+    def serve_forever(self) -> None:
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # Stale socket left by a previous run.
+            os.remove(self.address)
+
+        with Listener(self.address, authkey=_authkey()) as listener:
+            logger.info('Port inference service listening on %s', self.address)
+            while not self._stopped.is_set():
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError, multiprocessing.AuthenticationError):
+                    # EOFError: the peer hung up during the auth handshake.
+                    logger.warning('Rejected inference connection', exc_info=True)
+                    continue
+                if self._stopped.is_set():
+                    conn.close()
+                    break
+                threading.Thread(
+                    target=self._handle, args=(conn,), daemon=True,
+                    name='port-inference-conn',
+                ).start()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        try:
+            # Wake the blocking accept() so serve_forever can return.
+            Client(self.address, authkey=_authkey()).close()
+        except (OSError, EOFError):
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _handle(self, conn) -> None:
+        with conn:
+            try:
+                job, args, timeout = conn.recv()
+            except (EOFError, OSError, ValueError, TypeError):
+                return
+            try:
+                conn.send(self._run(job, args, timeout or self.job_timeout))
+            except OSError:
+                # Client gave up (its own timeout) before we answered.
+                pass
+
+    def _run(self, job: str, args: tuple, timeout: float) -> tuple:
+        handler = _JOBS.get(job)
+        if handler is None:
+            return 'error', f'Unknown inference job: {job!r}'
+
+        if not self._slots.acquire(blocking=False):
+            return 'busy', None
+        try:
+            future = self._executor.submit(_run_job, job, args)
+        except Exception as exc:
+            self._slots.release()
+            return 'error', repr(exc)
+        future.add_done_callback(lambda _f: self._slots.release())
+
+        try:
+            return 'ok', future.result(timeout=timeout)
+        except FutureTimeout:
+            return 'timeout', None
+        except Exception as exc:
+            logger.exception('Inference job %s failed', job)
+            return 'error', repr(exc)
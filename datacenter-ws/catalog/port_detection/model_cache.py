@@ -4,29 +4,180 @@ YOLO model cache – singleton shared across all detection paths.
 Loading a YOLO model takes several seconds and allocates ~100 MB of GPU/CPU
 memory.  This module ensures the weights are loaded **at most once per
 process** and reloaded only when the weights file is replaced by a new
-training run (detected via mtime).
+training run.
 
 Both the batch endpoint (PortAnalyzeView) and the click endpoint
 (PortClickAnalyzeView) import :func:`get_yolo_model` from here, so the
 model is never resident twice in the same worker process.
+
+Hot swap
+────────
+Once a model is loaded, :func:`get_yolo_model` returns it without touching
+the filesystem or taking a lock.  A daemon watcher thread per process checks
+the weights file's identity (mtime + size) every ``PORT_MODEL_WATCH_INTERVAL``
+seconds; when it changes, the new weights are loaded **in the watcher
+thread** while requests keep using the old model, and the two are swapped
+with a single reference assignment.  :func:`install_weights` publishes a new
+checkpoint atomically (temp file + ``os.replace``), so a watcher never sees
+a half-written file, and wakes the local watcher immediately.
+
+Other processes keep serving the old weights until their watcher notices,
+so a result is attributed to the model that produced it, not to the file on
+disk: inside :func:`track_served` every model handed out – here, or in the
+inference service – is recorded as ``(load_path, identity)``, and the
+result cache only stores results whose models match :func:`disk_identity`.
+
+Backends
+────────
+``PORT_YOLO_BACKEND`` selects what is actually loaded for ``port-yolo.pt``:
+``'torch'`` (the ``.pt`` itself), ``'onnx'`` (``port-yolo.onnx``, ONNX
+Runtime) or ``'openvino'`` (``port-yolo_openvino_model/``).  The exported
+artefact is produced by :func:`publish_weights` after every training run
+and is loaded through ultralytics, so callers get the same ``Results``
+objects whichever backend serves them.  When the artefact is missing the
+``.pt`` is used.
 """
+import contextvars
+import logging
 import os
+import shutil
+import tempfile
 import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+# Trace size for exported artefacts; dynamic axes cover the 640–1280 px
+# inference sizes and batched input.
+EXPORT_IMGSZ = 1280
 
 
 class _YoloModelCache:
-    """Holds the singleton model instance and the weights file's identity
-    (path + mtime) used to detect that a new training run has replaced it."""
+    """Holds the singleton model and the identity of the weights it came from.
+
+    ``current`` is a ``(model_path, load_path, identity, model)`` tuple,
+    replaced as a whole so readers never see a model paired with another
+    file's path.  *load_path* is the artefact actually loaded for
+    *model_path* (see :func:`resolve_load_path`).
+    """
 
     def __init__(self):
-        self.model = None
-        self.path: str | None = None
-        self.mtime: float | None = None
-        self.lock = threading.Lock()
+        self.current: tuple | None = None
+        self.lock = threading.Lock()     # serialises cold loads and swaps
+        self.wake = threading.Event()
+        self.watcher_pid: int | None = None
+        self.failed_identity: tuple | None = None
 
 
 _cache = _YoloModelCache()
 
+# List collecting the models handed out inside the innermost track_served().
+_served = contextvars.ContextVar('port_yolo_served', default=None)
+
+
+def default_model_path() -> str:
+    """``<MEDIA_ROOT>/models/port-yolo.pt``."""
+    from .security import get_media_root
+    return os.path.join(get_media_root(), 'models', 'port-yolo.pt')
+
+
+def configured_backend() -> str:
+    """``PORT_YOLO_BACKEND``, falling back to ``'torch'`` if unknown."""
+    from django.conf import settings
+    backend = str(getattr(settings, 'PORT_YOLO_BACKEND', 'torch')).lower()
+    return backend if backend in BACKENDS else 'torch'
+
+
+def artifact_path(model_path: str, backend: str) -> str:
+    """Where ultralytics' export of *model_path* for *backend* lives."""
+    stem = os.path.splitext(model_path)[0]
+    if backend == 'onnx':
+        return f'{stem}.onnx'
+    if backend == 'openvino':
+        return f'{stem}_openvino_model'
+    return model_path
+
+
+def resolve_load_path(model_path: str, backend: str | None = None) -> str:
+    """The exported artefact for the configured backend, else *model_path*."""
+    backend = backend or configured_backend()
+    if backend != 'torch':
+        path = artifact_path(model_path, backend)
+        if os.path.exists(path):
+            return path
+    return model_path
+
+
+def loaded_backend(model_path: str) -> str:
+    """
+    The backend a fresh load of *model_path* runs on: the configured one
+    once its artefact exists, ``'torch'`` until then.
+    """
+    backend = configured_backend()
+    return backend if resolve_load_path(model_path, backend) != model_path else 'torch'
+
+
+def _identity(path: str) -> tuple | None:
+    if os.path.isdir(path):
+        # OpenVINO export directory: the .bin holds the weights.
+        stem = os.path.basename(path).removesuffix('_openvino_model')
+        path = os.path.join(path, f'{stem}.bin')
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _load_model(path: str):
+    from ultralytics import YOLO
+    return YOLO(path, task='detect')
+
+
+def load_uncached(model_path: str, backend: str):
+    """Load *model_path* on *backend* outside the cache (benchmarks)."""
+    path = resolve_load_path(model_path, backend)
+    if backend != 'torch' and path == model_path:
+        return None
+    return _load_model(path) if os.path.exists(path) else None
+
+
+def disk_identity(model_path: str | None) -> tuple | None:
+    """
+    ``(load_path, identity)`` of the model a fresh load of *model_path* would
+    serve, or *None* when there are no weights.
+    """
+    if not model_path or not os.path.isfile(model_path):
+        return None
+    load_path = resolve_load_path(model_path)
+    identity = _identity(load_path)
+    return (load_path, identity) if identity is not None else None
+
+
+@contextmanager
+def track_served():
+    """
+    Collect ``(load_path, identity)`` for every model :func:`get_yolo_model`
+    returns inside the block, into the list it yields.  Keep the block free
+    of ``yield`` (the context variable must be reset where it was set).
+    """
+    served = []
+    token = _served.set(served)
+    try:
+        yield served
+    finally:
+        _served.reset(token)
+
+
+def note_served(entries) -> None:
+    """Add *entries* (models used by another process) to the active tracker."""
+    served = _served.get()
+    if served is not None:
+        served.extend(tuple(entry) for entry in entries)
+
 
 def get_yolo_model(model_path: str | None = None):
     """
@@ -45,25 +196,175 @@ def get_yolo_model(model_path: str | None = None):
         first run before training has completed).
     """
     if model_path is None:
-        from .security import get_media_root
-        model_path = os.path.join(get_media_root(), 'models', 'port-yolo.pt')
+        model_path = default_model_path()
+
+    current = _cache.current
+    if current is not None and current[0] == model_path:
+        _ensure_watcher()
+        note_served([current[1:3]])
+        return current[3]
+
+    # Cold start (or a different weights file): nothing to serve meanwhile,
+    # so load synchronously.
+    with _cache.lock:
+        current = _cache.current
+        if current is None or current[0] != model_path:
+            if not os.path.isfile(model_path):
+                return None
+            load_path = resolve_load_path(model_path)
+            identity = _identity(load_path)
+            if identity is None:
+                return None
+            current = (model_path, load_path, identity, _load_model(load_path))
+            _cache.current = current
+    _ensure_watcher()
+    note_served([current[1:3]])
+    return current[3]
+
+
+def request_reload() -> None:
+    """Wake this process's watcher so it re-checks the weights file now."""
+    _cache.wake.set()
 
-    if not os.path.isfile(model_path):
-        return None
 
+def install_weights(src: str, dest: str) -> None:
+    """
+    Atomically publish the checkpoint *src* as *dest*.
+
+    The copy goes to a temporary file in the destination directory and is
+    renamed over *dest*, so readers see either the old or the new weights,
+    never a partial file.  The copy gets a fresh mtime, which is what the
+    watchers key on.
+    """
+    tmp = f'{dest}.tmp-{os.getpid()}'
     try:
-        mtime = os.path.getmtime(model_path)
-    except OSError:
-        return None
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    request_reload()
+
+
+def _replace_path(src: str, dest: str) -> None:
+    """``os.replace`` that also handles export directories."""
+    if not os.path.isdir(src):
+        os.replace(src, dest)
+        return
+    old = None
+    if os.path.exists(dest):
+        old = f'{dest}.old-{os.getpid()}'
+        os.replace(dest, old)
+    os.replace(src, dest)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def export_artifact(src: str, dest: str, backend: str) -> str:
+    """
+    Export checkpoint *src* for *backend* next to *dest* (``port-yolo.pt``).
+
+    The export runs in a scratch directory beside *dest* and the result is
+    moved into place in one rename, so watchers never load a partial file.
+    Returns the artefact path.
+    """
+    from ultralytics import YOLO
+
+    final = artifact_path(dest, backend)
+    workdir = tempfile.mkdtemp(prefix='.export-', dir=os.path.dirname(dest))
+    try:
+        tmp_pt = os.path.join(workdir, os.path.basename(dest))
+        shutil.copyfile(src, tmp_pt)
+        YOLO(tmp_pt).export(format=backend, imgsz=EXPORT_IMGSZ, dynamic=True)
+        _replace_path(artifact_path(tmp_pt, backend), final)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return final
+
+
+def publish_weights(src: str, dest: str) -> None:
+    """
+    Publish a freshly trained checkpoint: export it for the configured
+    backend, then install the ``.pt``.
+
+    The artefact goes first, so a watcher that sees the new ``.pt`` also
+    finds its artefact.  If the export fails, the stale artefact is removed
+    and workers fall back to the ``.pt``.  Processes that still serve the
+    old model meanwhile cannot pollute the new weights' cache entries:
+    :func:`catalog.port_detection.result_cache.store` checks which model
+    produced a result (:func:`track_served`).
+    """
+    backend = configured_backend()
+    if backend != 'torch':
+        try:
+            path = export_artifact(src, dest, backend)
+            logger.info('Exported %s weights to %s', backend, path)
+        except Exception:
+            logger.exception('Export to %s failed; serving the .pt weights', backend)
+            stale = artifact_path(dest, backend)
+            if os.path.isdir(stale):
+                shutil.rmtree(stale, ignore_errors=True)
+            elif os.path.exists(stale):
+                os.remove(stale)
+    install_weights(src, dest)
+
+
+def _ensure_watcher() -> None:
+    pid = os.getpid()
+    if _cache.watcher_pid == pid:
+        return
+    with _cache.lock:
+        # Also restarts the watcher in forked children (threads do not
+        # survive fork).
+        if _cache.watcher_pid == pid:
+            return
+        _cache.watcher_pid = pid
+        threading.Thread(
+            target=_watch, daemon=True, name='port-yolo-watcher').start()
+
+
+def _watch_interval() -> float:
+    from django.conf import settings
+    return float(getattr(settings, 'PORT_MODEL_WATCH_INTERVAL', 5))
+
+
+def _watch() -> None:
+    while True:
+        _cache.wake.wait(_watch_interval())
+        _cache.wake.clear()
+        try:
+            _check_for_new_weights()
+        except Exception:
+            logger.exception('YOLO weights watcher failed')
+
+
+def _check_for_new_weights() -> None:
+    """Reload in the calling (watcher) thread, then swap under the lock."""
+    current = _cache.current
+    if current is None:
+        return
+    model_path, load_path, identity, _ = current
+    new_load_path = (resolve_load_path(model_path)
+                     if os.path.isfile(model_path) else model_path)
+    new_identity = _identity(new_load_path)
+    if (new_load_path, new_identity) == (load_path, identity) or (
+            new_identity is not None
+            and (new_load_path, new_identity) == _cache.failed_identity):
+        return
+
+    model = None
+    if new_identity is not None:
+        try:
+            model = _load_model(new_load_path)
+        except Exception:
+            # Keep serving the old model; retry when the file changes again.
+            logger.exception('Could not load new YOLO weights from %s', new_load_path)
+            _cache.failed_identity = (new_load_path, new_identity)
+            return
+        logger.info('Loaded new YOLO weights from %s', new_load_path)
 
     with _cache.lock:
-        if (
-            _cache.model is None
-            or _cache.path != model_path
-            or _cache.mtime != mtime
-        ):
-            from ultralytics import YOLO
-            _cache.model = YOLO(model_path)
-            _cache.path = model_path
-            _cache.mtime = mtime
-        return _cache.model
+        if _cache.current is current:   # nobody switched paths meanwhile
+            _cache.current = (
+                (model_path, new_load_path, new_identity, model)
+                if model is not None else None)
@@ -1,5 +1,8 @@
 """
 Port naming: group detections by type and assign row-aware sequential names.
+
+:func:`apply_ocr_labels` can then replace template names with the labels
+actually printed on the panel, read by one whole-image OCR pass.
 """
 from .constants import PORT_CONFIG, PORT_NAME_TEMPLATES
 
@@ -70,3 +73,62 @@ def assign_names(ports: list) -> list:
     for pt, items in by_type.items():
         _name_group(items, PORT_NAME_TEMPLATES.get(pt, '{}'))
     return ports
+
+
+def apply_ocr_labels(ports: list, text_entry: dict | None,
+                     max_pitch: float = 0.75) -> int:
+    """
+    Rename *ports* after the port labels recognised on the panel.
+
+    *text_entry* is :func:`.ocr.image_text_boxes` output.  Text boxes that
+    look like port names (:func:`.ocr.is_port_name`) are indexed in a k-d
+    tree; each port claims its nearest free label within ``max_pitch`` ×
+    the median distance between neighbouring ports (closest pairs first,
+    each label used once).  Unmatched ports keep their template names, so
+    call this after :func:`assign_names`.
+
+    Returns the number of ports renamed.
+    """
+    if not ports or not text_entry:
+        return 0
+
+    import numpy as np
+    from scipy.spatial import cKDTree
+
+    from .ocr import is_port_name
+
+    w, h = text_entry['width'], text_entry['height']
+    labels = [b for b in text_entry['boxes'] if is_port_name(b[2])]
+    if not labels:
+        return 0
+
+    port_xy = np.array([[p['pos_x'] / 100.0 * w, p['pos_y'] / 100.0 * h]
+                        for p in ports])
+    if len(ports) > 1:
+        pitch = float(np.median(cKDTree(port_xy).query(port_xy, k=2)[0][:, 1]))
+    else:
+        pitch = 0.05 * max(w, h)
+    radius = max_pitch * pitch
+    if radius <= 0:
+        return 0
+
+    tree = cKDTree(np.array([b[:2] for b in labels], dtype=np.float64))
+    k = min(4, len(labels))
+    dists, idxs = tree.query(port_xy, k=k, distance_upper_bound=radius)
+    if k == 1:
+        dists, idxs = dists[:, None], idxs[:, None]
+
+    pairs = sorted(
+        (float(d), pi, int(li))
+        for pi, (row_d, row_i) in enumerate(zip(dists, idxs))
+        for d, li in zip(row_d, row_i)
+        if np.isfinite(d)
+    )
+    taken_ports, taken_labels = set(), set()
+    for _, pi, li in pairs:
+        if pi in taken_ports or li in taken_labels:
+            continue
+        ports[pi]['name'] = labels[li][2]
+        taken_ports.add(pi)
+        taken_labels.add(li)
+    return len(taken_ports)
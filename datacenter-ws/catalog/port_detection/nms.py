@@ -8,10 +8,142 @@ Three complementary algorithms handle duplicate/near-duplicate detections:
    residual near-duplicates that survive NMS because their IoU is too low.
 3. :func:`reclassify_by_cluster` – row-majority-vote type correction;
    fixes isolated misclassifications caused by ambiguous aspect ratios.
+
+The work is done on parallel NumPy arrays (``*_indices`` functions: centres,
+sizes and confidences in, kept indices out) with vectorised overlap /
+distance computations – per accepted box for NMS, whose input can be
+thousands of contours, pairwise within a row for the grid pass; the
+dict-based functions above are thin adapters
+that return the original detection dicts.  All sorts are stable, so ties
+resolve exactly as the former pure-Python implementation did.
 """
 from .constants import DEFAULT_BW, DEFAULT_BH
 
 
+# ── Array helpers ──────────────────────────────────────────────────────────────
+
+def _field(detections: list, key: str):
+    """Extract *key* from every detection dict as a float64 array."""
+    import numpy as np
+    return np.fromiter((d[key] for d in detections), dtype=np.float64,
+                       count=len(detections))
+
+
+def _box_sizes(detections: list):
+    """``(_bw_pct, _bh_pct)`` arrays, defaulting per port type when absent."""
+    import numpy as np
+    bw = np.empty(len(detections))
+    bh = np.empty(len(detections))
+    for i, d in enumerate(detections):
+        pt = d.get('port_type', 'RJ45')
+        bw[i] = d.get('_bw_pct', DEFAULT_BW.get(pt, 4.0))
+        bh[i] = d.get('_bh_pct', DEFAULT_BH.get(pt, 5.0))
+    return bw, bh
+
+
+def _greedy_keep(conflict, max_keep: int | None = None) -> list:
+    """
+    Greedy selection over candidates already in priority order: accept each
+    candidate unless it conflicts with one accepted before it.  *conflict* is
+    a symmetric boolean matrix in that same order.
+    """
+    import numpy as np
+    suppressed = np.zeros(conflict.shape[0], dtype=bool)
+    kept: list = []
+    for i in range(conflict.shape[0]):
+        if suppressed[i]:
+            continue
+        kept.append(i)
+        if max_keep is not None and len(kept) >= max_keep:
+            break
+        suppressed |= conflict[i]
+    return kept
+
+
+def row_clusters(ys) -> list:
+    """
+    Split detections into horizontal rows by their Y centres.
+
+    Rows break where the gap between consecutive Y values exceeds
+    ``max(8, 2 × median gap)``.  Returns one index array per row, in
+    ascending Y (stable for equal Y).
+    """
+    import numpy as np
+    order = np.argsort(ys, kind='stable')
+    gaps = np.diff(ys[order])
+    median_gap = float(np.sort(gaps)[len(gaps) // 2]) if len(gaps) else 1.0
+    row_threshold = max(8.0, median_gap * 2.0)
+    return np.split(order, np.flatnonzero(gaps > row_threshold) + 1)
+
+
+# ── Array API ──────────────────────────────────────────────────────────────────
+
+def bbox_nms_indices(cx, cy, bw, bh, conf, iou_thresh: float = 0.30,
+                     max_det: int = 96):
+    """
+    Array form of :func:`bbox_nms`.
+
+    Greedy pass in descending confidence; each accepted box is compared
+    with the still-unsuppressed boxes after it in one vectorised step, so
+    memory stays O(n) and work O(n · max_det) even for thousands of OpenCV
+    contour candidates.  Returns the kept indices in that order.
+    """
+    import numpy as np
+    order = np.argsort(-conf, kind='stable')
+    cx, cy, bw, bh = cx[order], cy[order], bw[order], bh[order]
+    x1, y1, x2, y2 = cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2
+    area = bw * bh
+
+    alive = np.ones(len(order), dtype=bool)
+    kept: list = []
+    for i in range(len(order)):
+        if not alive[i]:
+            continue
+        kept.append(i)
+        if max_det is not None and len(kept) >= max_det:
+            break
+        rest = np.flatnonzero(alive[i + 1:]) + (i + 1)
+        if not rest.size:
+            break
+        iw = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+        ih = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+        inter = iw * ih
+        union = (area[i] + area[rest]) - inter
+        min_area = np.minimum(area[i], area[rest])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            iou = np.where(union > 0, inter / union, 0.0)
+            iomin = np.where(min_area > 0, inter / min_area, 0.0)
+        conflict = (iw > 0) & (ih > 0) & ((iou > iou_thresh) | (iomin > 0.60))
+        alive[rest[conflict]] = False
+
+    return order[kept]
+
+
+def deduplicate_by_grid_indices(xs, ys, conf):
+    """Array form of :func:`deduplicate_by_grid`; returns a keep mask."""
+    import numpy as np
+    keep = np.zeros(len(xs), dtype=bool)
+    for row in row_clusters(ys):
+        row_x = row[np.argsort(xs[row], kind='stable')]
+        if len(row_x) < 2:
+            keep[row_x] = True
+            continue
+
+        x_gaps = np.diff(xs[row_x])
+        med_xg = float(np.sort(x_gaps)[len(x_gaps) // 2])
+        min_dist = max(0.5, med_xg * 0.5)
+
+        # Greedy: accept highest-confidence port first; skip if too close to any
+        # already-accepted port in this row.
+        by_conf = row_x[np.argsort(-conf[row_x], kind='stable')]
+        rx = xs[by_conf]
+        conflict = np.abs(rx[:, None] - rx[None, :]) < min_dist
+        keep[by_conf[_greedy_keep(conflict)]] = True
+    return keep
+
+
+# ── Dict API ───────────────────────────────────────────────────────────────────
+
 def bbox_nms(candidates: list, iou_thresh: float = 0.30,
              max_det: int = 96) -> list:
     """
@@ -37,44 +169,12 @@ def bbox_nms(candidates: list, iou_thresh: float = 0.30,
     if not candidates:
         return candidates
 
-    ordered = sorted(candidates, key=lambda c: c['confidence'], reverse=True)
-    final: list = []
-
-    for c in ordered:
-        cx, cy = c['pos_x'], c['pos_y']
-        pt = c.get('port_type', 'RJ45')
-        bw = c.get('_bw_pct', DEFAULT_BW.get(pt, 4.0))
-        bh = c.get('_bh_pct', DEFAULT_BH.get(pt, 5.0))
-        x1, y1, x2, y2 = cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2
-
-        overlaps = False
-        for f in final:
-            fx, fy = f['pos_x'], f['pos_y']
-            fpt = f.get('port_type', 'RJ45')
-            fbw = f.get('_bw_pct', DEFAULT_BW.get(fpt, 4.0))
-            fbh = f.get('_bh_pct', DEFAULT_BH.get(fpt, 5.0))
-            fx1, fy1 = fx - fbw / 2, fy - fbh / 2
-            fx2, fy2 = fx + fbw / 2, fy + fbh / 2
-
-            ix1 = max(x1, fx1)
-            iy1 = max(y1, fy1)
-            ix2 = min(x2, fx2)
-            iy2 = min(y2, fy2)
-            if ix2 <= ix1 or iy2 <= iy1:
-                continue
-            inter = (ix2 - ix1) * (iy2 - iy1)
-            union = bw * bh + fbw * fbh - inter
-            iou = inter / union if union > 0 else 0.0
-            min_area = min(bw * bh, fbw * fbh)
-            iomin = inter / min_area if min_area > 0 else 0.0
-            if iou > iou_thresh or iomin > 0.60:
-                overlaps = True
-                break
-
-        if not overlaps:
-            final.append(c)
-        if len(final) >= max_det:
-            break
+    bw, bh = _box_sizes(candidates)
+    kept = bbox_nms_indices(
+        _field(candidates, 'pos_x'), _field(candidates, 'pos_y'), bw, bh,
+        _field(candidates, 'confidence'), iou_thresh, max_det,
+    )
+    final = [candidates[i] for i in kept]
 
     for c in final:
         c.pop('_bw_pct', None)
@@ -97,43 +197,11 @@ def deduplicate_by_grid(detections: list) -> list:
     if len(detections) < 3:
         return detections
 
-    by_y = sorted(detections, key=lambda c: c['pos_y'])
-    y_vals = [c['pos_y'] for c in by_y]
-    gaps = [y_vals[i + 1] - y_vals[i] for i in range(len(y_vals) - 1)]
-    median_gap = sorted(gaps)[len(gaps) // 2] if gaps else 1.0
-    row_threshold = max(8.0, median_gap * 2.0)
-
-    rows: list = []
-    current: list = [by_y[0]]
-    for i, c in enumerate(by_y[1:]):
-        if gaps[i] > row_threshold:
-            rows.append(current)
-            current = [c]
-        else:
-            current.append(c)
-    rows.append(current)
-
-    keep: set = set()
-    for row in rows:
-        row_x = sorted(row, key=lambda c: c['pos_x'])
-        if len(row_x) < 2:
-            keep.update(id(c) for c in row_x)
-            continue
-
-        xs = [c['pos_x'] for c in row_x]
-        x_gaps = [xs[i + 1] - xs[i] for i in range(len(xs) - 1)]
-        med_xg = sorted(x_gaps)[len(x_gaps) // 2]
-        min_dist = max(0.5, med_xg * 0.5)
-
-        # Greedy: accept highest-confidence port first; skip if too close to any
-        # already-accepted port in this row.
-        kept: list = []
-        for c in sorted(row_x, key=lambda c: c['confidence'], reverse=True):
-            if not any(abs(c['pos_x'] - k['pos_x']) < min_dist for k in kept):
-                kept.append(c)
-        keep.update(id(c) for c in kept)
-
-    return [c for c in detections if id(c) in keep]
+    keep = deduplicate_by_grid_indices(
+        _field(detections, 'pos_x'), _field(detections, 'pos_y'),
+        _field(detections, 'confidence'),
+    )
+    return [c for c, k in zip(detections, keep) if k]
 
 
 def reclassify_by_cluster(detections: list) -> list:
@@ -155,52 +223,36 @@ def reclassify_by_cluster(detections: list) -> list:
     3. If ≥ 65 % of ports in a uniform row share one type, reassign ALL
        ports in that row to the dominant type.
     """
-    if len(detections) < 4:
-        return detections
+    import numpy as np
 
-    by_y = sorted(detections, key=lambda c: c['pos_y'])
-    y_vals = [c['pos_y'] for c in by_y]
-    gaps = [y_vals[i + 1] - y_vals[i] for i in range(len(y_vals) - 1)]
-    if not gaps:
+    if len(detections) < 4:
         return detections
 
-    median_gap = sorted(gaps)[len(gaps) // 2]
-    row_threshold = max(8.0, median_gap * 2.0)
-
-    rows: list = []
-    current: list = [by_y[0]]
-    for i, c in enumerate(by_y[1:]):
-        if gaps[i] > row_threshold:
-            rows.append(current)
-            current = [c]
-        else:
-            current.append(c)
-    rows.append(current)
-
-    for row in rows:
+    xs = _field(detections, 'pos_x')
+    for row in row_clusters(_field(detections, 'pos_y')):
         if len(row) < 4:
             continue
 
-        xs = sorted(c['pos_x'] for c in row)
-        x_gaps = [xs[i + 1] - xs[i] for i in range(len(xs) - 1)]
-        if not x_gaps:
-            continue
-        mean_xg = sum(x_gaps) / len(x_gaps)
+        x_gaps = np.diff(np.sort(xs[row]))
+        # Scalar reductions stay on Python floats (builtin sum) so the
+        # uniformity threshold sees exactly the same values as before.
+        mean_xg = sum(x_gaps.tolist()) / len(x_gaps)
         if mean_xg < 0.5:
             continue  # degenerate: all ports at same X position
-        variance = sum((g - mean_xg) ** 2 for g in x_gaps) / len(x_gaps)
+        variance = sum(((x_gaps - mean_xg) ** 2).tolist()) / len(x_gaps)
         cv = (variance ** 0.5) / mean_xg
         if cv > 0.35:
             continue  # non-uniform spacing → mixed panel section, skip
 
+        members = [detections[i] for i in row]
         type_counts: dict = {}
-        for c in row:
+        for c in members:
             type_counts[c['port_type']] = type_counts.get(
                 c['port_type'], 0) + 1
 
         dominant = max(type_counts, key=lambda t: type_counts[t])
-        if type_counts[dominant] / len(row) >= 0.65:
-            for c in row:
+        if type_counts[dominant] / len(members) >= 0.65:
+            for c in members:
                 c['port_type'] = dominant
 
     return detections
@@ -8,10 +8,17 @@ string (or *None* if nothing credible is found).
 The reader is initialised lazily and cached in a module-level singleton so it
 is not re-created on every request.
 """
+import os
 import re
+import time
+
+from .timing import Laps, stage
 
 _ocr_reader = None
 
+# Half-size of the window searched for a click's label (fraction of image).
+_LABEL_PAD = 0.18
+
 # Pattern: recognisable port-label formats (numeric, interface notation, etc.)
 _PORT_NAME_RE = re.compile(
     r'^('
@@ -40,14 +47,33 @@ def is_port_name(text: str) -> bool:
     return bool(_PORT_NAME_RE.match(text))
 
 
-def _ocr_on_image(reader, ocr_img, cx: float, cy: float):
+def _score(text: str, conf: float, dist: float, max_dist: float) -> float:
     """
-    Run EasyOCR on *ocr_img* and return ``(text, score)`` for the best match.
-
     Score = confidence × proximity_weight + pattern_bonus.
-    Proximity is normalised to the larger image dimension so text near the
-    click point is preferred.  A +0.15 bonus is given for text that matches
-    the port-name pattern.
+
+    Proximity is normalised to *max_dist* (0.70 × the larger crop dimension)
+    so text near the click point is preferred.  A +0.15 bonus is given for
+    text that matches the port-name pattern.
+    """
+    proximity = max(0.0, 1.0 - dist / max_dist)
+    pattern_bonus = 0.15 if is_port_name(text) else 0.0
+    return conf * (0.35 + 0.65 * proximity) + pattern_bonus
+
+
+def _accept(candidates: list):
+    """Best ``(text, score)`` of *candidates* if it clears the threshold."""
+    if not candidates:
+        return None
+    best_text, best_score = max(candidates, key=lambda r: r[1])
+    # Lower threshold when the text matches a known port-name pattern.
+    threshold = 0.10 if is_port_name(best_text) else 0.18
+    return best_text if best_score > threshold else None
+
+
+def _ocr_on_image(reader, ocr_img, cx: float, cy: float):
+    """
+    Run EasyOCR on *ocr_img* and return ``(text, score)`` for the best match
+    (see :func:`_score`).
     """
     h, w = ocr_img.shape[:2]
     max_dist = max(w, h) * 0.70
@@ -60,9 +86,7 @@ def _ocr_on_image(reader, ocr_img, cx: float, cy: float):
         bx = (bbox[0][0] + bbox[2][0]) / 2
         by = (bbox[0][1] + bbox[2][1]) / 2
         dist = ((bx - cx) ** 2 + (by - cy) ** 2) ** 0.5
-        proximity = max(0.0, 1.0 - dist / max_dist)
-        pattern_bonus = 0.15 if is_port_name(text) else 0.0
-        score = conf * (0.35 + 0.65 * proximity) + pattern_bonus
+        score = _score(text, conf, dist, max_dist)
         if score > best_score:
             best_score = score
             best = (text, score)
@@ -78,6 +102,10 @@ def read_label_ocr(abs_path: str, click_x: float, click_y: float):
     2. Inverted image upscaled – catches white-on-dark labels.
     3. Denoised grayscale upscaled – baseline.
 
+    With ``PORT_OCR_WHOLE_IMAGE`` the strategies run once over the whole
+    panel instead (:func:`image_text_boxes`, cached per image) and each
+    click is answered by a lookup among the recognised text boxes.
+
     Parameters
     ----------
     abs_path:
@@ -90,21 +118,28 @@ def read_label_ocr(abs_path: str, click_x: float, click_y: float):
     str | None
         The recognised label text, or *None* if nothing credible was found.
     """
+    if whole_image_enabled():
+        return _read_label_from_boxes(abs_path, click_x, click_y)
+
     try:
         import cv2
 
-        img = cv2.imread(abs_path)
+        from .image_cache import load_image
+        img = load_image(abs_path)
         if img is None:
             return None
+        laps = Laps()
 
         from .click_detector import _crop_around_click
         # Slightly larger crop to capture labels at the edges of the port opening.
         crop_raw, _, _, crop_cx_raw, crop_cy_raw = _crop_around_click(
-            img, click_x, click_y, pad_pct=0.18)
+            img, click_x, click_y, pad_pct=_LABEL_PAD)
         if crop_raw.size == 0:
             return None
+        laps.mark('ocr.preprocess')
 
         reader = _get_ocr_reader()
+        laps.mark('ocr.load')
 
         def _upscale_gray(gray_img, min_w=650):
             h, w = gray_img.shape[:2]
@@ -125,29 +160,212 @@ def read_label_ocr(abs_path: str, click_x: float, click_y: float):
         clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(4, 4))
         gray_cl = clahe.apply(gray)
         gray_cl, scale1 = _upscale_gray(gray_cl)
+        laps.mark('ocr.preprocess')
         r1 = _ocr_on_image(reader, _to_bgr(gray_cl),
                            crop_cx_raw * scale1, crop_cy_raw * scale1)
+        laps.mark('ocr.read')
 
         # ── Strategy 2: inverted (white text on dark background) ─────────────
         gray_inv = cv2.bitwise_not(gray_cl)
+        laps.mark('ocr.preprocess')
         r2 = _ocr_on_image(reader, _to_bgr(gray_inv),
                            crop_cx_raw * scale1, crop_cy_raw * scale1)
+        laps.mark('ocr.read')
 
         # ── Strategy 3: denoised grayscale ───────────────────────────────────
         gray_dn = cv2.fastNlMeansDenoising(gray, h=7)
         gray_dn, scale3 = _upscale_gray(gray_dn)
+        laps.mark('ocr.preprocess')
         r3 = _ocr_on_image(reader, _to_bgr(gray_dn),
                            crop_cx_raw * scale3, crop_cy_raw * scale3)
+        laps.mark('ocr.read')
 
-        candidates = [r for r in (r1, r2, r3) if r is not None]
-        if not candidates:
-            return None
+        return _accept([r for r in (r1, r2, r3) if r is not None])
+
+    except Exception:
+        return None
+
+
+# ── Whole-image mode ───────────────────────────────────────────────────────────
+#
+# Mapping a panel means clicking every port, and the per-click path OCRs an
+# overlapping crop three times per click (fastNlMeansDenoising included).
+# Here the three strategies run once over the whole panel; the text boxes
+# are cached by image content and every click becomes a lookup.
+
+# Bump when the box extraction changes, to orphan cached entries.
+_TEXT_BOXES_VERSION = 1
+
+# Per-click crops (0.36 × width) were upscaled to ≥ 650 px, i.e. the panel
+# is read at ~1800 px wide; very large photos are capped.
+_WHOLE_MIN_WIDTH = 1800
+_WHOLE_MAX_SIDE = 4096
+
+# How long a request waits for another one already reading the same photo
+# before running OCR itself (also the lifetime of the lock entry).
+_OCR_LOCK_TIMEOUT = 120
+_OCR_LOCK_POLL = 0.1
+
+
+def whole_image_enabled() -> bool:
+    from django.conf import settings
+    return bool(getattr(settings, 'PORT_OCR_WHOLE_IMAGE', False))
+
+
+def _read_boxes(reader, ocr_img, scale: float) -> list:
+    """``[cx, cy, text, conf]`` per text box, in original image pixels."""
+    boxes = []
+    for bbox, text, conf in reader.readtext(ocr_img, detail=1, paragraph=False):
+        text = text.strip()
+        if text:
+            boxes.append([
+                (bbox[0][0] + bbox[2][0]) / 2 / scale,
+                (bbox[0][1] + bbox[2][1]) / 2 / scale,
+                text,
+                float(conf),
+            ])
+    return boxes
+
+
+def _ocr_whole_image(img) -> list:
+    """Run the three per-click strategies over the whole image."""
+    import cv2
 
-        best_text, best_score = max(candidates, key=lambda r: r[1])
+    laps = Laps()
+    h, w = img.shape[:2]
+    scale = min(max(1.0, _WHOLE_MIN_WIDTH / w), _WHOLE_MAX_SIDE / max(h, w))
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        # Lower threshold when the text matches a known port-name pattern.
-        threshold = 0.10 if is_port_name(best_text) else 0.18
-        return best_text if best_score > threshold else None
+    def _resize(gray_img):
+        if scale == 1.0:
+            return gray_img
+        return cv2.resize(
+            gray_img, (int(w * scale), int(h * scale)),
+            interpolation=cv2.INTER_CUBIC if scale > 1.0 else cv2.INTER_AREA)
 
+    def _to_bgr(gray_img):
+        return cv2.cvtColor(gray_img, cv2.COLOR_GRAY2BGR)
+
+    # CLAHE and non-local-means denoising cost grows with the pixel count:
+    # shrink large photos first, upscale small ones only afterwards.
+    if scale < 1.0:
+        gray = _resize(gray)
+        after = None
+    else:
+        after = _resize
+
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    gray_cl = clahe.apply(gray)
+    gray_dn = cv2.fastNlMeansDenoising(gray, h=7)
+    if after is not None:
+        gray_cl, gray_dn = after(gray_cl), after(gray_dn)
+    laps.mark('ocr.preprocess')
+
+    reader = _get_ocr_reader()
+    laps.mark('ocr.load')
+
+    boxes = []
+    for variant in (gray_cl, cv2.bitwise_not(gray_cl), gray_dn):
+        boxes.extend(_read_boxes(reader, _to_bgr(variant), scale))
+    laps.mark('ocr.read')
+    return boxes
+
+
+def image_text_boxes(abs_path: str) -> dict | None:
+    """
+    ``{'width', 'height', 'boxes'}`` for the whole image, where *boxes* are
+    ``[cx, cy, text, conf]`` from all three strategies.
+
+    Cached in the ``port_analysis`` cache by image digest.  With a shared
+    backend (``USE_REDIS_CACHE``) every worker and the batch naming pass
+    share one OCR run per photo; the default LocMemCache is per process.
+    A lock entry in the same cache makes concurrent first requests for a
+    photo wait for the one already reading it instead of each running a
+    full pass.  *None* when the image cannot be read.
+    """
+    from django.core.cache import caches
+
+    from .result_cache import CACHE_ALIAS, file_digest
+
+    digest = file_digest(abs_path)
+    if digest is None:
+        return None
+    cache = caches[CACHE_ALIAS]
+    key = f'ocr:v{_TEXT_BOXES_VERSION}:{digest}'
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + _OCR_LOCK_TIMEOUT
+    while not cache.add(lock_key, os.getpid(), _OCR_LOCK_TIMEOUT):
+        time.sleep(_OCR_LOCK_POLL)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        if time.monotonic() > deadline:
+            # The holder died or is stuck: read the photo ourselves.
+            return _read_text_boxes(abs_path, cache, key)
+    try:
+        # Filled between our first lookup and taking the lock.
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        return _read_text_boxes(abs_path, cache, key)
+    finally:
+        cache.delete(lock_key)
+
+
+def _read_text_boxes(abs_path: str, cache, key: str) -> dict | None:
+    from .image_cache import load_image
+
+    img = load_image(abs_path)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    entry = {'width': w, 'height': h, 'boxes': _ocr_whole_image(img)}
+    cache.set(key, entry)
+    return entry
+
+
+def label_near(entry: dict, click_x: float, click_y: float):
+    """
+    Best label for a click (percent coordinates) among cached text boxes.
+
+    Only boxes inside the window the per-click path would have cropped are
+    considered, scored exactly like it (:func:`_score`).
+    """
+    import numpy as np
+
+    boxes = entry['boxes']
+    if not boxes:
+        return None
+    w, h = entry['width'], entry['height']
+    cx, cy = int(click_x / 100.0 * w), int(click_y / 100.0 * h)
+    pad_x, pad_y = int(w * _LABEL_PAD), int(h * _LABEL_PAD)
+    x1, y1 = max(0, cx - pad_x), max(0, cy - pad_y)
+    x2, y2 = min(w, cx + pad_x), min(h, cy + pad_y)
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    centres = np.array([b[:2] for b in boxes], dtype=np.float64)
+    inside = np.flatnonzero(
+        (centres[:, 0] >= x1) & (centres[:, 0] < x2)
+        & (centres[:, 1] >= y1) & (centres[:, 1] < y2))
+    dists = np.hypot(centres[inside, 0] - cx, centres[inside, 1] - cy)
+    max_dist = max(x2 - x1, y2 - y1) * 0.70
+    return _accept([
+        (boxes[i][2], _score(boxes[i][2], boxes[i][3], float(d), max_dist))
+        for i, d in zip(inside, dists)
+    ])
+
+
+def _read_label_from_boxes(abs_path: str, click_x: float, click_y: float):
+    try:
+        entry = image_text_boxes(abs_path)
+        if entry is None:
+            return None
+        with stage('ocr.lookup'):
+            return label_near(entry, click_x, click_y)
     except Exception:
         return None
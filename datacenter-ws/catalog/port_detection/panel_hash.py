@@ -0,0 +1,210 @@
+"""
+Perceptual-hash index of AssetModel panel images.
+
+Many catalog models are variants of one chassis photographed (or supplied
+by the vendor) identically, and one of them usually already has its ports
+mapped.  Each model image is indexed by a 64-bit difference hash
+(:class:`catalog.models.PanelHash`); when a new image is analysed,
+:func:`find_layout` looks for an indexed panel within
+``PORT_LAYOUT_MATCH_DISTANCE`` bits (Hamming) that has positioned ports on
+that side, and returns that layout so detection can be skipped.
+
+dHash compares adjacent pixels of a 9 × 8 greyscale thumbnail, so it is
+insensitive to resolution, JPEG re-encoding and mild exposure changes, but
+not to a different crop – exactly the "same photo, another SKU" case.
+
+Hashes are stored as integers together with their four 16-bit bands.  Two
+hashes within *d* bits differ in at most ``d // 4`` bits of at least one
+band (pigeonhole), so :func:`find_layout` asks the database only for rows
+with a band that close to the query's – an indexed ``IN`` over a few dozen
+values per band – and computes exact distances for those alone.
+
+Hashes are computed by the upload pre-analysis task
+(``catalog.preanalyze_ports``) and, for an existing catalog, by
+``manage.py index_panel_hashes``.
+"""
+import logging
+import os
+from functools import lru_cache
+from itertools import combinations
+
+from django.conf import settings
+
+from .image_cache import load_image
+from .security import resolve_safe_path
+from .timing import stage
+
+logger = logging.getLogger(__name__)
+
+SIDES = ('front', 'rear')
+
+
+def dhash(img) -> int:
+    """64-bit difference hash of a BGR (or greyscale) image array."""
+    import cv2
+    import numpy as np
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+BANDS = 4
+_BAND_BITS = 16
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+# Widest band neighbourhood queried (137 values per band at 2 bits); larger
+# thresholds (PORT_LAYOUT_MATCH_DISTANCE >= 12) scan the whole index.
+_MAX_BAND_RADIUS = 2
+
+
+@lru_cache(maxsize=1024)
+def _image_dhash(path: str, mtime_ns: int, size: int) -> int | None:
+    img = load_image(path)
+    if img is None:
+        return None
+    return dhash(img)
+
+
+def image_dhash(path: str) -> int | None:
+    """dHash of the image at *path*, or *None* if it cannot be decoded."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _image_dhash(path, st.st_mtime_ns, st.st_size)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes (signed or unsigned)."""
+    return ((a ^ b) & _HASH_MASK).bit_count()
+
+
+def to_signed(value: int) -> int:
+    """*value* as stored in ``PanelHash.dhash`` (a signed 64-bit column)."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def bands(value: int) -> list[int]:
+    """The four 16-bit bands of hash *value*, lowest first."""
+    value &= _HASH_MASK
+    return [(value >> (i * _BAND_BITS)) & _BAND_MASK for i in range(BANDS)]
+
+
+def _near(band: int, radius: int) -> list[int]:
+    """Every 16-bit value within *radius* bits of *band*."""
+    values = [band]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(_BAND_BITS), flips):
+            values.append(band ^ sum(1 << bit for bit in bits))
+    return values
+
+
+def max_distance() -> int:
+    """Match threshold in bits; negative disables layout matching."""
+    return int(getattr(settings, 'PORT_LAYOUT_MATCH_DISTANCE', 6))
+
+
+# ── Index maintenance ─────────────────────────────────────────────────────────
+
+def index_model(asset_model) -> int:
+    """
+    (Re)hash the front / rear images of *asset_model*.
+
+    Sides without an image lose their row.  Returns the number of rows
+    written.
+    """
+    from catalog.models import PanelHash
+
+    written = 0
+    for side in SIDES:
+        image = getattr(asset_model, f'{side}_image')
+        abs_path = resolve_safe_path(image.name) if image else None
+        value = image_dhash(abs_path) if abs_path else None
+        if value is None:
+            PanelHash.objects.filter(asset_model=asset_model, side=side).delete()
+            continue
+        PanelHash.objects.update_or_create(
+            asset_model=asset_model,
+            side=side,
+            defaults={
+                'image_name': image.name,
+                'dhash': to_signed(value),
+                **{f'band{i}': band for i, band in enumerate(bands(value))},
+            },
+        )
+        written += 1
+    return written
+
+
+def index_upload(image_name: str) -> None:
+    """Re-index every AssetModel whose front or rear image is *image_name*."""
+    from django.db.models import Q
+    from catalog.models import AssetModel
+
+    for asset_model in AssetModel.objects.filter(
+            Q(front_image=image_name) | Q(rear_image=image_name)):
+        index_model(asset_model)
+
+
+# ── Lookup ────────────────────────────────────────────────────────────────────
+
+def _candidates(value: int, limit: int):
+    """PanelHash rows that can be within *limit* bits of *value*."""
+    from django.db.models import Q
+    from catalog.models import PanelHash
+
+    rows = PanelHash.objects.select_related('asset_model')
+    radius = limit // BANDS
+    if radius > _MAX_BAND_RADIUS:
+        return rows
+    near = Q()
+    for i, band in enumerate(bands(value)):
+        near |= Q(**{f'band{i}__in': _near(band, radius)})
+    return rows.filter(near)
+
+
+def find_layout(abs_image_path: str, image_name: str = '') -> list | None:
+    """
+    Port layout of the closest indexed panel, or *None* when none is within
+    :func:`max_distance` (or the closest matches have no positioned ports).
+
+    *image_name* (the requested path relative to MEDIA_ROOT) excludes the
+    image's own index row, so re-analysing a mapped model still runs
+    detection.  Returned ports have the PortAnalyzeView shape plus
+    ``matched_model`` (the AssetModel id the layout comes from).
+    """
+    from catalog.models import AssetModelPort
+
+    limit = max_distance()
+    if limit < 0:
+        return None
+    with stage('layout'):
+        value = image_dhash(abs_image_path)
+        if value is None:
+            return None
+        rows = _candidates(value, limit).exclude(image_name=image_name)
+        candidates = sorted(
+            ((distance, row) for row in rows
+             if (distance := hamming(value, row.dhash)) <= limit),
+            key=lambda item: item[0],
+        )
+        for distance, row in candidates:
+            if not row.is_current():
+                continue
+            ports = list(
+                AssetModelPort.objects
+                .filter(asset_model_id=row.asset_model_id, side=row.side,
+                        pos_x__isnull=False, pos_y__isnull=False)
+                .values('name', 'port_type', 'pos_x', 'pos_y')
+            )
+            if not ports:
+                continue
+            logger.info('Layout match for %s: model %s %s (distance %d)',
+                        abs_image_path, row.asset_model_id, row.side, distance)
+            return [
+                {**port, 'confidence': 1.0, 'matched_model': row.asset_model_id}
+                for port in ports
+            ]
+    return None
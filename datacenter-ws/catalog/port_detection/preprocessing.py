@@ -1,9 +1,15 @@
 """
 Image preprocessing for YOLO inference.
 
-The two functions here are applied to every equipment photo before any
+The functions here are applied to every equipment photo before any
 inference step, both in the batch pipeline (PortAnalyzeView) and the
 single-click pipeline (PortClickAnalyzeView).
+
+YOLO letterboxes its input to ``imgsz`` anyway, so enhancing a 4000–6000 px
+phone photo at full resolution wastes 10–20× the work the model can use.
+:func:`prepare_for_inference` therefore downsamples to the inference
+resolution first and enhances the small image; it returns the scale factor
+so pixel coordinates can be mapped back to the original.
 """
 
 
@@ -46,6 +52,39 @@ def preprocess_for_inference(img):
     return cv2.addWeighted(enhanced, 1.4, blur, -0.4, 0)
 
 
+def resize_for_inference(img, max_side: int):
+    """
+    Downscale *img* so its longer side is at most *max_side* pixels.
+
+    Aspect ratio is preserved and images are never upscaled.  Returns
+    ``(resized, scale)`` where ``scale = resized / original`` (≤ 1), so an
+    original pixel coordinate ``p`` maps to ``p * scale``.
+    """
+    import cv2
+
+    h, w = img.shape[:2]
+    longest = max(h, w)
+    if longest <= max_side or longest == 0:
+        return img, 1.0
+    scale = max_side / longest
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    # INTER_AREA: proper anti-aliasing for downsampling.
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA), scale
+
+
+def prepare_for_inference(img, max_side: int):
+    """
+    Resize to the inference resolution, then enhance.
+
+    The model sees essentially the same input as when the full-resolution
+    image is enhanced and then letterboxed, at a fraction of the CLAHE /
+    blur cost.  Returns
+    ``(enhanced, scale)`` as for :func:`resize_for_inference`.
+    """
+    resized, scale = resize_for_inference(img, max_side)
+    return preprocess_for_inference(resized), scale
+
+
 def auto_canny(gray):
     """
     Compute adaptive Canny edge thresholds from the image median intensity.
@@ -0,0 +1,115 @@
+"""
+Content-addressed cache for full-image port analysis results.
+
+Entries are keyed by
+
+    (SHA-256 of the image bytes, SHA-256 of the weights file, inference
+     backend actually loaded, PIPELINE_VERSION)
+
+so a repeated analysis of the same photo returns in milliseconds, a retrain
+that replaces ``port-yolo.pt`` invalidates every entry implicitly (the key
+changes, stale entries age out), and a change to the detection code is
+rolled out by bumping :data:`PIPELINE_VERSION`.  The backend part follows
+the artefact on disk, not ``PORT_YOLO_BACKEND``: ``.pt`` results computed
+while the ONNX / OpenVINO export is pending are not served once it lands.  A result is only stored
+when the model that produced it is the one the key names: right after a
+retrain, workers whose watcher has not swapped yet still answer with the
+old model (see ``model_cache.track_served``).
+
+Storage is the ``port_analysis`` Django cache alias: LocMemCache (LRU-culled
+at ``MAX_ENTRIES``) by default, Redis when ``USE_REDIS_CACHE`` is set (use
+``maxmemory-policy allkeys-lru`` there).  Only the latter is visible to
+other processes, see :func:`is_shared`.
+
+File digests are memoised per process by ``(path, mtime_ns, size)`` so the
+8 MB photo or the weights file is hashed once, not on every request.
+"""
+import hashlib
+import logging
+import os
+from functools import lru_cache
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .model_cache import disk_identity, loaded_backend
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever detection, dedup or naming output changes for the same input.
+PIPELINE_VERSION = 1
+
+CACHE_ALIAS = 'port_analysis'
+
+
+@lru_cache(maxsize=1024)
+def _digest(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path: str) -> str | None:
+    """SHA-256 of *path*'s content, or *None* if it cannot be read."""
+    try:
+        st = os.stat(path)
+        return _digest(path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def is_shared() -> bool:
+    """
+    Whether entries written by one process are read by the others.  Not so
+    for LocMemCache (one dict per process) or DummyCache, where a result
+    computed by a Celery worker never reaches the web workers.
+    """
+    return not isinstance(caches[CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def cache_key(abs_image_path: str, model_path: str | None,
+              variant: str = '') -> str | None:
+    """
+    Build the cache key, or *None* when the image cannot be hashed.
+    *variant* separates output options of the same pipeline (``'ocr'``
+    naming).
+    """
+    image_hash = file_digest(abs_image_path)
+    if image_hash is None:
+        return None
+    weights_hash = (file_digest(model_path) if model_path else None) or 'none'
+    backend = loaded_backend(model_path) if model_path else 'torch'
+    key = f'ports:v{PIPELINE_VERSION}:{backend}:{image_hash}:{weights_hash[:16]}'
+    return f'{key}:{variant}' if variant else key
+
+
+def get(abs_image_path: str, model_path: str | None, variant: str = ''):
+    """Return the cached port list for this image + weights, or *None*."""
+    key = cache_key(abs_image_path, model_path, variant)
+    if key is None:
+        return None
+    return caches[CACHE_ALIAS].get(key)
+
+
+def store(abs_image_path: str, model_path: str | None, ports: list,
+          variant: str = '', *, served: list) -> None:
+    """
+    Store *ports* for this image + weights.
+
+    *served* lists the models that produced *ports* (from
+    ``model_cache.track_served``); nothing is stored unless each of them is
+    the model *model_path* currently loads as, or – for an OpenCV result –
+    there are no weights at all.
+    """
+    expected = disk_identity(model_path)
+    if (any(entry != expected for entry in served)
+            or (not served and expected is not None)):
+        logger.info('Not caching ports for %s: produced by %s, weights are %s',
+                    abs_image_path, served, expected)
+        return
+    key = cache_key(abs_image_path, model_path, variant)
+    if key is not None:
+        caches[CACHE_ALIAS].set(key, ports)
@@ -0,0 +1,152 @@
+"""
+Per-stage timing for the detection pipelines.
+
+A view (or task) opens a collection with :func:`collect`; the detectors
+record into it with :func:`stage` (wrap a block) or :class:`Laps` (mark the
+end of consecutive steps without re-indenting long functions).  The
+collection lives in a :class:`contextvars.ContextVar`, so concurrent requests
+never mix their numbers and code running outside a collection pays only a
+``perf_counter`` call.
+
+Stage names are flat and non-overlapping, accumulated in milliseconds
+(repeated stages – three OCR passes, a batch of images – add up):
+
+    decode, preprocess, infer, dedup        YOLO (batch and click)
+    opencv.preprocess / .contours / .dedup  OpenCV fallback (batch)
+    opencv                                  OpenCV fallback (click)
+    ocr.load, ocr.preprocess, ocr.read      label OCR
+    ocr.lookup                              label from whole-image OCR boxes
+    layout                                  perceptual-hash layout match
+    cache, naming                           view-level steps
+
+When a collection closes, one structured ``port_timing`` line is logged and
+the record is handed to the optional ``PORT_TIMING_SINK`` (dotted path to a
+``callable(record)``; e.g. a StatsD / Prometheus adapter) so p50 / p95 per
+stage can be tracked across releases.  Work done in the inference service is
+timed there and merged back with :func:`merge`.
+"""
+import functools
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[dict | None] = ContextVar('port_detection_timings',
+                                               default=None)
+
+
+def _add(name: str, seconds: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as stage *name*."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(name, time.perf_counter() - start)
+
+
+class Laps:
+    """Record consecutive steps: each :meth:`mark` closes the running lap."""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        _add(name, now - self._last)
+        self._last = now
+
+
+def merge(timings: dict | None) -> None:
+    """Add stage timings measured elsewhere (another process) to this context."""
+    current = _current.get()
+    if current is None or not timings:
+        return
+    for name, ms in timings.items():
+        current[name] = current.get(name, 0.0) + ms
+
+
+@contextmanager
+def capture():
+    """Record stages into a fresh dict (yielded) without emitting it."""
+    timings: dict = {}
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def collect(pipeline: str):
+    """
+    Collect stage timings for one *pipeline* run (``'analyze'``, ``'click'``
+    …).  Yields the record dict, which is filled in – ``pipeline``,
+    ``total_ms`` and ``stages`` – when the block exits, then emitted.
+    """
+    record = {'pipeline': pipeline}
+    start = time.perf_counter()
+    try:
+        with capture() as timings:
+            yield record
+    finally:
+        record['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        record['stages'] = {name: round(ms, 1) for name, ms in timings.items()}
+        _emit(record)
+
+
+def _emit(record: dict) -> None:
+    logger.info('port_timing %s', json.dumps(record, sort_keys=True))
+    path = getattr(settings, 'PORT_TIMING_SINK', '')
+    if not path:
+        return
+    try:
+        import_string(path)(record)
+    except Exception:
+        # Metrics must never break an analysis.
+        logger.warning('Port timing sink %s failed', path, exc_info=True)
+
+
+def debug_requested(request) -> bool:
+    """True for ``?debug_timing=1`` from an admin (superuser or admin role)."""
+    if request.query_params.get('debug_timing') not in ('1', 'true'):
+        return False
+    user = request.user
+    if getattr(user, 'is_superuser', False):
+        return True
+    from accounts.permissions import IsAdminRole
+    return IsAdminRole().has_permission(request, None)
+
+
+def timed_view(pipeline: str, list_key: str = 'results'):
+    """
+    Decorate an APIView handler to :func:`collect` its timings.
+
+    With :func:`debug_requested`, a successful response gains a
+    ``debug_timing`` field; list bodies are wrapped as
+    ``{list_key: [...], 'debug_timing': {...}}``.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            with collect(pipeline) as record:
+                response = handler(view, request, *args, **kwargs)
+            if response.status_code == 200 and debug_requested(request):
+                if isinstance(response.data, list):
+                    response.data = {list_key: response.data}
+                response.data['debug_timing'] = record
+            return response
+        return wrapper
+    return decorator
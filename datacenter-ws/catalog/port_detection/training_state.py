@@ -1,82 +1,186 @@
 """
 Training state management for the continuous learning pipeline.
 
-State is persisted in ``<MEDIA_ROOT>/models/training_state.json`` so that
-correction counters survive server restarts.  All mutations go through
-:func:`load_state` / :func:`save_state` under ``_state_lock`` to prevent
-races between concurrent requests.
+Correction counters and the retraining lease live in the single
+:class:`catalog.models.TrainingState` row, shared by every gunicorn worker
+and Celery process.  Counters are bumped with ``F()`` updates and the
+retrain decision is taken under a row lock (:func:`record_correction`), so
+concurrent corrections neither lose increments nor start two trainings.
+The lease expires after ``PORT_TRAINING_LEASE_MIN`` minutes in case the
+training process dies without calling :func:`finish_training`; a live
+training renews it after every epoch (:func:`renew_lease`) and publishes
+nothing once it has lost it to another run.
+
+Retraining runs in one of two modes (:func:`choose_mode`): a short
+``finetune`` from the current ``port-yolo.pt`` for small correction deltas,
+or a ``full`` run from ``yolov8n.pt``, forced every so many fine-tunes
+and when the last one is too old.  Each run's wall time and validation
+mAP are kept per mode in ``TrainingState.last_runs`` so the two can be
+compared.
 """
 import json
 import logging
 import os
-import shutil
-import threading
-from datetime import datetime, timezone
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone as dj_timezone
 
 from .constants import CLASS_NAMES
+from .dataset import has_samples
+from .model_cache import publish_weights
 from .security import get_media_root
 
 logger = logging.getLogger(__name__)
 
-_state_lock = threading.Lock()
+_STATE_PK = 1
+
+TRAIN_FULL = 'full'
+TRAIN_FINETUNE = 'finetune'
 
 
 # ── State persistence ──────────────────────────────────────────────────────────
 
-def state_path() -> str:
-    """Absolute path to the training state JSON file."""
-    return os.path.join(get_media_root(), 'models', 'training_state.json')
+def _legacy_state() -> dict:
+    """Counters from the pre-database ``models/training_state.json``, if any."""
+    path = os.path.join(get_media_root(), 'models', 'training_state.json')
+    try:
+        with open(path) as f:
+            legacy = json.load(f)
+        last = legacy.get('last_training_iso')
+        return {
+            'corrections_since_last_train': int(legacy.get('corrections_since_last_train', 0)),
+            'total_corrections': int(legacy.get('total_corrections', 0)),
+            'last_training_at': datetime.fromisoformat(last) if last else None,
+        }
+    except Exception:
+        # Missing or corrupt legacy file: start from zero.
+        return {}
+
+
+def get_state():
+    """The TrainingState row, created on first use."""
+    from catalog.models import TrainingState
+
+    state, _ = TrainingState.objects.get_or_create(
+        pk=_STATE_PK, defaults=_legacy_state())
+    return state
 
 
-def load_state() -> dict:
+def _lease_minutes() -> int:
+    return int(getattr(settings, 'PORT_TRAINING_LEASE_MIN', 90))
+
+
+def record_correction(min_corrections: int, min_interval_min: float) -> tuple:
     """
-    Load the training state from disk.
+    Count one correction and decide whether it triggers a retrain.
 
-    Returns a default dict if the file is missing or corrupt so that callers
-    never have to handle a None return value.
+    Returns ``(state, lease_token)``; *lease_token* is *None* unless this
+    call took the training lease, in which case the caller must start the
+    training and hand the token to :func:`finish_training`.
     """
-    path = state_path()
-    if os.path.isfile(path):
-        try:
-            with open(path) as f:
-                return json.load(f)
-        except Exception:
-            # Corrupt or unreadable state file: fall back to the default state.
-            pass
-    return {
-        'last_training_iso': None,
-        'corrections_since_last_train': 0,
-        'total_corrections': 0,
-        'is_training': False,
-    }
+    from catalog.models import TrainingState
 
+    get_state()
+    with transaction.atomic():
+        # UPDATE first: it takes the row's write lock straight away, so the
+        # read below cannot be interleaved with another correction.
+        TrainingState.objects.filter(pk=_STATE_PK).update(
+            corrections_since_last_train=F('corrections_since_last_train') + 1,
+            total_corrections=F('total_corrections') + 1,
+        )
+        state = TrainingState.objects.select_for_update().get(pk=_STATE_PK)
+        if (state.corrections_since_last_train < min_corrections
+                or minutes_since_last_train(state) < min_interval_min
+                or state.is_training):
+            return state, None
+        state.lease_token = uuid.uuid4()
+        state.lease_expires_at = dj_timezone.now() + timedelta(minutes=_lease_minutes())
+        state.corrections_at_lease = state.corrections_since_last_train
+        state.save(update_fields=['lease_token', 'lease_expires_at',
+                                  'corrections_at_lease'])
+        return state, state.lease_token
 
-def save_state(state: dict) -> None:
-    """Atomically write *state* to the training state file."""
-    path = state_path()
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f:
-        json.dump(state, f, indent=2)
 
+def finish_training(lease_token) -> bool:
+    """
+    Release the lease taken by :func:`record_correction`, stamp the training
+    time and discount the corrections it trained on.  Returns *False* when
+    the lease had already expired and been taken over.
+    """
+    from catalog.models import TrainingState
 
-def minutes_since_last_train(state: dict) -> float:
+    released = TrainingState.objects.filter(
+        pk=_STATE_PK, lease_token=lease_token,
+    ).update(
+        lease_token=None,
+        lease_expires_at=None,
+        last_training_at=dj_timezone.now(),
+        corrections_since_last_train=(F('corrections_since_last_train')
+                                      - F('corrections_at_lease')),
+        corrections_at_lease=0,
+    )
+    if not released:
+        logger.warning('Training lease %s was no longer held', lease_token)
+    return bool(released)
+
+
+def renew_lease(lease_token) -> bool:
+    """
+    Push the expiry of the lease *lease_token* ``PORT_TRAINING_LEASE_MIN``
+    minutes ahead.  Returns *False* when it has already expired (another
+    correction may have started a training) or been released.
+    """
+    from catalog.models import TrainingState
+
+    now = dj_timezone.now()
+    return bool(TrainingState.objects.filter(
+        pk=_STATE_PK, lease_token=lease_token, lease_expires_at__gt=now,
+    ).update(lease_expires_at=now + timedelta(minutes=_lease_minutes())))
+
+
+def record_run(report: dict) -> None:
+    """
+    Keep *report* (see :func:`run_training`) as the last run of its mode.
+
+    The ``finetune`` entry also counts ``finetunes_since_full``, reset by
+    every full run (see :func:`choose_mode`).
+    """
+    from catalog.models import TrainingState
+
+    logger.info('training_run %s', json.dumps(report, sort_keys=True))
+    get_state()
+    with transaction.atomic():
+        state = TrainingState.objects.select_for_update().get(pk=_STATE_PK)
+        runs = dict(state.last_runs)
+        finetune = runs.get(TRAIN_FINETUNE)
+        if report['mode'] == TRAIN_FINETUNE:
+            report = {**report, 'finetunes_since_full':
+                      (finetune or {}).get('finetunes_since_full', 0) + 1}
+        elif finetune is not None:
+            runs[TRAIN_FINETUNE] = {**finetune, 'finetunes_since_full': 0}
+        state.last_runs = {**runs, report['mode']: report}
+        state.save(update_fields=['last_runs'])
+
+
+def minutes_since_last_train(state) -> float:
     """
     Return the number of minutes elapsed since the last completed training run.
 
     Returns ``float('inf')`` if the state carries no training timestamp, so
     that the "enough time has passed" check is always true for a fresh install.
     """
-    iso = state.get('last_training_iso')
-    if not iso:
-        return float('inf')
-    try:
-        last = datetime.fromisoformat(iso)
-        if last.tzinfo is None:
-            last = last.replace(tzinfo=timezone.utc)
-        delta = datetime.now(tz=timezone.utc) - last
-        return delta.total_seconds() / 60
-    except Exception:
+    last = state.last_training_at
+    if last is None:
         return float('inf')
+    if last.tzinfo is None:
+        last = last.replace(tzinfo=timezone.utc)
+    delta = datetime.now(tz=timezone.utc) - last
+    return delta.total_seconds() / 60
 
 
 # ── Device selection ───────────────────────────────────────────────────────────
@@ -101,8 +205,8 @@ def write_data_yaml(training_dir: str) -> str:
     """
     Write (or overwrite) the YOLO data YAML for the training directory.
 
-    Falls back to the training images directory as the validation set if no
-    separate val split exists yet.
+    Falls back to the training images directory as the validation set if the
+    manifest has no val sample yet.
 
     Returns
     -------
@@ -114,7 +218,7 @@ def write_data_yaml(training_dir: str) -> str:
     data_yaml = os.path.join(training_dir, 'data.yaml')
     train_img = os.path.join(training_dir, 'images', 'train')
     val_img = os.path.join(training_dir, 'images', 'val')
-    if not os.path.isdir(val_img) or not os.listdir(val_img):
+    if not has_samples('val'):
         val_img = train_img
     with open(data_yaml, 'w') as f:
         _yaml.dump(
@@ -130,47 +234,155 @@ def write_data_yaml(training_dir: str) -> str:
     return data_yaml
 
 
-# ── Background training ────────────────────────────────────────────────────────
+# ── Training ──────────────────────────────────────────────────────────────────
+
+def choose_mode(corrections: int, models_dir: str,
+                last_runs: dict | None = None) -> str:
+    """
+    ``finetune`` when weights to start from exist and fewer than
+    ``PORT_FULL_RETRAIN_CORRECTIONS`` corrections arrived since the last
+    run; ``full`` otherwise.
+
+    Fine-tunes drift from a from-scratch model, so a ``full`` run is also
+    forced after ``PORT_MAX_CONSECUTIVE_FINETUNES`` fine-tunes in a row or
+    when the last full run (``last_runs['full']``) is more than
+    ``PORT_FULL_RETRAIN_MAX_AGE_DAYS`` old.  *last_runs* defaults to the
+    stored ``TrainingState.last_runs``.
+    """
+    threshold = int(getattr(settings, 'PORT_FULL_RETRAIN_CORRECTIONS', 100))
+    if (corrections >= threshold
+            or not os.path.isfile(os.path.join(models_dir, 'port-yolo.pt'))):
+        return TRAIN_FULL
+    if last_runs is None:
+        last_runs = get_state().last_runs
+
+    max_finetunes = int(getattr(settings, 'PORT_MAX_CONSECUTIVE_FINETUNES', 10))
+    finetunes = (last_runs.get(TRAIN_FINETUNE) or {}).get('finetunes_since_full', 0)
+    if 0 < max_finetunes <= finetunes:
+        return TRAIN_FULL
+
+    max_age_days = float(getattr(settings, 'PORT_FULL_RETRAIN_MAX_AGE_DAYS', 30))
+    finished_at = (last_runs.get(TRAIN_FULL) or {}).get('finished_at')
+    if max_age_days > 0 and finished_at:
+        last_full = datetime.fromisoformat(finished_at)
+        if last_full.tzinfo is None:
+            last_full = last_full.replace(tzinfo=timezone.utc)
+        if datetime.now(tz=timezone.utc) - last_full > timedelta(days=max_age_days):
+            return TRAIN_FULL
+    return TRAIN_FINETUNE
+
+
+def _train_kwargs(mode: str) -> dict:
+    if mode == TRAIN_FINETUNE:
+        # Short, gentle update of the deployed weights: low learning rate,
+        # no warm-up, backbone frozen so only neck and head adapt.
+        return {
+            'epochs': int(getattr(settings, 'PORT_FINETUNE_EPOCHS', 15)),
+            'lr0': float(getattr(settings, 'PORT_FINETUNE_LR0', 0.001)),
+            'warmup_epochs': 0,
+            'patience': 5,
+            'freeze': 10,
+        }
+    return {'epochs': 100, 'patience': 20}
+
+
+def training_metrics(results, model) -> dict:
+    """``{'map50', 'map50_95'}`` from ``model.train`` output (or the trainer)."""
+    metrics = (getattr(results, 'results_dict', None)
+               or getattr(getattr(model, 'trainer', None), 'metrics', None)
+               or {})
+    return {
+        'map50': metrics.get('metrics/mAP50(B)'),
+        'map50_95': metrics.get('metrics/mAP50-95(B)'),
+    }
+
 
-def run_background_train(data_yaml: str, models_dir: str) -> None:
+def run_training(data_yaml: str, models_dir: str, mode: str = TRAIN_FULL,
+                 lease_token=None) -> dict:
     """
-    Train YOLOv8n in a background thread and update state when done.
+    Train on *data_yaml* and publish the best weights as
+    ``models_dir/port-yolo.pt``.
+
+    ``full`` trains YOLOv8n from ``yolov8n.pt`` for 100 epochs; ``finetune``
+    continues from the current ``port-yolo.pt`` (see :func:`_train_kwargs`),
+    falling back to ``full`` when there are no weights yet.
+
+    With *lease_token*, the lease is renewed after every epoch; if it has
+    been lost, training stops at that epoch and nothing is published or
+    recorded, since another run now owns ``models_dir/port-yolo``.
+
+    Returns the run report – ``mode``, ``finished_at``, ``wall_s``,
+    ``epochs``, ``map50``, ``map50_95`` and ``weights`` (the published path,
+    *None* when nothing was published) – after recording it with
+    :func:`record_run`.  Exceptions propagate to the caller.
+    """
+    from ultralytics import YOLO
+
+    current = os.path.join(models_dir, 'port-yolo.pt')
+    if mode == TRAIN_FINETUNE and not os.path.isfile(current):
+        mode = TRAIN_FULL
+    kwargs = _train_kwargs(mode)
+
+    start = time.monotonic()
+    model = YOLO(current if mode == TRAIN_FINETUNE else 'yolov8n.pt')
+    if lease_token is not None:
+        def keep_lease(trainer):
+            if not renew_lease(lease_token):
+                logger.warning('Training lease %s lost, stopping training',
+                               lease_token)
+                trainer.stop = True
+
+        model.add_callback('on_fit_epoch_end', keep_lease)
+    results = model.train(
+        data=data_yaml,
+        imgsz=640,
+        optimizer='AdamW',
+        cls=2.0,
+        label_smoothing=0.1,
+        mosaic=0.5,
+        device=best_device(),
+        project=models_dir,
+        name='port-yolo',
+        exist_ok=True,
+        **kwargs,
+    )
+    report = {
+        'mode': mode,
+        'finished_at': datetime.now(tz=timezone.utc).isoformat(),
+        'wall_s': round(time.monotonic() - start, 1),
+        'epochs': kwargs['epochs'],
+        **training_metrics(results, model),
+        'weights': None,
+    }
+
+    best = os.path.join(models_dir, 'port-yolo', 'weights', 'best.pt')
+    if lease_token is not None and not renew_lease(lease_token):
+        logger.warning('Training lease %s lost, not publishing %s',
+                       lease_token, best)
+        return report
+    if os.path.isfile(best):
+        publish_weights(best, current)
+        report['weights'] = current
+    else:
+        logger.warning('YOLO training finished but best.pt not found at %s', best)
+    record_run(report)
+    return report
+
+
+def run_background_train(data_yaml: str, models_dir: str, lease_token,
+                         mode: str = TRAIN_FULL) -> None:
+    """
+    :func:`run_training` in the calling thread, then release the lease.
 
     Used as a Celery-unavailable fallback.  The function blocks until training
     is complete; run it in a daemon=False thread so the process does not exit
     before it finishes.
     """
     try:
-        from ultralytics import YOLO
-        device = best_device()
-        model = YOLO('yolov8n.pt')
-        model.train(
-            data=data_yaml,
-            epochs=100,
-            patience=20,
-            imgsz=640,
-            optimizer='AdamW',
-            cls=2.0,
-            label_smoothing=0.1,
-            mosaic=0.5,
-            device=device,
-            project=models_dir,
-            name='port-yolo',
-            exist_ok=True,
-        )
-        best = os.path.join(models_dir, 'port-yolo', 'weights', 'best.pt')
-        dest = os.path.join(models_dir, 'port-yolo.pt')
-        if os.path.isfile(best):
-            shutil.copy2(best, dest)
+        run_training(data_yaml, models_dir, mode, lease_token)
     except Exception:
-        # Training failures must not crash the worker; state is reset below
-        # regardless so the correction counter can accumulate again.
-        pass
+        # Training failures must not crash the worker; the lease is released
+        # below regardless so the correction counter can accumulate again.
+        logger.exception('Background YOLO training failed')
     finally:
-        with _state_lock:
-            state = load_state()
-            state['is_training'] = False
-            state['last_training_iso'] = datetime.now(
-                tz=timezone.utc).isoformat()
-            state['corrections_since_last_train'] = 0
-            save_state(state)
+        finish_training(lease_token)
@@ -0,0 +1,133 @@
+"""
+Worker warm-up – pay the model start-up cost before the first request.
+
+The first analysis in a fresh process imports torch/ultralytics, loads
+``port-yolo.pt``, builds the inference graph on a first forward pass and
+constructs the EasyOCR reader: often 10+ seconds, which users see as a hung
+UI.  With ``PORT_WARMUP`` enabled, :class:`catalog.apps.CatalogConfig` runs
+:func:`warm_up` on a background thread at start-up and :func:`is_ready`
+stays False until it has finished, so ``GET asset/port-analyze/ready`` can
+keep the load balancer away from cold workers.
+
+Only web server processes warm up (:func:`is_server_process`): ``wsgi.py``
+and ``asgi.py`` set ``PORT_DETECTION_SERVER=1``, and ``runserver`` is
+recognised by its arguments.  ``migrate``, ``shell``, other management
+commands and Celery workers never load the models for nothing.
+
+Each step is best-effort: a missing model (not trained yet) or a missing
+optional dependency is logged and skipped, never left "warming" forever.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Set by the WSGI / ASGI entry points.
+SERVER_ENV = 'PORT_DETECTION_SERVER'
+
+# idle → warming → ready
+_state = {'status': 'idle', 'seconds': None, 'pid': None}
+_state_lock = threading.Lock()
+
+
+def _warm_yolo() -> None:
+    import numpy as np
+
+    from .batch_detector import _PREDICT_KWARGS
+    from .model_cache import get_yolo_model
+
+    model = get_yolo_model()
+    if model is None:
+        logger.info('Warm-up: no YOLO weights yet, skipping')
+        return
+    model.predict(np.zeros((640, 640, 3), dtype=np.uint8), imgsz=640,
+                  **_PREDICT_KWARGS)
+
+
+def _warm_ocr() -> None:
+    import numpy as np
+
+    from .ocr import _get_ocr_reader
+
+    _get_ocr_reader().readtext(np.zeros((32, 96, 3), dtype=np.uint8))
+
+
+def warm_up() -> None:
+    """Load YOLO and the OCR reader and run one dummy inference through each."""
+    with _state_lock:
+        _state['status'] = 'warming'
+        _state['pid'] = os.getpid()
+    started = time.monotonic()
+    for name, step in (('YOLO', _warm_yolo), ('OCR', _warm_ocr)):
+        try:
+            step()
+        except Exception:
+            logger.warning('Warm-up: %s step failed', name, exc_info=True)
+    elapsed = round(time.monotonic() - started, 2)
+    with _state_lock:
+        _state['status'] = 'ready'
+        _state['seconds'] = elapsed
+    logger.info('Port detection warm-up finished in %.1fs', elapsed)
+
+
+def start_background_warmup() -> None:
+    """Run :func:`warm_up` on a daemon thread (once per process)."""
+    with _state_lock:
+        if _state['pid'] == os.getpid():
+            return
+        _state['status'] = 'warming'
+        _state['pid'] = os.getpid()
+    threading.Thread(target=warm_up, daemon=True,
+                     name='port-detection-warmup').start()
+
+
+def is_server_process(argv: list | None = None) -> bool:
+    """
+    True in a process that serves HTTP requests: one started through
+    ``wsgi.py`` / ``asgi.py``, or the ``runserver`` process that handles
+    requests (the autoreloader's child, or the only one with
+    ``--noreload``).
+    """
+    if os.environ.get(SERVER_ENV) == '1':
+        return True
+    argv = sys.argv if argv is None else argv
+    return (len(argv) > 1 and argv[1] == 'runserver'
+            and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv))
+
+
+def is_enabled() -> bool:
+    """
+    True when this process should warm up.  With the inference service
+    configured the models live in the service's pool (warmed by its worker
+    initializer), so web workers have nothing to preload.
+    """
+    from django.conf import settings
+
+    from . import inference_service
+    return (bool(getattr(settings, 'PORT_WARMUP', False))
+            and not inference_service.is_enabled())
+
+
+def status() -> dict:
+    """Readiness snapshot for the health endpoint."""
+    if not is_enabled():
+        # Nothing to wait for: the process is as ready as it will get.
+        return {'status': 'ready', 'seconds': None, 'ready': True}
+
+    with _state_lock:
+        snapshot = dict(_state)
+    if snapshot.pop('pid') != os.getpid():
+        # Not started in this process – e.g. forked by gunicorn --preload
+        # after the master began warming (threads do not survive fork).
+        # The probe itself kicks it off.
+        start_background_warmup()
+        snapshot = {'status': 'warming', 'seconds': None}
+    snapshot['ready'] = snapshot['status'] == 'ready'
+    return snapshot
+
+
+def is_ready() -> bool:
+    return status()['ready']
@@ -0,0 +1,12 @@
+from rest_framework import serializers
+from catalog.models import PortAnalysisJob
+
+
+class PortAnalysisJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = PortAnalysisJob
+        fields = ['id', 'image_path', 'status', 'stage', 'progress',
+                  'result', 'error', 'created_at', 'updated_at']
+        read_only_fields = fields
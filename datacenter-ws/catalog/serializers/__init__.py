@@ -2,3 +2,4 @@ from .VendorSerializer import VendorSerializer
 from .AssetTypeSerializer import AssetTypeSerializer
 from .AssetModelPortSerializer import AssetModelPortSerializer
 from .AssetModelSerializer import AssetModelSerializer
+from .PortAnalysisJobSerializer import PortAnalysisJobSerializer
@@ -6,116 +6,240 @@ Tasks:
                     Triggered by PortCorrectionView when correction thresholds
                     are reached. Runs in a Celery worker process, completely
                     off the Django request/response cycle.
+    run_port_analysis — Full-image port detection for a PortAnalysisJob
+                    (``POST asset/port-analyze/jobs``).  With
+                    ``PORT_ANALYSIS_QUEUE`` set, routed to that dedicated
+                    queue so long analyses never wait behind (or block) a
+                    training run.
+    preanalyze_ports  — Same pipeline for a freshly uploaded AssetModel
+                    image; fills the result cache so the port mapper opens
+                    with suggestions.  Routed like run_port_analysis.
 """
 
-import json
 import logging
 import os
-import shutil
-from datetime import datetime, timezone
 
 from celery import shared_task
-from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 
-def _get_media_root() -> str:
-    return os.path.realpath(settings.MEDIA_ROOT)
+@shared_task(
+    bind=True,
+    name='catalog.retrain_yolo',
+    max_retries=0,          # no automatic retry — the training data hasn't changed
+    ignore_result=True,     # result tracked in the TrainingState row, not Celery backend
+)
+def retrain_yolo(self, data_yaml: str, models_dir: str, lease_token: str,
+                 mode: str = 'full') -> None:
+    """
+    Train YOLOv8n on the accumulated correction dataset.
+
+    Args:
+        data_yaml:    Absolute path to the YOLO data.yaml file.
+        models_dir:   Directory where the trained weights will be saved.
+        lease_token:  Training lease taken by PortCorrectionView
+                      (``training_state.record_correction``).
+        mode:         ``full`` (from yolov8n.pt) or ``finetune`` (short run
+                      from the current port-yolo.pt).
+
+    Side effects:
+        - Renews the lease after every epoch; once it is lost, training
+          stops and nothing is published.
+        - Writes best.pt → models_dir/port-yolo.pt on success.
+        - Records the run report (wall time, mAP) in TrainingState.last_runs.
+        - Releases the lease and updates TrainingState (last_training_at,
+          corrections_since_last_train) on completion.
+    """
+    from catalog.port_detection.training_state import finish_training, run_training
+
+    logger.info('YOLO retraining started (mode=%s, task_id=%s)', mode, self.request.id)
+    try:
+        report = run_training(data_yaml, models_dir, mode, lease_token)
+        if report['weights']:
+            logger.info('YOLO retraining complete — weights saved to %s',
+                        report['weights'])
+    except Exception:
+        logger.exception('YOLO retraining failed')
+    finally:
+        finish_training(lease_token)
 
 
-def _state_path() -> str:
-    return os.path.join(_get_media_root(), 'models', 'training_state.json')
+def _noop_stage(stage: str) -> None:
+    pass
 
 
-def _load_state() -> dict:
-    path = _state_path()
-    if os.path.isfile(path):
+def _analyze(abs_image_path: str, model_path: str, progress=None,
+             ocr_names: bool = False, image_name: str = '') -> tuple:
+    """
+    Run the PortAnalyzeView pipeline, reporting each stage to *progress*.
+
+    Returns ``(named_ports, cacheable)``.  The detector runs in this worker
+    process rather than in the inference service so the stage callbacks
+    reach the job row; each stage is reported once, so an OpenCV fallback
+    after an empty YOLO pass does not move progress back.  A near-identical
+    indexed panel short-circuits detection with its port layout (not
+    cacheable: it follows that model's ports, not the weights).
+    """
+    progress = progress or _noop_stage
+    reported = set()
+
+    def report(stage: str) -> None:
+        if stage not in reported:
+            reported.add(stage)
+            progress(stage)
+
+    from catalog.port_detection import (
+        apply_ocr_labels,
+        assign_names,
+        detect_with_opencv,
+        detect_with_yolo,
+        find_layout,
+        timing,
+    )
+
+    layout = find_layout(abs_image_path, image_name)
+    if layout is not None:
+        report('naming')
+        return layout, False
+
+    cacheable = True
+    ports = []
+    try:
+        if os.path.isfile(model_path):
+            ports = detect_with_yolo(abs_image_path, model_path,
+                                     progress=report)
+    except Exception:
+        # Same policy as the synchronous view: OpenCV fallback, not cached.
+        logger.warning('YOLO failed for %s, using OpenCV', abs_image_path,
+                       exc_info=True)
+        cacheable = False
+    if not ports:
+        report('infer')
+        ports = detect_with_opencv(abs_image_path)
+        report('dedup')
+    report('naming')
+    with timing.stage('naming'):
+        named = assign_names(ports)
+    if ocr_names and named:
         try:
-            with open(path) as f:
-                return json.load(f)
+            from catalog.port_detection.ocr import image_text_boxes
+            text_entry = image_text_boxes(abs_image_path)
+            with timing.stage('naming'):
+                apply_ocr_labels(named, text_entry)
         except Exception:
-            pass
-    return {
-        'last_training_iso': None,
-        'corrections_since_last_train': 0,
-        'total_corrections': 0,
-        'is_training': False,
-    }
+            logger.warning('OCR port naming failed for %s', abs_image_path,
+                           exc_info=True)
+            cacheable = False
+    return named, cacheable
 
 
-def _save_state(state: dict) -> None:
-    path = _state_path()
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f:
-        json.dump(state, f, indent=2)
+@shared_task(
+    bind=True,
+    name='catalog.run_port_analysis',
+    max_retries=0,
+    ignore_result=True,     # result stored on the PortAnalysisJob row
+)
+def run_port_analysis(self, job_id: str, ocr_names: bool = False) -> None:
+    """
+    Analyse the image of PortAnalysisJob *job_id* and store the named ports
+    (labels read by OCR when *ocr_names*, see PortAnalyzeView).
 
+    Side effects:
+        - Advances ``job.stage`` through preprocess / infer / dedup / naming.
+        - Sets ``job.status`` to ``done`` with ``job.result``, or to
+          ``failed`` with ``job.error``.
+        - Fills the port analysis result cache on success.
+    """
+    from catalog.models import PortAnalysisJob
+    from catalog.port_detection import resolve_safe_path, result_cache, timing
+    from catalog.port_detection.model_cache import (
+        default_model_path,
+        track_served,
+    )
+
+    job = PortAnalysisJob.objects.filter(pk=job_id).first()
+    if job is None:
+        logger.warning('Port analysis job %s no longer exists', job_id)
+        return
+    logger.info('Port analysis started (job=%s, task_id=%s)',
+                job_id, self.request.id)
 
-def _best_device() -> str:
-    """Return the best available training device (cuda > mps > cpu)."""
     try:
-        import torch
-        if torch.cuda.is_available():
-            return 'cuda'
-        if getattr(torch.backends, 'mps', None) and torch.backends.mps.is_available():
-            return 'mps'
-    except Exception:
-        # torch missing or its backend probes failed; fall back to CPU.
-        pass
-    return 'cpu'
+        abs_image_path = resolve_safe_path(job.image_path)
+        if abs_image_path is None or not os.path.isfile(abs_image_path):
+            raise FileNotFoundError(job.image_path)
+        model_path = default_model_path()
+        with timing.collect('analyze_job'), track_served() as served:
+            named, cacheable = _analyze(abs_image_path, model_path,
+                                        job.set_stage, ocr_names,
+                                        job.image_path)
+        if cacheable:
+            result_cache.store(abs_image_path, model_path, named,
+                               'ocr' if ocr_names else '', served=served)
+    except Exception as exc:
+        logger.exception('Port analysis failed (job=%s)', job_id)
+        job.status = PortAnalysisJob.Status.FAILED
+        job.error = ('Image not found.' if isinstance(exc, FileNotFoundError)
+                     else 'Port analysis failed.')
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        return
+
+    job.status = PortAnalysisJob.Status.DONE
+    job.result = named
+    job.save(update_fields=['status', 'result', 'updated_at'])
 
 
 @shared_task(
     bind=True,
-    name='catalog.retrain_yolo',
-    max_retries=0,          # no automatic retry — the training data hasn't changed
-    ignore_result=True,     # result tracked in training_state.json, not Celery backend
+    name='catalog.preanalyze_ports',
+    max_retries=0,
+    ignore_result=True,     # result stored in the port analysis cache
 )
-def retrain_yolo(self, data_yaml: str, models_dir: str) -> None:
+def preanalyze_ports(self, image_path: str) -> None:
     """
-    Train YOLOv8n on the accumulated correction dataset.
+    Detect ports on an uploaded AssetModel image ahead of the first visit.
 
     Args:
-        data_yaml:   Absolute path to the YOLO data.yaml file.
-        models_dir:  Directory where the trained weights will be saved.
+        image_path:  Image path relative to MEDIA_ROOT (``FieldFile.name``).
 
     Side effects:
-        - Writes best.pt → models_dir/port-yolo.pt on success.
-        - Updates training_state.json (is_training, last_training_iso,
-          corrections_since_last_train) on completion.
+        - Indexes the image's perceptual hash (``PanelHash``) for layout
+          matching.
+        - Stores the named ports in the port analysis result cache, keyed by
+          image content and weights, so PortAnalyzeView answers instantly
+          until the model is retrained (the key then changes and the next
+          visit re-analyses).  Nothing is cached when the panel matches an
+          already mapped one; the view serves that layout directly.
+          Skipped, with a warning, when the ``port_analysis`` cache is
+          per process (the LocMemCache default): the web workers would
+          never see the result.
     """
-    logger.info('YOLO retraining started (task_id=%s)', self.request.id)
-    try:
-        from ultralytics import YOLO
-        device = _best_device()
-        model = YOLO('yolov8n.pt')
-        model.train(
-            data=data_yaml,
-            epochs=100,
-            patience=20,
-            imgsz=640,
-            optimizer='AdamW',
-            cls=2.0,
-            label_smoothing=0.1,
-            mosaic=0.5,
-            device=device,
-            project=models_dir,
-            name='port-yolo',
-            exist_ok=True,
-        )
-        best = os.path.join(models_dir, 'port-yolo', 'weights', 'best.pt')
-        dest = os.path.join(models_dir, 'port-yolo.pt')
-        if os.path.isfile(best):
-            shutil.copy2(best, dest)
-            logger.info('YOLO retraining complete — weights saved to %s', dest)
-        else:
-            logger.warning(
-                'YOLO retraining finished but best.pt not found at %s', best)
-    except Exception:
-        logger.exception('YOLO retraining failed')
-    finally:
-        state = _load_state()
-        state['is_training'] = False
-        state['last_training_iso'] = datetime.now(tz=timezone.utc).isoformat()
-        state['corrections_since_last_train'] = 0
-        _save_state(state)
+    from catalog.port_detection import resolve_safe_path, result_cache, timing
+    from catalog.port_detection.model_cache import (
+        default_model_path,
+        track_served,
+    )
+    from catalog.port_detection.panel_hash import index_upload
+
+    abs_image_path = resolve_safe_path(image_path)
+    if abs_image_path is None or not os.path.isfile(abs_image_path):
+        logger.warning('Port pre-analysis: %s not found', image_path)
+        return
+    index_upload(image_path)
+    if not result_cache.is_shared():
+        logger.warning(
+            'Port pre-analysis of %s skipped: the port_analysis cache is '
+            'per process, set USE_REDIS_CACHE to share results with the '
+            'web workers', image_path)
+        return
+    model_path = default_model_path()
+    if result_cache.get(abs_image_path, model_path) is not None:
+        return
+
+    logger.info('Port pre-analysis of %s (task_id=%s)', image_path, self.request.id)
+    with timing.collect('preanalyze'), track_served() as served:
+        named, cacheable = _analyze(abs_image_path, model_path,
+                                    image_name=image_path)
+    if cacheable:
+        result_cache.store(abs_image_path, model_path, named, served=served)
@@ -0,0 +1,2516 @@
+"""
+Tests for catalog port detection endpoints and helpers.
+"""
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.models import Role
+
+
+class MediaRootMixin:
+    """Runs every test against its own empty MEDIA_ROOT (``self.media_root``)."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+
+def _authenticated_client(username, **permissions):
+    """``(client, user)`` for a new user whose role grants *permissions*."""
+    role = Role.objects.create(name=f'{username}-role', **permissions)
+    user = User.objects.create_user(username=username, password='test-pass-123')
+    user.profile.role = role
+    user.profile.save(update_fields=['role'])
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client, user
+
+
+def _served_from_disk(model_path):
+    """Report the weights on disk as served, as a real YOLO job would."""
+    from catalog.port_detection import model_cache
+
+    model_cache.note_served([model_cache.disk_identity(model_path)])
+
+
+class PortBatchAnalyzeEndpointTestCase(MediaRootMixin, TestCase):
+    """Test /asset/port-analyze/batch validation and per-image results."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.url = '/asset/port-analyze/batch'
+        self.client, self.user = _authenticated_client(
+            'batch-analyze-user', can_view_model_training_status=True)
+
+    def _write_panel(self, relpath):
+        import cv2
+        import numpy as np
+
+        img = np.full((200, 800, 3), 170, dtype=np.uint8)
+        for i in range(8):
+            x = 40 + i * 90
+            cv2.rectangle(img, (x, 70), (x + 50, 130), (30, 30, 30), -1)
+        abs_path = os.path.join(self.media_root, relpath)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        cv2.imwrite(abs_path, img)
+
+    def test_rejects_non_list_payload(self):
+        response = self.client.post(
+            self.url, {'image_paths': 'components/a.jpg'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PORT_BATCH_MAX_IMAGES=2)
+    def test_rejects_oversized_batch(self):
+        response = self.client.post(
+            self.url,
+            {'image_paths': ['a.jpg', 'b.jpg', 'c.jpg']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reports_per_image_errors_in_request_order(self):
+        self._write_panel('components/panel.jpg')
+        response = self.client.post(
+            self.url,
+            {'image_paths': [
+                '../etc/passwd',
+                'components/missing.jpg',
+                'components/panel.jpg',
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [e['image_path'] for e in response.data],
+            ['../etc/passwd', 'components/missing.jpg', 'components/panel.jpg'],
+        )
+        self.assertEqual(response.data[0]['error'], 'Invalid image path.')
+        self.assertEqual(response.data[1]['error'], 'Image not found.')
+        self.assertNotIn('error', response.data[2])
+        self.assertIsInstance(response.data[2]['ports'], list)
+
+
+class ResolutionAwarePreprocessingTestCase(TestCase):
+    """Photos are downsampled to the inference size before enhancement."""
+
+    def test_resize_preserves_aspect_and_reports_scale(self):
+        import numpy as np
+
+        from catalog.port_detection.preprocessing import prepare_for_inference
+
+        enhanced, scale = prepare_for_inference(
+            np.zeros((1500, 6000, 3), dtype=np.uint8), 1280)
+        self.assertEqual(enhanced.shape, (320, 1280, 3))
+        self.assertAlmostEqual(scale, 1280 / 6000)
+
+    def test_small_images_are_not_upscaled(self):
+        import numpy as np
+
+        from catalog.port_detection.preprocessing import resize_for_inference
+
+        img = np.zeros((300, 500, 3), dtype=np.uint8)
+        resized, scale = resize_for_inference(img, 1280)
+        self.assertIs(resized, img)
+        self.assertEqual(scale, 1.0)
+
+
+class PortAnalyzeResultCacheTestCase(MediaRootMixin, TestCase):
+    """Repeat analyses are served from the result cache, unthrottled."""
+
+    def setUp(self):
+        super().setUp()
+        for alias in ('default', 'port_analysis'):
+            caches[alias].clear()
+
+        self.url = '/asset/port-analyze'
+        self.client, self.user = _authenticated_client(
+            'cached-analyze-user', can_view_model_training_status=True)
+
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        with open(os.path.join(self.media_root, 'components', 'panel.jpg'), 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+        self.ports = [{'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+                       'confidence': 0.9}]
+
+    def _analyze(self):
+        return self.client.post(
+            self.url, {'image_path': 'components/panel.jpg'}, format='json')
+
+    def test_repeat_analysis_is_cached(self):
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                        return_value=self.ports) as opencv:
+            first = self._analyze()
+            second = self._analyze()
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(opencv.call_count, 1)
+
+    def test_replacing_weights_invalidates_entries(self):
+        model_path = os.path.join(self.media_root, 'models', 'port-yolo.pt')
+        os.makedirs(os.path.dirname(model_path))
+        with open(model_path, 'wb') as f:
+            f.write(b'weights-v1')
+
+        def detect(job, abs_image_path, model_path):
+            _served_from_disk(model_path)
+            return self.ports
+
+        with mock.patch('catalog.views.PortAnalyzeView.inference_service.submit',
+                        side_effect=detect) as submit:
+            self._analyze()
+            self._analyze()
+            self.assertEqual(submit.call_count, 1)
+
+            with open(model_path, 'wb') as f:
+                f.write(b'weights-v2-after-retrain')
+            self._analyze()
+            self.assertEqual(submit.call_count, 2)
+
+    def test_results_of_a_stale_model_are_not_cached(self):
+        from catalog.port_detection import model_cache
+
+        model_path = os.path.join(self.media_root, 'models', 'port-yolo.pt')
+        os.makedirs(os.path.dirname(model_path))
+        with open(model_path, 'wb') as f:
+            f.write(b'weights-v2-after-retrain')
+
+        def detect(job, abs_image_path, model_path):
+            # This worker still holds the model loaded before the retrain.
+            model_cache.note_served([(model_path, (1, 10))])
+            return self.ports
+
+        with mock.patch('catalog.views.PortAnalyzeView.inference_service.submit',
+                        side_effect=detect) as submit:
+            self._analyze()
+            self._analyze()
+
+        self.assertEqual(submit.call_count, 2)
+
+    def test_yolo_failure_is_not_cached(self):
+        with mock.patch('catalog.views.PortAnalyzeView.inference_service.submit',
+                        side_effect=RuntimeError('boom')), \
+                mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                           return_value=self.ports) as opencv:
+            model_path = os.path.join(self.media_root, 'models', 'port-yolo.pt')
+            os.makedirs(os.path.dirname(model_path))
+            with open(model_path, 'wb') as f:
+                f.write(b'weights')
+            self._analyze()
+            self._analyze()
+
+        self.assertEqual(opencv.call_count, 2)
+
+    def test_cache_hits_do_not_count_against_throttle(self):
+        from accounts.throttles import PortAnalysisThrottle
+
+        with mock.patch.object(PortAnalysisThrottle, 'rate', '1/h'), \
+                mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                           return_value=self.ports):
+            self.assertEqual(self._analyze().status_code, status.HTTP_200_OK)
+            for _ in range(3):
+                self.assertEqual(self._analyze().status_code, status.HTTP_200_OK)
+
+            other = os.path.join(self.media_root, 'components', 'other.jpg')
+            with open(other, 'wb') as f:
+                f.write(b'another-image')
+            response = self.client.post(
+                self.url, {'image_path': 'components/other.jpg'}, format='json')
+            self.assertEqual(response.status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class PortAnalyzeStreamTestCase(MediaRootMixin, TestCase):
+    """SSE variant: raw detections, then named ports, then OCR names."""
+
+    def setUp(self):
+        super().setUp()
+        caches['port_analysis'].clear()
+
+        self.client, _ = _authenticated_client(
+            'stream-analyze-user', can_view_model_training_status=True)
+
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        with open(os.path.join(self.media_root, 'components', 'panel.jpg'), 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+        os.makedirs(os.path.join(self.media_root, 'models'))
+        with open(os.path.join(self.media_root, 'models', 'port-yolo.pt'), 'wb') as f:
+            f.write(b'weights')
+        # Two overlapping boxes on the same port plus a second port.
+        self.raw = [
+            {'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+             'confidence': 0.9, '_bw_pct': 4.0, '_bh_pct': 20.0},
+            {'port_type': 'RJ45', 'pos_x': 10.3, 'pos_y': 50.2,
+             'confidence': 0.6, '_bw_pct': 4.0, '_bh_pct': 20.0},
+            {'port_type': 'RJ45', 'pos_x': 20.0, 'pos_y': 50.0,
+             'confidence': 0.8, '_bw_pct': 4.0, '_bh_pct': 20.0},
+        ]
+
+    @staticmethod
+    def _jobs(raw, text=None):
+        def submit(job, *args, **kwargs):
+            if job == 'detect_yolo_raw':
+                _served_from_disk(args[1])
+                return raw
+            if job == 'image_text':
+                return text
+            raise AssertionError(job)
+        return submit
+
+    def _stream(self, **data):
+        response = self.client.post(
+            '/asset/port-analyze/stream',
+            {'image_path': 'components/panel.jpg', **data}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # The test client is WSGI: consumed as gunicorn would.
+        return self._parse(b''.join(response.streaming_content))
+
+    @staticmethod
+    def _parse(body):
+        events = []
+        for block in body.decode().strip().split('\n\n'):
+            name, data = block.split('\n')
+            events.append((name.removeprefix('event: '),
+                           json.loads(data.removeprefix('data: '))))
+        return events
+
+    def test_stages_stream_in_order(self):
+        text = {'width': 1000, 'height': 200,
+                'boxes': [[100, 60, 'Gi1/0/1', 0.9], [200, 60, 'Gi1/0/2', 0.9]]}
+        with mock.patch('catalog.views.PortAnalyzeStreamView.inference_service.submit',
+                        side_effect=self._jobs(self.raw, text)):
+            events = self._stream(ocr_names=True)
+
+        self.assertEqual([name for name, _ in events],
+                         ['detections', 'ports', 'names', 'done'])
+        detections, ports, names = (data for _, data in events[:3])
+        self.assertEqual(len(detections), 3)
+        self.assertNotIn('_bw_pct', detections[0])
+        self.assertEqual(len(ports), 2)
+        self.assertEqual([p['name'] for p in names], ['Gi1/0/1', 'Gi1/0/2'])
+
+    def test_wsgi_sends_each_event_as_it_is_produced(self):
+        text = {'width': 1000, 'height': 200, 'boxes': []}
+        with mock.patch('catalog.views.PortAnalyzeStreamView.inference_service.submit',
+                        side_effect=self._jobs(self.raw, text)) as submit:
+            response = self.client.post(
+                '/asset/port-analyze/stream',
+                {'image_path': 'components/panel.jpg', 'ocr_names': True},
+                format='json')
+            chunks = iter(response.streaming_content)
+
+            first = next(chunks)
+            # Raw detections are out before the OCR job is even submitted.
+            self.assertEqual(self._parse(first)[0][0], 'detections')
+            self.assertEqual([c.args[0] for c in submit.call_args_list],
+                             ['detect_yolo_raw'])
+            self.assertEqual(self._parse(next(chunks))[0][0], 'ports')
+            rest = [self._parse(chunk)[0][0] for chunk in chunks]
+
+        self.assertEqual(rest, ['names', 'done'])
+
+    def test_asgi_stream_is_an_async_generator(self):
+        from catalog.views.PortAnalyzeStreamView import PortAnalyzeStreamView
+
+        view = PortAnalyzeStreamView()
+        events = view._async_events(
+            os.path.join(self.media_root, 'components', 'panel.jpg'),
+            'components/panel.jpg', view._model_path(), '')
+
+        async def read():
+            return b''.join([chunk async for chunk in events])
+
+        with mock.patch('catalog.views.PortAnalyzeStreamView.inference_service.submit',
+                        side_effect=self._jobs(self.raw)):
+            body = async_to_sync(read)()
+
+        self.assertEqual([name for name, _ in self._parse(body)],
+                         ['detections', 'ports', 'done'])
+
+    def test_second_stream_is_served_from_cache(self):
+        with mock.patch('catalog.views.PortAnalyzeStreamView.inference_service.submit',
+                        side_effect=self._jobs(self.raw)) as submit:
+            first = self._stream()
+            second = self._stream()
+
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(second, [('ports', first[1][1]), ('done', {'source': 'cache'})])
+
+    def test_opencv_fallback_sends_no_raw_detections(self):
+        ports = [{'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+                  'confidence': 0.5}]
+        with mock.patch('catalog.views.PortAnalyzeStreamView.inference_service.submit',
+                        side_effect=self._jobs([])), \
+                mock.patch('catalog.views.PortAnalyzeStreamView.detect_with_opencv',
+                           return_value=ports):
+            events = self._stream()
+
+        self.assertEqual([name for name, _ in events], ['ports', 'done'])
+
+    def test_busy_service_ends_with_error_event(self):
+        from catalog.port_detection.inference_service import InferenceBusy
+
+        with mock.patch('catalog.views.PortAnalyzeStreamView.inference_service.submit',
+                        side_effect=InferenceBusy()):
+            events = self._stream()
+
+        self.assertEqual(events[-1][0], 'error')
+        self.assertEqual(events[-1][1]['status'], 503)
+
+    def test_invalid_path_answers_before_streaming(self):
+        response = self.client.post('/asset/port-analyze/stream',
+                                    {'image_path': '../etc/passwd'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class InferenceServiceTestCase(MediaRootMixin, TestCase):
+    """Views forward YOLO / OCR jobs to the local inference service."""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+
+        super().setUp()
+        self.socket = os.path.join(self.media_root, 'inference.sock')
+        socket_override = override_settings(PORT_INFERENCE_SOCKET=self.socket)
+        socket_override.enable()
+        self.addCleanup(socket_override.disable)
+        caches['port_analysis'].clear()
+
+        self.client, _ = _authenticated_client(
+            'inference-service-user', can_view_model_training_status=True)
+
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        cv2.imwrite(os.path.join(self.media_root, 'components', 'panel.png'),
+                    np.full((100, 400, 3), 128, dtype=np.uint8))
+        os.makedirs(os.path.join(self.media_root, 'models'))
+        with open(os.path.join(self.media_root, 'models', 'port-yolo.pt'), 'wb') as f:
+            f.write(b'weights')
+
+    def _serve(self, jobs, workers=1, queue_size=0, job_timeout=5.0):
+        """Run an InferenceServer on self.socket with *jobs* in a thread pool."""
+        from concurrent.futures import ThreadPoolExecutor
+        from catalog.port_detection import inference_service
+
+        jobs_patch = mock.patch.dict(inference_service._JOBS, jobs)
+        jobs_patch.start()
+        self.addCleanup(jobs_patch.stop)
+        server = inference_service.InferenceServer(
+            self.socket, workers=workers, queue_size=queue_size,
+            job_timeout=job_timeout)
+        # Same protocol and admission control, without spawning Django
+        # worker processes.
+        server._executor.shutdown()
+        server._executor = ThreadPoolExecutor(max_workers=workers)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(server.shutdown)
+        for _ in range(200):
+            if os.path.exists(self.socket):
+                break
+            threading.Event().wait(0.01)
+        return server
+
+    def _click(self):
+        return self.client.post('/asset/port-click-analyze', {
+            'image_path': 'components/panel.png', 'click_x': 50, 'click_y': 50,
+        }, format='json')
+
+    def _analyze(self):
+        return self.client.post('/asset/port-analyze', {
+            'image_path': 'components/panel.png'}, format='json')
+
+    def test_job_round_trips_over_the_socket(self):
+        from catalog.port_detection import inference_service
+
+        threads = []
+
+        def image_text(path):
+            threads.append(threading.get_ident())
+            return {'path': path, 'boxes': [[1, 2, 'Gi0/1', 0.9]]}
+
+        self._serve({'image_text': image_text})
+        result = inference_service.submit('image_text', '/media/panel.png')
+
+        self.assertEqual(result, {'path': '/media/panel.png',
+                                  'boxes': [[1, 2, 'Gi0/1', 0.9]]})
+        self.assertNotEqual(threads, [threading.get_ident()])
+
+    def test_full_queue_answers_503_with_retry_after(self):
+        from catalog.port_detection import inference_service
+
+        started, release = threading.Event(), threading.Event()
+
+        def click_yolo(*args):
+            started.set()
+            release.wait(5)
+            return 'RJ45', 0.9
+
+        self._serve({'click_yolo': click_yolo}, workers=1, queue_size=0)
+        holder = threading.Thread(target=inference_service.submit,
+                                  args=('click_yolo', 'x', 1.0, 1.0))
+        holder.start()
+        self.assertTrue(started.wait(5))
+        try:
+            response = self._click()
+        finally:
+            release.set()
+            holder.join(5)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_slow_job_answers_504(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def detect_yolo(*args):
+            release.wait(5)
+            return []
+
+        self._serve({'detect_yolo': detect_yolo})
+        with override_settings(PORT_INFERENCE_TIMEOUT=0.2):
+            response = self._analyze()
+
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+
+    def test_unreachable_service_falls_back_to_opencv(self):
+        # No server listening on self.socket.
+        ports = [{'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+                  'confidence': 0.5}]
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                        return_value=ports):
+            analyze = self._analyze()
+        with mock.patch('catalog.views.PortClickAnalyzeView.click_detect_opencv',
+                        return_value=('SFP', 0.8)):
+            click = self._click()
+
+        self.assertEqual(analyze.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['port_type'] for p in analyze.data], ['RJ45'])
+        self.assertEqual(click.status_code, status.HTTP_200_OK)
+        self.assertEqual((click.data['port_type'], click.data['name']), ('SFP', None))
+
+
+class PortAnalysisJobTestCase(MediaRootMixin, TestCase):
+    """Async analysis jobs: submit, stage progress, result polling."""
+
+    def setUp(self):
+        super().setUp()
+        for alias in ('default', 'port_analysis'):
+            caches[alias].clear()
+
+        self.client = APIClient()
+        self.url = '/asset/port-analyze/jobs'
+        self.role = Role.objects.create(
+            name='job_analyze_role',
+            can_view_model_training_status=True,
+        )
+        self.user = self._user('job-analyze-user')
+        self.client.force_authenticate(user=self.user)
+
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        self.image = os.path.join(self.media_root, 'components', 'panel.jpg')
+        with open(self.image, 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+        self.ports = [{'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+                       'confidence': 0.9}]
+
+    def _user(self, username):
+        user = User.objects.create_user(username=username, password='test-pass-123')
+        user.profile.role = self.role
+        user.profile.save(update_fields=['role'])
+        return user
+
+    def _submit_eagerly(self):
+        from catalog.tasks import run_port_analysis
+        with mock.patch.object(run_port_analysis, 'delay',
+                               side_effect=lambda *args: run_port_analysis(*args)):
+            return self.client.post(
+                self.url, {'image_path': 'components/panel.jpg'}, format='json')
+
+    def test_job_runs_pipeline_and_reports_result(self):
+        from catalog.models import PortAnalysisJob
+
+        model_path = os.path.join(self.media_root, 'models', 'port-yolo.pt')
+        os.makedirs(os.path.dirname(model_path))
+        with open(model_path, 'wb') as f:
+            f.write(b'weights')
+        stages = []
+        original = PortAnalysisJob.set_stage
+
+        def record(job, stage):
+            stages.append(stage)
+            original(job, stage)
+
+        def fake_yolo(path, model, progress=None):
+            for stage in ('preprocess', 'infer', 'dedup'):
+                progress(stage)
+            return self.ports
+
+        with mock.patch('catalog.port_detection.detect_with_yolo',
+                        side_effect=fake_yolo), \
+                mock.patch.object(PortAnalysisJob, 'set_stage', record):
+            response = self._submit_eagerly()
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(stages, ['preprocess', 'infer', 'dedup', 'naming'])
+
+        polled = self.client.get(f"{self.url}/{response.data['id']}")
+        self.assertEqual(polled.status_code, status.HTTP_200_OK)
+        self.assertEqual(polled.data['status'], 'done')
+        self.assertEqual(polled.data['progress'], 100)
+        self.assertEqual(polled.data['result'][0]['port_type'], 'RJ45')
+        self.assertIn('name', polled.data['result'][0])
+
+    def test_opencv_fallback_after_empty_yolo_keeps_progress_moving(self):
+        from catalog.models import PortAnalysisJob
+
+        model_path = os.path.join(self.media_root, 'models', 'port-yolo.pt')
+        os.makedirs(os.path.dirname(model_path))
+        with open(model_path, 'wb') as f:
+            f.write(b'weights')
+        progress = []
+        original = PortAnalysisJob.set_stage
+
+        def record(job, stage):
+            original(job, stage)
+            progress.append(job.progress())
+
+        def empty_yolo(path, model, progress=None):
+            for stage in ('preprocess', 'infer', 'dedup'):
+                progress(stage)
+            return []
+
+        with mock.patch('catalog.port_detection.detect_with_yolo',
+                        side_effect=empty_yolo), \
+                mock.patch('catalog.port_detection.detect_with_opencv',
+                           return_value=self.ports), \
+                mock.patch.object(PortAnalysisJob, 'set_stage', record):
+            self._submit_eagerly()
+
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(len(progress), len(PortAnalysisJob.STAGES))
+
+    def test_cached_analysis_returns_finished_job(self):
+        from catalog.port_detection import result_cache
+        from catalog.tasks import run_port_analysis
+
+        result_cache.store(self.image, os.path.join(
+            self.media_root, 'models', 'port-yolo.pt'), [{'name': 'cached'}],
+            served=[])
+        with mock.patch.object(run_port_analysis, 'delay') as delay:
+            response = self.client.post(
+                self.url, {'image_path': 'components/panel.jpg'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['result'], [{'name': 'cached'}])
+        delay.assert_not_called()
+
+    def test_missing_image_at_run_time_fails_job(self):
+        from catalog.tasks import run_port_analysis
+
+        with mock.patch.object(run_port_analysis, 'delay'):
+            response = self.client.post(
+                self.url, {'image_path': 'components/panel.jpg'}, format='json')
+        os.remove(self.image)
+        run_port_analysis(str(response.data['id']))
+
+        polled = self.client.get(f"{self.url}/{response.data['id']}")
+        self.assertEqual(polled.data['status'], 'failed')
+        self.assertEqual(polled.data['error'], 'Image not found.')
+
+    def test_invalid_path_is_rejected_without_job(self):
+        from catalog.models import PortAnalysisJob
+
+        response = self.client.post(
+            self.url, {'image_path': '../etc/passwd'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PortAnalysisJob.objects.exists())
+
+    def test_other_users_cannot_see_job(self):
+        with mock.patch('catalog.port_detection.detect_with_opencv',
+                        return_value=self.ports):
+            response = self._submit_eagerly()
+
+        self.client.force_authenticate(user=self._user('other-job-user'))
+        polled = self.client.get(f"{self.url}/{response.data['id']}")
+        self.assertEqual(polled.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_jobs_go_to_the_default_queue_unless_configured(self):
+        import importlib
+
+        app = importlib.import_module('datacenter-app.celery_app').app
+        default = app.conf.task_default_queue
+        for task in ('catalog.run_port_analysis', 'catalog.preanalyze_ports'):
+            with self.subTest(task=task):
+                self.assertEqual(app.amqp.router.route({}, task)['queue'].name,
+                                 default)
+
+
+class UploadPreanalysisTestCase(MediaRootMixin, TestCase):
+    """Uploading an AssetModel image pre-computes its port suggestions."""
+
+    def setUp(self):
+        from catalog.models import AssetType, Vendor
+
+        super().setUp()
+        caches['port_analysis'].clear()
+
+        self.client, self.user = _authenticated_client(
+            'preanalyze-user',
+            can_create_catalog=True,
+            can_edit_catalog=True,
+            can_view_model_training_status=True,
+        )
+        self.vendor = Vendor.objects.create(name='Preanalyze Vendor')
+        self.type = AssetType.objects.create(name='Preanalyze Type')
+        self.ports = [{'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+                       'confidence': 0.9}]
+
+    @staticmethod
+    def _png():
+        import io
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buf = io.BytesIO()
+        Image.new('RGB', (64, 16), 'black').save(buf, format='PNG')
+        return SimpleUploadedFile('panel.png', buf.getvalue(),
+                                  content_type='image/png')
+
+    def _create(self, **files):
+        from catalog.tasks import preanalyze_ports
+
+        data = {'name': 'Switch', 'vendor_id': self.vendor.pk,
+                'type_id': self.type.pk, **files}
+        with mock.patch.object(preanalyze_ports, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/asset/asset_model', data,
+                                        format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED,
+                         response.data)
+        return response, delay
+
+    def test_upload_queues_preanalysis_per_image(self):
+        from catalog.models import AssetModel
+
+        response, delay = self._create(front_image=self._png(),
+                                       rear_image=self._png())
+
+        model = AssetModel.objects.get(pk=response.data['id'])
+        queued = sorted(call.args[0] for call in delay.call_args_list)
+        self.assertEqual(queued, sorted([model.front_image.name,
+                                         model.rear_image.name]))
+
+    def test_update_without_new_image_queues_nothing(self):
+        from catalog.tasks import preanalyze_ports
+
+        response, _ = self._create(front_image=self._png())
+        with mock.patch.object(preanalyze_ports, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/asset/asset_model/{response.data['id']}",
+                              {'note': 'edited'}, format='json')
+        delay.assert_not_called()
+
+    @override_settings(PORT_PREANALYZE_UPLOADS=False)
+    def test_disabled_setting_queues_nothing(self):
+        _, delay = self._create(front_image=self._png())
+        delay.assert_not_called()
+
+    def _shared_cache(self):
+        """Point ``port_analysis`` at a backend every process can read."""
+        from django.conf import settings
+
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        override = override_settings(CACHES={
+            **settings.CACHES,
+            'port_analysis': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            },
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_task_fills_cache_for_the_analyzer(self):
+        from catalog.models import AssetModel
+        from catalog.tasks import preanalyze_ports
+
+        self._shared_cache()
+        response, _ = self._create(front_image=self._png())
+        name = AssetModel.objects.get(pk=response.data['id']).front_image.name
+
+        with mock.patch('catalog.port_detection.detect_with_opencv',
+                        return_value=self.ports) as detect:
+            preanalyze_ports(name)
+            preanalyze_ports(name)  # already cached: no second detection
+            analyzed = self.client.post('/asset/port-analyze',
+                                        {'image_path': name}, format='json')
+
+        self.assertEqual(detect.call_count, 1)
+        self.assertEqual(analyzed.status_code, status.HTTP_200_OK)
+        self.assertEqual(analyzed.data[0]['port_type'], 'RJ45')
+        self.assertIn('name', analyzed.data[0])
+
+    def test_per_process_cache_skips_analysis(self):
+        from catalog.models import AssetModel, PanelHash
+        from catalog.port_detection import result_cache
+        from catalog.tasks import preanalyze_ports
+
+        # The default LocMemCache lives in the worker process only.
+        self.assertFalse(result_cache.is_shared())
+        response, _ = self._create(front_image=self._png())
+        model = AssetModel.objects.get(pk=response.data['id'])
+
+        with mock.patch('catalog.port_detection.detect_with_opencv',
+                        return_value=self.ports) as detect, \
+                self.assertLogs('catalog.tasks', 'WARNING') as logs:
+            preanalyze_ports(model.front_image.name)
+
+        detect.assert_not_called()
+        self.assertIn('USE_REDIS_CACHE', logs.output[0])
+        # The panel hash lives in the database and is still indexed.
+        self.assertTrue(PanelHash.objects.filter(asset_model=model).exists())
+
+    def test_shared_backends(self):
+        from catalog.port_detection import result_cache
+
+        self.assertFalse(result_cache.is_shared())
+        self._shared_cache()
+        self.assertTrue(result_cache.is_shared())
+
+
+class PanelLayoutMatchTestCase(MediaRootMixin, TestCase):
+    """A near-identical, already mapped panel short-circuits detection."""
+
+    def setUp(self):
+        from catalog.models import AssetModel, AssetModelPort, AssetType, Vendor
+        from catalog.port_detection import image_cache
+
+        super().setUp()
+        caches['port_analysis'].clear()
+        image_cache.clear()
+
+        self.client, _ = _authenticated_client(
+            'layout-match-user', can_view_model_training_status=True)
+
+        self._write('mapped_front.png', self._panel(2400))
+        vendor = Vendor.objects.create(name='Layout Vendor')
+        asset_type = AssetType.objects.create(name='Layout Type')
+        self.mapped = AssetModel.objects.create(
+            name='Switch 48', vendor=vendor, type=asset_type,
+            front_image='mapped_front.png')
+        AssetModelPort.objects.create(asset_model=self.mapped, name='Gi1/0/1',
+                                      side='front', pos_x=10.0, pos_y=40.0)
+        AssetModelPort.objects.create(asset_model=self.mapped, name='Gi1/0/2',
+                                      side='front', pos_x=14.0, pos_y=40.0)
+        AssetModelPort.objects.create(asset_model=self.mapped, name='PSU',
+                                      side='rear', pos_x=50.0, pos_y=50.0)
+
+    @staticmethod
+    def _panel(width, ports=24, seed=0):
+        import numpy as np
+        import cv2
+
+        height = width // 4
+        # Bezel shading left to right, as on a photographed panel.
+        shade = np.linspace(90, 220, width).astype(np.uint8)
+        img = np.repeat(np.tile(shade, (height, 1))[:, :, None], 3, axis=2)
+        pitch = width / (ports + 2)
+        for col in range(ports):
+            x = int(pitch * (1 + col))
+            cv2.rectangle(img, (x, height // 3), (x + int(pitch * 0.7), height // 2),
+                          (35, 35, 35), -1)
+        noise = np.random.default_rng(seed).normal(0, 4, img.shape)
+        return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+    def _write(self, name, img):
+        import cv2
+        cv2.imwrite(os.path.join(self.media_root, name), img)
+
+    def _analyze(self, name):
+        return self.client.post('/asset/port-analyze', {'image_path': name},
+                                format='json')
+
+    def test_resized_copy_matches_and_skips_detection(self):
+        from catalog.port_detection.panel_hash import hamming, image_dhash, index_model
+
+        index_model(self.mapped)
+        self._write('variant.jpg', self._panel(1200, seed=1))
+        self.assertLessEqual(hamming(
+            image_dhash(os.path.join(self.media_root, 'mapped_front.png')),
+            image_dhash(os.path.join(self.media_root, 'variant.jpg'))), 6)
+
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv') as detect:
+            response = self._analyze('variant.jpg')
+
+        detect.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['name'] for p in response.data], ['Gi1/0/1', 'Gi1/0/2'])
+        self.assertEqual(response.data[0]['confidence'], 1.0)
+        self.assertEqual(response.data[0]['matched_model'], self.mapped.pk)
+
+    def test_different_panel_runs_detection(self):
+        from catalog.port_detection.panel_hash import index_model
+
+        index_model(self.mapped)
+        self._write('other.png', self._panel(2400, ports=6)[:, ::-1])
+
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                        return_value=[]) as detect:
+            self._analyze('other.png')
+        detect.assert_called_once()
+
+    def test_own_and_replaced_images_are_not_matched(self):
+        from catalog.port_detection.panel_hash import index_model
+
+        index_model(self.mapped)
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                        return_value=[]) as detect:
+            self._analyze('mapped_front.png')
+            self.assertEqual(detect.call_count, 1)
+
+            # The model's image was replaced after indexing: row is stale.
+            self._write('copy.png', self._panel(2400, seed=2))
+            self._write('replaced.png', self._panel(2400, ports=6))
+            self.mapped.front_image = 'replaced.png'
+            self.mapped.save()
+            self._analyze('copy.png')
+            self.assertEqual(detect.call_count, 2)
+
+    def test_layout_matches_do_not_count_against_throttle(self):
+        from accounts.throttles import PortAnalysisThrottle
+        from catalog.port_detection.panel_hash import index_model
+
+        caches['default'].clear()   # throttle history of earlier tests
+        index_model(self.mapped)
+        self._write('variant.jpg', self._panel(1200, seed=1))
+        self._write('other.png', self._panel(2400, ports=6)[:, ::-1])
+        self._write('third.png', self._panel(2400, ports=6, seed=5)[:, ::-1])
+
+        with mock.patch.object(PortAnalysisThrottle, 'rate', '1/h'), \
+                mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                           return_value=[]):
+            for _ in range(3):
+                self.assertEqual(self._analyze('variant.jpg').status_code,
+                                 status.HTTP_200_OK)
+            self.assertEqual(self._analyze('other.png').status_code,
+                             status.HTTP_200_OK)
+            self.assertEqual(self._analyze('third.png').status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_prefilter_keeps_every_hash_within_the_threshold(self):
+        from catalog.models import AssetModel, PanelHash
+        from catalog.port_detection.panel_hash import (
+            _candidates, bands, hamming, to_signed,
+        )
+
+        query = 0x8f3a_1c07_e5d2_4b69
+
+        def flip(*bits):
+            value = query
+            for bit in bits:
+                value ^= 1 << bit
+            return value
+
+        hashes = {
+            'exact': query,
+            # 6 bits over all four bands (2, 2, 1, 1): within the threshold.
+            'spread': flip(0, 1, 16, 17, 32, 48),
+            # 8 bits, two per band: beyond it, and no band within 1 bit.
+            'far': flip(0, 1, 16, 17, 32, 33, 48, 49),
+            'unrelated': ~query & 0xFFFF_FFFF_FFFF_FFFF,
+        }
+        for name, value in hashes.items():
+            PanelHash.objects.create(
+                asset_model=AssetModel.objects.create(
+                    name=name, vendor=self.mapped.vendor, type=self.mapped.type),
+                side='front', image_name=f'{name}.png', dhash=to_signed(value),
+                **{f'band{i}': band for i, band in enumerate(bands(value))})
+
+        found = {row.asset_model.name for row in _candidates(query, 6)}
+
+        self.assertEqual(found, {'exact', 'spread'})
+        self.assertEqual(hamming(query, to_signed(hashes['spread'])), 6)
+        self.assertEqual(hamming(query, hashes['far']), 8)
+
+    def test_backfill_command_indexes_catalog(self):
+        from django.core.management import call_command
+        from catalog.models import PanelHash
+
+        call_command('index_panel_hashes', stdout=io.StringIO())
+
+        row = PanelHash.objects.get()
+        self.assertEqual((row.asset_model, row.side, row.image_name),
+                         (self.mapped, 'front', 'mapped_front.png'))
+
+
+def _use_sqlite_file(path):
+    """In a forked test process: point the default connection at *path*."""
+    from django.db import connections
+    from django.db.utils import load_backend
+
+    db = dict(connections.settings['default'], NAME=path, OPTIONS={'timeout': 30})
+    connections['default'] = load_backend(db['ENGINE']).DatabaseWrapper(db, 'default')
+
+
+def _create_training_state_table(path):
+    from django.db import connection
+    from catalog.models import TrainingState
+
+    _use_sqlite_file(path)
+    with connection.schema_editor() as editor:
+        editor.create_model(TrainingState)
+
+
+def _hammer_corrections(path, count, results):
+    from catalog.port_detection.training_state import record_correction
+
+    _use_sqlite_file(path)
+    tokens = []
+    for _ in range(count):
+        _, token = record_correction(min_corrections=25, min_interval_min=0)
+        if token is not None:
+            tokens.append(str(token))
+    results.put(tokens)
+
+
+class TrainingStateTestCase(MediaRootMixin, TestCase):
+    """Correction counters and the retraining lease are shared via the DB."""
+
+    def test_lease_is_taken_once_and_released_with_late_corrections(self):
+        from catalog.port_detection.training_state import (
+            finish_training,
+            get_state,
+            record_correction,
+        )
+
+        tokens = [record_correction(3, 0)[1] for _ in range(3)]
+        self.assertEqual(tokens[:2], [None, None])
+        self.assertIsNotNone(tokens[2])
+        self.assertTrue(get_state().is_training)
+
+        # Corrections during training count, but cannot start another run.
+        state, token = record_correction(3, 0)
+        self.assertIsNone(token)
+        self.assertEqual(state.corrections_since_last_train, 4)
+
+        self.assertTrue(finish_training(tokens[2]))
+        state = get_state()
+        self.assertFalse(state.is_training)
+        self.assertEqual(state.corrections_since_last_train, 1)
+        self.assertEqual(state.total_corrections, 4)
+        self.assertIsNotNone(state.last_training_at)
+        self.assertFalse(finish_training(tokens[2]))
+
+    def test_expired_lease_can_be_taken_over(self):
+        from django.utils import timezone
+        from catalog.port_detection.training_state import (
+            finish_training,
+            get_state,
+            record_correction,
+        )
+
+        _, first = record_correction(1, 0)
+        state = get_state()
+        state.lease_expires_at = timezone.now() - timezone.timedelta(minutes=1)
+        state.save()
+
+        _, second = record_correction(1, 0)
+        self.assertIsNotNone(second)
+        self.assertFalse(finish_training(first))
+        self.assertTrue(get_state().is_training)
+
+    def test_min_interval_blocks_retrain(self):
+        from catalog.port_detection.training_state import finish_training, record_correction
+
+        finish_training(record_correction(1, 0)[1])
+        self.assertIsNone(record_correction(1, 60)[1])
+
+    def test_legacy_json_state_is_imported(self):
+        from catalog.port_detection.training_state import get_state
+
+        os.makedirs(os.path.join(self.media_root, 'models'))
+        with open(os.path.join(self.media_root, 'models', 'training_state.json'), 'w') as f:
+            json.dump({'corrections_since_last_train': 7, 'total_corrections': 40,
+                       'last_training_iso': '2026-01-01T00:00:00+00:00',
+                       'is_training': True}, f)
+
+        state = get_state()
+        self.assertEqual((state.corrections_since_last_train, state.total_corrections),
+                         (7, 40))
+        self.assertFalse(state.is_training)
+
+    def test_concurrent_processes_lose_no_increments(self):
+        import multiprocessing
+        import sqlite3
+
+        path = os.path.join(self.media_root, 'state.sqlite3')
+        ctx = multiprocessing.get_context('fork')
+        setup = ctx.Process(target=_create_training_state_table, args=(path,))
+        setup.start()
+        setup.join()
+
+        results = ctx.Queue()
+        workers = [ctx.Process(target=_hammer_corrections, args=(path, 20, results))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        tokens = [token for _ in workers for token in results.get(timeout=60)]
+        for worker in workers:
+            worker.join()
+
+        with sqlite3.connect(path) as db:
+            row = db.execute('SELECT corrections_since_last_train, total_corrections '
+                             'FROM training_state').fetchone()
+        self.assertEqual(row, (80, 80))
+        self.assertEqual(len(tokens), 1)
+
+    def test_correction_view_dispatches_retrain_with_lease(self):
+        from catalog.models import TrainingState
+        from catalog.tasks import retrain_yolo
+
+        client, _ = _authenticated_client('training-state-user',
+                                          can_provide_port_corrections=True)
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        with open(os.path.join(self.media_root, 'components', 'panel.jpg'), 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+
+        with mock.patch('catalog.views.PortCorrectionView.MIN_CORRECTIONS', 2), \
+                mock.patch.object(retrain_yolo, 'delay') as delay:
+            responses = [client.post('/asset/port-correction', {
+                'image_path': 'components/panel.jpg', 'actual_type': 'SFP+',
+                'pos_x': 10 + i, 'pos_y': 50}, format='json') for i in range(3)]
+
+        self.assertEqual([r.data['training_triggered'] for r in responses],
+                         [False, True, False])
+        self.assertEqual(responses[-1].data['total_corrections'], 3)
+        delay.assert_called_once()
+        self.assertEqual(delay.call_args.args[2],
+                         str(TrainingState.objects.get().lease_token))
+        # No weights yet: the first retrain is a full one.
+        self.assertEqual(delay.call_args.args[3], 'full')
+        self.assertEqual(responses[1].data['training_mode'], 'full')
+
+
+class FineTuneTrainingTestCase(MediaRootMixin, TestCase):
+    """Small correction deltas fine-tune the current weights."""
+
+    def setUp(self):
+        super().setUp()
+        self.models_dir = os.path.join(self.media_root, 'models')
+        os.makedirs(self.models_dir)
+
+    def _weights(self):
+        with open(os.path.join(self.models_dir, 'port-yolo.pt'), 'wb') as f:
+            f.write(b'current-weights')
+
+    def _fake_ultralytics(self, during_epoch=None):
+        """
+        A stand-in ``ultralytics`` module whose training runs one epoch
+        (calling *during_epoch*, then the ``on_fit_epoch_end`` callbacks)
+        and writes best.pt.  ``model.trainer`` is left behind.
+        """
+        best = os.path.join(self.models_dir, 'port-yolo', 'weights', 'best.pt')
+        callbacks = []
+
+        def train(**kwargs):
+            model.trainer = SimpleNamespace(stop=False)
+            if during_epoch is not None:
+                during_epoch()
+            for callback in callbacks:
+                callback(model.trainer)
+            os.makedirs(os.path.dirname(best), exist_ok=True)
+            with open(best, 'wb') as f:
+                f.write(b'new-weights')
+            return SimpleNamespace(results_dict={'metrics/mAP50(B)': 0.91,
+                                                 'metrics/mAP50-95(B)': 0.64})
+
+        model = mock.Mock()
+        model.train.side_effect = train
+        model.add_callback.side_effect = (
+            lambda event, callback: event == 'on_fit_epoch_end'
+            and callbacks.append(callback))
+        module = SimpleNamespace(YOLO=mock.Mock(return_value=model))
+        return mock.patch.dict('sys.modules', {'ultralytics': module}), module, model
+
+    def test_mode_follows_delta_and_weights(self):
+        from catalog.port_detection.training_state import choose_mode
+
+        self.assertEqual(choose_mode(5, self.models_dir), 'full')
+        self._weights()
+        self.assertEqual(choose_mode(5, self.models_dir), 'finetune')
+        with override_settings(PORT_FULL_RETRAIN_CORRECTIONS=5):
+            self.assertEqual(choose_mode(5, self.models_dir), 'full')
+
+    def test_full_run_is_forced_periodically(self):
+        from datetime import datetime, timedelta, timezone
+
+        from catalog.port_detection.training_state import (
+            choose_mode, get_state, record_run,
+        )
+
+        self._weights()
+        now = datetime.now(tz=timezone.utc)
+        record_run({'mode': 'full', 'finished_at': now.isoformat()})
+        for _ in range(9):
+            record_run({'mode': 'finetune', 'finished_at': now.isoformat()})
+        self.assertEqual(choose_mode(5, self.models_dir), 'finetune')
+
+        record_run({'mode': 'finetune', 'finished_at': now.isoformat()})
+        self.assertEqual(
+            get_state().last_runs['finetune']['finetunes_since_full'], 10)
+        self.assertEqual(choose_mode(5, self.models_dir), 'full')
+        with override_settings(PORT_MAX_CONSECUTIVE_FINETUNES=0):
+            self.assertEqual(choose_mode(5, self.models_dir), 'finetune')
+
+        # A full run resets the count...
+        record_run({'mode': 'full', 'finished_at': now.isoformat()})
+        self.assertEqual(choose_mode(5, self.models_dir), 'finetune')
+
+        # ...and is due again once it is older than the maximum age.
+        old = (now - timedelta(days=31)).isoformat()
+        self.assertEqual(choose_mode(5, self.models_dir,
+                                     {'full': {'finished_at': old}}), 'full')
+        with override_settings(PORT_FULL_RETRAIN_MAX_AGE_DAYS=60):
+            self.assertEqual(choose_mode(5, self.models_dir,
+                                         {'full': {'finished_at': old}}),
+                             'finetune')
+
+    def test_finetune_starts_from_current_weights_and_reports(self):
+        from catalog.port_detection.training_state import get_state, run_training
+
+        self._weights()
+        patch, module, model = self._fake_ultralytics()
+        with patch:
+            report = run_training('data.yaml', self.models_dir, 'finetune')
+
+        module.YOLO.assert_called_once_with(
+            os.path.join(self.models_dir, 'port-yolo.pt'))
+        kwargs = model.train.call_args.kwargs
+        self.assertEqual((kwargs['epochs'], kwargs['lr0'], kwargs['freeze']),
+                         (15, 0.001, 10))
+        self.assertEqual((report['mode'], report['map50'], report['map50_95']),
+                         ('finetune', 0.91, 0.64))
+        with open(report['weights'], 'rb') as f:
+            self.assertEqual(f.read(), b'new-weights')
+        self.assertEqual(get_state().last_runs['finetune']['epochs'], 15)
+
+    def test_finetune_without_weights_trains_from_scratch(self):
+        from catalog.port_detection.training_state import run_training
+
+        patch, module, model = self._fake_ultralytics()
+        with patch:
+            report = run_training('data.yaml', self.models_dir, 'finetune')
+
+        module.YOLO.assert_called_once_with('yolov8n.pt')
+        self.assertEqual(model.train.call_args.kwargs['epochs'], 100)
+        self.assertEqual(report['mode'], 'full')
+
+    def test_training_renews_its_lease_every_epoch(self):
+        from django.utils import timezone
+        from catalog.port_detection.training_state import (
+            get_state,
+            record_correction,
+            run_training,
+        )
+
+        _, token = record_correction(1, 0)
+        state = get_state()
+        state.lease_expires_at = timezone.now() + timezone.timedelta(minutes=1)
+        state.save(update_fields=['lease_expires_at'])
+
+        patch, _, model = self._fake_ultralytics()
+        with patch:
+            report = run_training('data.yaml', self.models_dir, 'full', token)
+
+        self.assertFalse(model.trainer.stop)
+        self.assertGreater(get_state().lease_expires_at,
+                           timezone.now() + timezone.timedelta(minutes=60))
+        self.assertEqual(report['weights'],
+                         os.path.join(self.models_dir, 'port-yolo.pt'))
+
+    def test_training_that_lost_its_lease_publishes_nothing(self):
+        from django.utils import timezone
+        from catalog.port_detection.training_state import (
+            get_state,
+            record_correction,
+            run_training,
+        )
+
+        self._weights()
+        _, token = record_correction(1, 0)
+
+        def lease_expires_and_is_taken_over():
+            state = get_state()
+            state.lease_expires_at = timezone.now() - timezone.timedelta(minutes=1)
+            state.save(update_fields=['lease_expires_at'])
+            self.assertIsNotNone(record_correction(1, 0)[1])
+
+        patch, _, model = self._fake_ultralytics(lease_expires_and_is_taken_over)
+        with patch:
+            report = run_training('data.yaml', self.models_dir, 'finetune', token)
+
+        self.assertTrue(model.trainer.stop)
+        self.assertIsNone(report['weights'])
+        with open(os.path.join(self.models_dir, 'port-yolo.pt'), 'rb') as f:
+            self.assertEqual(f.read(), b'current-weights')
+        self.assertEqual(get_state().last_runs, {})
+
+    def test_status_view_reports_both_modes(self):
+        from catalog.port_detection.training_state import record_run
+
+        record_run({'mode': 'full', 'wall_s': 3600.0, 'map50': 0.9})
+        record_run({'mode': 'finetune', 'wall_s': 420.0, 'map50': 0.89})
+        client, _ = _authenticated_client('training-status-user',
+                                          can_view_model_training_status=True)
+
+        response = client.get('/asset/port-training/status')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['last_runs']), {'full', 'finetune'})
+        self.assertEqual(response.data['last_runs']['finetune']['wall_s'], 420.0)
+
+
+class TrainingDatasetManifestTestCase(MediaRootMixin, TestCase):
+    """Training samples are recorded in the manifest as they are written."""
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        self.image = os.path.join(self.media_root, 'components', 'panel.jpg')
+        with open(self.image, 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+
+    def _annotate(self, annotations):
+        client, _ = _authenticated_client('manifest-user',
+                                          can_provide_port_training=True)
+        return client.post('/asset/port-annotate', {
+            'image_path': 'components/panel.jpg', 'side': 'front',
+            'annotations': annotations}, format='json')
+
+    def test_annotation_is_recorded_and_counted_without_listing(self):
+        import hashlib
+        from catalog.models import AssetModel, AssetType, TrainingSample, Vendor
+        from catalog.port_detection.dataset import sample_key, sample_paths
+
+        asset_model = AssetModel.objects.create(
+            name='Manifest Switch',
+            vendor=Vendor.objects.create(name='Manifest Vendor'),
+            type=AssetType.objects.create(name='Manifest Type'),
+            front_image='components/panel.jpg',
+        )
+
+        with mock.patch('os.listdir', side_effect=AssertionError('listdir')):
+            response = self._annotate([
+                {'port_type': 'RJ45', 'pos_x': 10, 'pos_y': 50},
+                {'port_type': 'SFP+', 'pos_x': 60, 'pos_y': 50},
+            ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'saved': 2, 'total_images': 1})
+        sample = TrainingSample.objects.get()
+        self.assertEqual(sample.key, sample_key('components/panel.jpg', 'front'))
+        self.assertEqual((sample.source, sample.label_count, sample.asset_model),
+                         ('annotation', 2, asset_model))
+        image_path, label_path = sample_paths(sample.key, sample.split)
+        with open(label_path, 'rb') as f:
+            self.assertEqual(sample.label_sha256, hashlib.sha256(f.read()).hexdigest())
+        self.assertEqual(sample.image_sha256,
+                         hashlib.sha256(b'not-really-a-jpeg').hexdigest())
+        self.assertTrue(os.path.isfile(image_path))
+
+    def test_recorded_split_wins_over_hash(self):
+        from catalog.port_detection.dataset import save_sample, split_for
+
+        key = '0' * 16                      # hash split: val
+        self.assertEqual(split_for(key), 'val')
+        save_sample(key, 'train', self.image, ['0 0.5 0.5 0.1 0.1\n'],
+                    source='annotation')
+        self.assertEqual(split_for(key), 'train')
+
+    def test_failed_label_move_rolls_back_the_row(self):
+        from catalog.models import TrainingSample
+        from catalog.port_detection.dataset import save_sample, sample_paths
+
+        save_sample('a' * 16, 'train', self.image, ['0 0.5 0.5 0.1 0.1\n'],
+                    source='annotation')
+        with mock.patch('catalog.port_detection.dataset.os.replace',
+                        side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                save_sample('a' * 16, 'train', self.image,
+                            ['0 0.5 0.5 0.1 0.1\n', '1 0.2 0.2 0.1 0.1\n'],
+                            source='correction')
+
+        sample = TrainingSample.objects.get()
+        self.assertEqual((sample.source, sample.label_count), ('annotation', 1))
+        label_dir = os.path.dirname(sample_paths('a' * 16, 'train')[1])
+        self.assertEqual(sorted(os.listdir(label_dir)), ['aaaaaaaaaaaaaaaa.txt'])
+
+    def test_data_yaml_val_split_comes_from_manifest(self):
+        import yaml
+        from catalog.port_detection.dataset import save_sample, training_dir
+        from catalog.port_detection.training_state import write_data_yaml
+
+        save_sample('b' * 16, 'train', self.image, ['0 0.5 0.5 0.1 0.1\n'],
+                    source='annotation')
+        with open(write_data_yaml(training_dir())) as f:
+            self.assertTrue(yaml.safe_load(f)['val'].endswith('images/train'))
+
+        save_sample('0' * 16, 'val', self.image, ['0 0.5 0.5 0.1 0.1\n'],
+                    source='annotation')
+        with open(write_data_yaml(training_dir())) as f:
+            self.assertTrue(yaml.safe_load(f)['val'].endswith('images/val'))
+
+    def test_correction_reads_and_writes_the_label_under_the_row_lock(self):
+        from django.db import connection
+        from catalog.models import TrainingSample
+        from catalog.port_detection import dataset
+
+        client, _ = _authenticated_client('manifest-correction-user',
+                                          can_provide_port_corrections=True)
+        calls = []
+        # TestCase already wraps the test in transactions.
+        outer = len(connection.atomic_blocks) + 1
+
+        def record(name, func):
+            def wrapper(*args, **kwargs):
+                calls.append((name, len(connection.atomic_blocks) >= outer,
+                              TrainingSample.objects.exists()))
+                return func(*args, **kwargs)
+            return wrapper
+
+        with mock.patch('catalog.views.PortCorrectionView.lock_sample',
+                        record('lock', dataset.lock_sample)), \
+                mock.patch('catalog.views.PortCorrectionView.read_label',
+                           record('read', dataset.read_label)), \
+                mock.patch('catalog.views.PortCorrectionView.save_sample',
+                           record('save', dataset.save_sample)), \
+                mock.patch('catalog.views.PortCorrectionView.MIN_CORRECTIONS', 100):
+            for x in (10, 60):
+                response = client.post('/asset/port-correction', {
+                    'image_path': 'components/panel.jpg', 'actual_type': 'SFP+',
+                    'pos_x': x, 'pos_y': 50}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Locked (row created first) before the label is read, in the
+        # transaction that writes it.
+        self.assertEqual(calls[:3], [('lock', True, False), ('read', True, True),
+                                     ('save', True, True)])
+        sample = TrainingSample.objects.get()
+        self.assertEqual((sample.source, sample.label_count), ('correction', 2))
+
+    def test_staging_names_differ_per_thread(self):
+        from catalog.port_detection.dataset import _staging_path
+
+        names = [_staging_path('/data/labels/train/a.txt')]
+        thread = threading.Thread(
+            target=lambda: names.append(_staging_path('/data/labels/train/a.txt')))
+        thread.start()
+        thread.join()
+
+        self.assertNotEqual(names[0], names[1])
+        self.assertTrue(all(name.endswith('.tmp') for name in names))
+
+    def test_index_command_imports_and_prunes(self):
+        from django.core.management import call_command
+        from catalog.models import TrainingSample
+        from catalog.port_detection.dataset import sample_paths, save_sample
+
+        save_sample('c' * 16, 'train', self.image, ['0 0.5 0.5 0.1 0.1\n'],
+                    source='annotation')
+        os.remove(sample_paths('c' * 16, 'train')[1])
+        _, orphan = sample_paths('d' * 16, 'val')
+        os.makedirs(os.path.dirname(orphan))
+        with open(orphan, 'w') as f:
+            f.write('0 0.5 0.5 0.1 0.1\n2 0.3 0.3 0.1 0.1\n')
+
+        out = io.StringIO()
+        call_command('index_training_samples', stdout=out)
+
+        sample = TrainingSample.objects.get()
+        self.assertEqual((sample.key, sample.split, sample.source, sample.label_count),
+                         ('d' * 16, 'val', 'imported', 2))
+        self.assertIn('aggiunti: 1, rimossi: 1', out.getvalue())
+
+
+class TrainingImageStoreTestCase(MediaRootMixin, TestCase):
+    """Sample images are stored once by content and linked into the splits."""
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'components'))
+
+    def _upload(self, name, data=b'panel-bytes'):
+        path = os.path.join(self.media_root, 'components', name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _save(self, key, path):
+        from catalog.port_detection.dataset import save_sample
+
+        return save_sample(key, 'train', path, ['0 0.5 0.5 0.1 0.1\n'],
+                           source='annotation')
+
+    def test_images_are_linked_not_copied(self):
+        from catalog.port_detection.dataset import object_path, sample_paths
+
+        upload = self._upload('a.jpg')
+        sample = self._save('a' * 16, upload)
+        self._save('b' * 16, self._upload('b.jpg'))       # same content
+
+        obj = object_path(sample.image_sha256)
+        for key in ('a' * 16, 'b' * 16):
+            image_path, _ = sample_paths(key, 'train')
+            self.assertTrue(os.path.samefile(image_path, obj))
+        self.assertTrue(os.path.samefile(upload, obj))
+        self.assertEqual(os.listdir(os.path.dirname(obj)), [sample.image_sha256])
+
+    def test_unchanged_image_is_not_read_again(self):
+        upload = self._upload('a.jpg')
+        self._save('a' * 16, upload)
+
+        with mock.patch('catalog.port_detection.dataset.file_sha256',
+                        side_effect=AssertionError('re-hashed')), \
+                mock.patch('catalog.port_detection.dataset.os.link',
+                           side_effect=AssertionError('re-linked')):
+            self._save('a' * 16, upload)
+
+    def test_replaced_upload_is_stored_again(self):
+        import hashlib
+        from catalog.port_detection.dataset import sample_paths
+
+        upload = self._upload('a.jpg')
+        self._save('a' * 16, upload)
+        os.remove(upload)
+        upload = self._upload('a.jpg', b'new-panel-bytes')
+
+        sample = self._save('a' * 16, upload)
+
+        self.assertEqual(sample.image_sha256,
+                         hashlib.sha256(b'new-panel-bytes').hexdigest())
+        with open(sample_paths('a' * 16, 'train')[0], 'rb') as f:
+            self.assertEqual(f.read(), b'new-panel-bytes')
+
+    def test_symlink_fallback_without_hard_links(self):
+        import errno
+        from catalog.port_detection.dataset import object_path, sample_paths
+
+        with mock.patch('catalog.port_detection.dataset.os.link',
+                        side_effect=OSError(errno.EPERM, 'no hard links')):
+            sample = self._save('a' * 16, self._upload('a.jpg'))
+
+        image_path, _ = sample_paths('a' * 16, 'train')
+        self.assertTrue(os.path.islink(image_path))
+        self.assertEqual(os.path.realpath(image_path),
+                         os.path.realpath(object_path(sample.image_sha256)))
+
+    def test_index_command_moves_copies_into_store_and_prunes(self):
+        from django.core.management import call_command
+        from catalog.models import TrainingSample
+        from catalog.port_detection.dataset import object_path, sample_paths
+
+        stale = self._save('a' * 16, self._upload('a.jpg', b'old'))
+        TrainingSample.objects.all().delete()
+        os.remove(sample_paths('a' * 16, 'train')[1])
+        image_path, label_path = sample_paths('c' * 16, 'val')
+        for path, data in ((image_path, b'copied'), (label_path, b'0 0.5 0.5 0.1 0.1\n')):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        out = io.StringIO()
+        call_command('index_training_samples', stdout=out)
+
+        sample = TrainingSample.objects.get()
+        self.assertTrue(os.path.samefile(image_path, object_path(sample.image_sha256)))
+        self.assertFalse(os.path.exists(object_path(stale.image_sha256)))
+        self.assertIn('immagini non usate eliminate: 1', out.getvalue())
+
+
+class ParallelAugmentationTestCase(MediaRootMixin, TestCase):
+    """train_port_detector rotates the train split in a process pool."""
+
+    def setUp(self):
+        import numpy as np
+        import cv2
+        from catalog.models import AssetModel, AssetModelPort, AssetType, Vendor
+
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'components'))
+
+        vendor = Vendor.objects.create(name='Augment Vendor')
+        asset_type = AssetType.objects.create(name='Augment Type')
+        rng = np.random.default_rng(7)
+        # All three keys land in the train split.
+        for i in range(3):
+            name = f'components/aug_{i}.png'
+            cv2.imwrite(os.path.join(self.media_root, name),
+                        rng.integers(0, 255, (60, 200, 3), dtype=np.uint8))
+            asset_model = AssetModel.objects.create(
+                name=f'Augment {i}', vendor=vendor, type=asset_type,
+                front_image=name)
+            AssetModelPort.objects.create(asset_model=asset_model, name='Gi0/1',
+                                          side='front', pos_x=20.0, pos_y=30.0)
+
+    def _run(self, **options):
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        call_command('train_port_detector', stdout=out,
+                     **{'workers': 2, 'chunk_size': 1, **options})
+        return out.getvalue()
+
+    def _augmented_files(self):
+        from catalog.models import TrainingSample
+        from catalog.port_detection.dataset import sample_paths
+
+        files = {}
+        for sample in TrainingSample.objects.filter(source='augmentation'):
+            image_path, label_path = sample_paths(sample.key, sample.split)
+            with open(image_path, 'rb') as img, open(label_path, 'rb') as lbl:
+                files[sample.key] = (img.read(), lbl.read())
+        return files
+
+    def test_rotations_are_written_once_and_deterministic(self):
+        from catalog.models import TrainingSample
+        from catalog.port_detection.dataset import sample_key
+
+        self.assertIn('Rotazioni: 3 immagini aumentate, 0 già aggiornate',
+                      self._run())
+        first = self._augmented_files()
+        self.assertEqual(len(first), 9)
+        key = sample_key('components/aug_0.png', 'front')
+        sample = TrainingSample.objects.get(key=f'{key}_r090')
+        self.assertEqual(sample.split, 'train')
+        self.assertEqual(len(sample.source_sha256), 64)
+
+        self.assertIn('Rotazioni: 0 immagini aumentate, 3 già aggiornate',
+                      self._run())
+        self.assertIn('Rotazioni: 3 immagini aumentate, 0 già aggiornate',
+                      self._run(force=True))
+        self.assertEqual(self._augmented_files(), first)
+
+    def test_corrected_sample_is_augmented_again(self):
+        from catalog.port_detection.dataset import sample_key, save_sample
+
+        self._run()
+        # A correction rewrites one label between two runs.
+        save_sample(sample_key('components/aug_1.png', 'front'), 'train',
+                    os.path.join(self.media_root, 'components', 'aug_1.png'),
+                    ['0 0.7000 0.3000 0.0550 0.0600\n'], source='correction',
+                    image_name='components/aug_1.png', side='front')
+
+        self.assertIn('Rotazioni: 1 immagini aumentate, 2 già aggiornate',
+                      self._run(workers=1))
+
+
+_sink_records = []
+
+
+def _record_timing(record):
+    _sink_records.append(record)
+
+
+class StageTimingTestCase(MediaRootMixin, TestCase):
+    """Per-stage timers: collection, sink, inference-service merge, debug field."""
+
+    def setUp(self):
+        super().setUp()
+        for alias in ('default', 'port_analysis'):
+            caches[alias].clear()
+        _sink_records.clear()
+
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        with open(os.path.join(self.media_root, 'components', 'panel.jpg'), 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+
+    def _client_for(self, role):
+        user = User.objects.create_user(
+            username=f'timing-{role.name}', password='test-pass-123')
+        user.profile.role = role
+        user.profile.save(update_fields=['role'])
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_collect_accumulates_stages_and_calls_sink(self):
+        from catalog.port_detection import timing
+
+        with override_settings(PORT_TIMING_SINK=f'{__name__}._record_timing'):
+            with timing.collect('analyze') as record:
+                with timing.stage('infer'):
+                    pass
+                laps = timing.Laps()
+                laps.mark('decode')
+                laps.mark('decode')
+                timing.merge({'infer': 5.0})
+
+        self.assertEqual(_sink_records, [record])
+        self.assertEqual(record['pipeline'], 'analyze')
+        self.assertEqual(set(record['stages']), {'infer', 'decode'})
+        self.assertGreaterEqual(record['stages']['infer'], 5.0)
+
+    def test_stages_outside_collection_are_ignored(self):
+        from catalog.port_detection import timing
+
+        with timing.stage('infer'):
+            pass
+        timing.merge({'infer': 1.0})
+        with timing.capture() as stages:
+            pass
+        self.assertEqual(stages, {})
+
+    def test_inference_service_job_returns_its_timings(self):
+        from catalog.port_detection import inference_service, timing
+
+        def job():
+            with timing.stage('infer'):
+                return ['ports']
+
+        with mock.patch.dict(inference_service._JOBS, {'detect_yolo': job}):
+            result, stages, served = inference_service._run_job('detect_yolo', ())
+
+        self.assertEqual(result, ['ports'])
+        self.assertIn('infer', stages)
+        self.assertEqual(served, [])
+
+    def test_debug_timing_only_for_admins(self):
+        admin_role, _ = Role.objects.update_or_create(
+            name=Role.Name.ADMIN,
+            defaults={'can_view_model_training_status': True},
+        )
+        analyst_role = Role.objects.create(
+            name='timing_analyst_role', can_view_model_training_status=True)
+        ports = [{'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+                  'confidence': 0.9}]
+        url = '/asset/port-analyze?debug_timing=1'
+        body = {'image_path': 'components/panel.jpg'}
+
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                        return_value=ports):
+            admin = self._client_for(admin_role).post(url, body, format='json')
+            analyst = self._client_for(analyst_role).post(url, body, format='json')
+
+        self.assertEqual(admin.data['ports'][0]['port_type'], 'RJ45')
+        self.assertIn('naming', admin.data['debug_timing']['stages'])
+        self.assertIsInstance(analyst.data, list)
+
+
+class YoloBatchDetectionTestCase(TestCase):
+    """detect_with_yolo_batch must batch images into few predict calls."""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.tmpdir, f'panel{i}.jpg')
+            cv2.imwrite(path, np.full((300, 900, 3), 120, dtype=np.uint8))
+            self.paths.append(path)
+        self.paths.append(os.path.join(self.tmpdir, 'missing.jpg'))
+
+    def test_one_predict_call_per_batch(self):
+        from catalog.port_detection import batch_detector
+
+        model = mock.Mock()
+        model.predict.side_effect = lambda sources, **kw: [
+            SimpleNamespace(boxes=None) for _ in sources]
+
+        with mock.patch.object(batch_detector, 'get_yolo_model', return_value=model):
+            results = batch_detector.detect_with_yolo_batch(
+                self.paths, batch_size=4)
+
+        self.assertEqual(len(results), len(self.paths))
+        self.assertEqual(model.predict.call_count, 2)
+        batch_sizes = [len(c.args[0]) for c in model.predict.call_args_list]
+        self.assertEqual(batch_sizes, [4, 1])
+
+
+class ClickYoloDetectionTestCase(TestCase):
+    """Click detection must run its three crop scales in one forward pass."""
+
+    def test_single_batched_call_with_nested_crops(self):
+        import numpy as np
+
+        from catalog.port_detection import click_detector
+
+        img = np.random.default_rng(0).integers(
+            0, 255, (600, 1600, 3), dtype=np.uint8)
+        model = mock.Mock(side_effect=lambda sources, **kw: [
+            SimpleNamespace(boxes=None) for _ in sources])
+
+        with mock.patch.object(click_detector, 'get_yolo_model', return_value=model):
+            result = click_detector.detect_with_yolo(img, 10.0, 50.0)
+
+        self.assertEqual(result, (None, 0.0))
+        self.assertEqual(model.call_count, 1)
+        sources = model.call_args.args[0]
+        expected = [
+            click_detector._crop_around_click(img, 10.0, 50.0, pad)[0].shape
+            for pad in click_detector._CLICK_PADS
+        ]
+        self.assertEqual([s.shape for s in sources], expected)
+
+    def test_large_photo_crops_are_downsampled_to_model_resolution(self):
+        import numpy as np
+
+        from catalog.port_detection import click_detector
+
+        img = np.zeros((1500, 6000, 3), dtype=np.uint8)
+        model = mock.Mock(side_effect=lambda sources, **kw: [
+            SimpleNamespace(boxes=None) for _ in sources])
+
+        with mock.patch.object(click_detector, 'get_yolo_model', return_value=model):
+            click_detector.detect_with_yolo(img, 50.0, 50.0)
+
+        sizes = [max(s.shape[:2]) for s in model.call_args.args[0]]
+        # Smallest crop (0.28 × 6000 = 1680 px) lands on the model size; the
+        # others keep their relative scale instead of full resolution.
+        self.assertEqual(sizes[0], click_detector._CLICK_IMGSZ)
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertLess(sizes[-1], 1680)
+
+
+def _reference_bbox_nms(candidates, iou_thresh=0.30, max_det=96):
+    """Former pure-Python bbox_nms, kept as the equivalence oracle."""
+    from catalog.port_detection.constants import DEFAULT_BH, DEFAULT_BW
+
+    def box(c):
+        pt = c.get('port_type', 'RJ45')
+        bw = c.get('_bw_pct', DEFAULT_BW.get(pt, 4.0))
+        bh = c.get('_bh_pct', DEFAULT_BH.get(pt, 5.0))
+        return c['pos_x'], c['pos_y'], bw, bh
+
+    final = []
+    for c in sorted(candidates, key=lambda c: c['confidence'], reverse=True):
+        cx, cy, bw, bh = box(c)
+        overlaps = False
+        for f in final:
+            fx, fy, fbw, fbh = box(f)
+            ix1, iy1 = max(cx - bw / 2, fx - fbw / 2), max(cy - bh / 2, fy - fbh / 2)
+            ix2, iy2 = min(cx + bw / 2, fx + fbw / 2), min(cy + bh / 2, fy + fbh / 2)
+            if ix2 <= ix1 or iy2 <= iy1:
+                continue
+            inter = (ix2 - ix1) * (iy2 - iy1)
+            union = bw * bh + fbw * fbh - inter
+            min_area = min(bw * bh, fbw * fbh)
+            if (inter / union if union > 0 else 0.0) > iou_thresh or (
+                    inter / min_area if min_area > 0 else 0.0) > 0.60:
+                overlaps = True
+                break
+        if not overlaps:
+            final.append(c)
+        if len(final) >= max_det:
+            break
+    for c in final:
+        c.pop('_bw_pct', None)
+        c.pop('_bh_pct', None)
+    return final
+
+
+def _reference_grid_dedup(detections):
+    """Former pure-Python batch_detector._grid_dedup."""
+    if len(detections) < 2:
+        return list(detections)
+    ordered_x = sorted(detections, key=lambda d: d['pos_x'])
+    xs = [d['pos_x'] for d in ordered_x]
+    x_gaps = [xs[i + 1] - xs[i] for i in range(len(xs) - 1)]
+    sig_gaps = sorted(g for g in x_gaps if g > 0.3)
+    col_pitch = sig_gaps[len(sig_gaps) // 2] if sig_gaps else 100.0
+    eps_x = max(0.5, col_pitch * 0.45)
+    columns = [[ordered_x[0]]]
+    for i, det in enumerate(ordered_x[1:], start=1):
+        if x_gaps[i - 1] < eps_x:
+            columns[-1].append(det)
+        else:
+            columns.append([det])
+    result = []
+    for col in columns:
+        by_y = sorted(col, key=lambda d: d['pos_y'])
+        groups = [[by_y[0]]]
+        for prev, det in zip(by_y, by_y[1:]):
+            if det['pos_y'] - prev['pos_y'] < 8.0:
+                groups[-1].append(det)
+            else:
+                groups.append([det])
+        result.extend(max(g, key=lambda d: d['confidence']) for g in groups)
+    return result
+
+
+class ImageCacheTestCase(TestCase):
+    """Decoded / enhanced images are shared across calls and memory-bounded."""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+
+        from catalog.port_detection import image_cache
+
+        self.cv2 = cv2
+        self.image_cache = image_cache
+        image_cache.clear()
+        self.addCleanup(image_cache.clear)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.rng = np.random.default_rng(0)
+
+    def _write(self, name, shape):
+        path = os.path.join(self.tmpdir, name)
+        img = self.rng.integers(0, 255, shape, dtype='uint8')
+        self.cv2.imwrite(path, img)
+        return path
+
+    def test_repeat_loads_hit_and_arrays_are_read_only(self):
+        path = self._write('panel.png', (120, 400, 3))
+
+        first = self.image_cache.load_image(path)
+        second = self.image_cache.load_image(path)
+
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+        stats = self.image_cache.stats()
+        self.assertEqual(stats['hits']['decoded'], 1)
+        self.assertEqual(stats['misses']['decoded'], 1)
+
+    def test_replaced_file_is_decoded_again(self):
+        path = self._write('panel.png', (120, 400, 3))
+        first = self.image_cache.load_image(path)
+        self._write('panel.png', (60, 200, 3))
+        os.utime(path, ns=(1, 1))
+
+        second = self.image_cache.load_image(path)
+
+        self.assertEqual(second.shape, (60, 200, 3))
+        self.assertEqual(first.shape, (120, 400, 3))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        # Two 600 kB arrays do not fit in a 1 MB budget.
+        a = self._write('a.png', (500, 400, 3))
+        b = self._write('b.png', (500, 400, 3))
+
+        with override_settings(PORT_IMAGE_CACHE_MB=1):
+            self.image_cache.load_image(a)
+            self.image_cache.load_image(b)
+            self.image_cache.load_image(a)
+
+        stats = self.image_cache.stats()
+        self.assertEqual(stats['misses']['decoded'], 3)
+        self.assertEqual(stats['entries'], 1)
+        self.assertLessEqual(stats['bytes'], 1024 * 1024)
+
+    def test_clicks_on_same_photo_share_one_enhancement(self):
+        from catalog.port_detection import click_detector
+
+        path = self._write('wide.png', (1500, 6000, 3))
+        img = self.image_cache.load_image(path)
+        model = mock.Mock(side_effect=lambda sources, **kw: [
+            SimpleNamespace(boxes=None) for _ in sources])
+
+        with mock.patch.object(click_detector, 'get_yolo_model', return_value=model):
+            click_detector.detect_with_yolo(img, 20.0, 50.0, image_path=path)
+            click_detector.detect_with_yolo(img, 60.0, 50.0, image_path=path)
+
+        stats = self.image_cache.stats()
+        self.assertEqual(stats['misses']['enhanced'], 1)
+        self.assertEqual(stats['hits']['enhanced'], 1)
+        sizes = [max(s.shape[:2]) for s in model.call_args.args[0]]
+        self.assertEqual(sizes[0], click_detector._CLICK_IMGSZ)
+        self.assertEqual(sizes, sorted(sizes))
+
+
+class WholeImageOcrTestCase(TestCase):
+    """Whole-image OCR runs once per photo and clicks become lookups."""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+
+        from catalog.port_detection import image_cache, ocr
+
+        self.ocr = ocr
+        image_cache.clear()
+        self.addCleanup(image_cache.clear)
+        caches['port_analysis'].clear()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'panel.png')
+        cv2.imwrite(self.path, np.full((250, 1000, 3), 128, dtype=np.uint8))
+
+        def box(cx, cy, text, conf):
+            return ([[cx - 10, cy - 5], [cx + 10, cy - 5],
+                     [cx + 10, cy + 5], [cx - 10, cy + 5]], text, conf)
+
+        # Image is read at 1800 px wide → reader coordinates are × 1.8.
+        self.reader = mock.Mock()
+        self.reader.readtext.return_value = [
+            box(100 * 1.8, 125 * 1.8, 'Gi0/1', 0.9),
+            box(900 * 1.8, 125 * 1.8, 'Gi0/9', 0.9),
+        ]
+        override = override_settings(PORT_OCR_WHOLE_IMAGE=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_clicks_share_one_ocr_pass(self):
+        with mock.patch.object(self.ocr, '_get_ocr_reader', return_value=self.reader):
+            first = self.ocr.read_label_ocr(self.path, 10.0, 50.0)
+            second = self.ocr.read_label_ocr(self.path, 90.0, 50.0)
+            third = self.ocr.read_label_ocr(self.path, 50.0, 50.0)
+
+        self.assertEqual((first, second), ('Gi0/1', 'Gi0/9'))
+        # Nothing inside the window around the panel centre.
+        self.assertIsNone(third)
+        # Three strategies, once for the whole image.
+        self.assertEqual(self.reader.readtext.call_count, 3)
+
+    def test_replaced_image_is_read_again(self):
+        import cv2
+        import numpy as np
+
+        with mock.patch.object(self.ocr, '_get_ocr_reader', return_value=self.reader):
+            self.ocr.read_label_ocr(self.path, 10.0, 50.0)
+            cv2.imwrite(self.path, np.zeros((250, 1000, 3), dtype=np.uint8))
+            self.ocr.read_label_ocr(self.path, 10.0, 50.0)
+
+        self.assertEqual(self.reader.readtext.call_count, 6)
+
+    def test_concurrent_first_requests_share_one_pass(self):
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def slow_ocr(img):
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return []
+
+        results = []
+        with mock.patch.object(self.ocr, '_ocr_whole_image', side_effect=slow_ocr), \
+                mock.patch.object(self.ocr, '_OCR_LOCK_POLL', 0.01):
+            threads = [threading.Thread(
+                target=lambda: results.append(self.ocr.image_text_boxes(self.path)))
+                for _ in range(3)]
+            threads[0].start()
+            self.assertTrue(started.wait(5))
+            for thread in threads[1:]:
+                thread.start()
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(r == results[0] for r in results))
+
+    def test_large_photo_is_preprocessed_after_shrinking(self):
+        import cv2
+        import numpy as np
+
+        cv2.imwrite(self.path, np.full((1000, 8192, 3), 128, dtype=np.uint8))
+        shapes = []
+        denoise = cv2.fastNlMeansDenoising
+
+        def record(gray, *args, **kwargs):
+            shapes.append(gray.shape)
+            return denoise(gray, *args, **kwargs)
+
+        with mock.patch.object(self.ocr, '_get_ocr_reader', return_value=self.reader), \
+                mock.patch('cv2.fastNlMeansDenoising', side_effect=record):
+            self.ocr.image_text_boxes(self.path)
+
+        self.assertEqual(shapes, [(500, 4096)])
+
+
+class OcrPortNamingTestCase(MediaRootMixin, TestCase):
+    """Batch analysis can name ports after OCR labels via a k-d tree match."""
+
+    def _grid(self):
+        # 4 × 2 ports on a 1000 × 200 px panel, 100 px apart.
+        return [{'port_type': 'RJ45', 'pos_x': 10.0 + 10 * c,
+                 'pos_y': 25.0 + 50 * r, 'confidence': 0.9}
+                for r in range(2) for c in range(4)]
+
+    def test_ports_take_nearest_free_label(self):
+        from catalog.port_detection import apply_ocr_labels, assign_names
+
+        ports = assign_names(self._grid())
+        entry = {'width': 1000, 'height': 200, 'boxes': [
+            [100, 30, 'Gi1/0/1', 0.9],    # just above port (0, 0)
+            [140, 45, 'Gi1/0/2', 0.8],    # closer to (0, 0) than to (0, 1)
+            [300, 30, 'WARNING', 0.9],    # not a port name
+            [400, 170, 'Gi1/0/8', 0.9],   # just below the last port
+            [900, 100, 'Gi1/0/99', 0.9],  # too far from any port
+        ]}
+
+        renamed = apply_ocr_labels(ports, entry)
+
+        names = {(p['pos_x'], p['pos_y']): p['name'] for p in ports}
+        self.assertEqual(renamed, 3)
+        self.assertEqual(names[(10.0, 25.0)], 'Gi1/0/1')
+        # (0, 0) is taken, so its second-nearest label goes to (0, 1).
+        self.assertEqual(names[(20.0, 25.0)], 'Gi1/0/2')
+        self.assertEqual(names[(40.0, 75.0)], 'Gi1/0/8')
+        self.assertEqual(names[(30.0, 25.0)], 'GigabitEthernet0/2')
+
+    def test_analyze_with_ocr_names(self):
+        os.makedirs(os.path.join(self.media_root, 'components'))
+        with open(os.path.join(self.media_root, 'components', 'panel.jpg'), 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+        caches['port_analysis'].clear()
+
+        client, _ = _authenticated_client('ocr-naming-user',
+                                          can_view_model_training_status=True)
+
+        entry = {'width': 1000, 'height': 200,
+                 'boxes': [[100, 30, 'Gi1/0/1', 0.9]]}
+        submit = mock.Mock(return_value=entry)
+        with mock.patch('catalog.views.PortAnalyzeView.detect_with_opencv',
+                        side_effect=lambda path: self._grid()), \
+                mock.patch('catalog.views.PortAnalyzeView.inference_service.submit',
+                           submit):
+            body = {'image_path': 'components/panel.jpg'}
+            plain = client.post('/asset/port-analyze', body, format='json')
+            ocr = client.post('/asset/port-analyze',
+                              dict(body, ocr_names=True), format='json')
+            client.post('/asset/port-analyze',
+                        dict(body, ocr_names=True), format='json')
+
+        self.assertEqual(plain.data[0]['name'], 'GigabitEthernet0/0')
+        self.assertEqual(ocr.data[0]['name'], 'Gi1/0/1')
+        self.assertEqual(ocr.data[1]['name'], 'GigabitEthernet0/1')
+        # Second OCR request is a result-cache hit.
+        submit.assert_called_once_with(
+            'image_text',
+            os.path.join(os.path.realpath(self.media_root), 'components', 'panel.jpg'))
+
+
+class VectorisedNmsTestCase(TestCase):
+    """Array-backed NMS / dedup must match the pure-Python originals."""
+
+    def _panel(self, rng, n):
+        dets = []
+        for _ in range(n):
+            det = {
+                'port_type': rng.choice(['RJ45', 'SFP', 'LC']),
+                'pos_x': round(rng.uniform(0, 100), 1),
+                'pos_y': round(rng.choice([20, 45, 70]) + rng.uniform(-4, 4), 1),
+                # Two decimals, like YOLO output: plenty of confidence ties.
+                'confidence': round(rng.uniform(0.2, 1.0), 2),
+            }
+            if rng.random() < 0.8:
+                det['_bw_pct'] = round(rng.uniform(0.5, 6.0), 2)
+                det['_bh_pct'] = round(rng.uniform(0.5, 8.0), 2)
+            dets.append(det)
+        return dets
+
+    def test_matches_reference_on_dense_panels(self):
+        import copy
+        import random
+
+        from catalog.port_detection import batch_detector, nms
+
+        rng = random.Random(7)
+        for n in (0, 1, 2, 3, 5, 24, 96, 512):
+            for _ in range(10):
+                dets = self._panel(rng, n)
+                self.assertEqual(
+                    nms.bbox_nms(copy.deepcopy(dets), max_det=512),
+                    _reference_bbox_nms(copy.deepcopy(dets), max_det=512))
+                self.assertEqual(
+                    batch_detector._grid_dedup(copy.deepcopy(dets)),
+                    _reference_grid_dedup(copy.deepcopy(dets)))
+
+    def test_memory_is_linear_in_candidates(self):
+        import tracemalloc
+        import numpy as np
+
+        from catalog.port_detection import nms
+
+        rng = np.random.default_rng(3)
+        n = 5000                       # an n × n float64 matrix is 200 MB
+        cx, cy = rng.uniform(0, 100, n), rng.uniform(0, 100, n)
+        bw, bh = rng.uniform(0.5, 6, n), rng.uniform(0.5, 8, n)
+        conf = rng.uniform(0.2, 1.0, n)
+
+        tracemalloc.start()
+        try:
+            kept = nms.bbox_nms_indices(cx, cy, bw, bh, conf)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(kept), 96)
+        self.assertLess(peak, 5 * 1024 * 1024)
+
+    def test_dict_adapter_returns_original_objects(self):
+        from catalog.port_detection import nms
+
+        dets = [
+            {'port_type': 'RJ45', 'pos_x': 10.0, 'pos_y': 50.0,
+             'confidence': 0.5, '_bw_pct': 4.0, '_bh_pct': 5.0},
+            {'port_type': 'RJ45', 'pos_x': 10.2, 'pos_y': 50.1,
+             'confidence': 0.9, '_bw_pct': 2.0, '_bh_pct': 2.5},
+            {'port_type': 'RJ45', 'pos_x': 30.0, 'pos_y': 50.0,
+             'confidence': 0.5},
+        ]
+        kept = nms.bbox_nms(list(dets))
+        self.assertEqual([id(d) for d in kept], [id(dets[1]), id(dets[2])])
+        self.assertNotIn('_bw_pct', dets[1])
+
+
+class ContourFeaturesTestCase(TestCase):
+    """Summed-area darkness must equal the per-contour np.mean slices."""
+
+    def test_darkness_matches_slice_means(self):
+        import numpy as np
+
+        from catalog.port_detection.contour_features import (
+            darkness_scores,
+            integral_image,
+        )
+
+        rng = np.random.default_rng(3)
+        gray = rng.integers(0, 256, (240, 320), dtype=np.uint8)
+        x = rng.integers(0, 300, 200)
+        y = rng.integers(0, 220, 200)
+        # Bounding rects never leave the image.
+        w = np.minimum(rng.integers(6, 60, 200), 320 - x)
+        h = np.minimum(rng.integers(6, 60, 200), 240 - y)
+
+        darks = darkness_scores(integral_image(gray), x, y, w, h,
+                                margin_min=4, margin_max=16)
+
+        H, W = gray.shape
+        for i in range(200):
+            bx, by, bw, bh = int(x[i]), int(y[i]), int(w[i]), int(h[i])
+            roi_mean = float(np.mean(gray[by:by + bh, bx:bx + bw]))
+            margin = max(4, min(16, int(min(bw, bh) * 0.30)))
+            surround = gray[max(0, by - margin):min(H, by + bh + margin),
+                            max(0, bx - margin):min(W, bx + bw + margin)]
+            surround_mean = float(np.mean(surround))
+            expected = max(0.0, (surround_mean - roi_mean) / (surround_mean + 1.0))
+            self.assertEqual(float(darks[i]), expected)
+
+    def test_prefilter_keeps_plausible_boxes_in_order(self):
+        import numpy as np
+
+        from catalog.port_detection.contour_features import contour_prefilter
+
+        def rect(x, y, w, h):
+            return np.array([[[x, y]], [[x + w, y]], [[x + w, y + h]], [[x, y + h]]],
+                            dtype=np.int32)
+
+        contours = [
+            rect(0, 0, 40, 30),     # ok
+            rect(0, 0, 3, 30),      # too narrow
+            rect(50, 50, 200, 20),  # AR 10
+            rect(10, 10, 30, 30),   # ok
+        ]
+        idx, area, x, y, w, h = contour_prefilter(
+            contours, min_area=50, max_area=5000, min_side=6,
+            ar_min=0.35, ar_max=6.0, min_fill=0.45)
+        self.assertEqual(idx.tolist(), [0, 3])
+        self.assertEqual(area.tolist(), [1200.0, 900.0])
+
+
+class YoloModelHotSwapTestCase(TestCase):
+    """New weights load in the background; requests keep the old model."""
+
+    def setUp(self):
+        from catalog.port_detection import model_cache
+
+        self.model_cache = model_cache
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'port-yolo.pt')
+        with open(self.path, 'wb') as f:
+            f.write(b'v1')
+
+        self.release = threading.Event()
+        self.loading = threading.Event()
+
+        def load(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if data != b'v1':
+                self.loading.set()
+                self.release.wait(5)
+            return f'model-{data.decode()}'
+
+        for patcher in (
+            mock.patch.object(model_cache, '_cache', model_cache._YoloModelCache()),
+            mock.patch.object(model_cache, '_load_model', side_effect=load),
+            mock.patch.object(model_cache, '_ensure_watcher'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_serves_old_model_while_new_weights_load(self):
+        self.assertEqual(self.model_cache.get_yolo_model(self.path), 'model-v1')
+
+        src = os.path.join(self.tmpdir, 'best.pt')
+        with open(src, 'wb') as f:
+            f.write(b'v2-retrained')
+        self.model_cache.install_weights(src, self.path)
+        # No temp file left behind by the atomic replace.
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['best.pt', 'port-yolo.pt'])
+
+        watcher = threading.Thread(target=self.model_cache._check_for_new_weights)
+        watcher.start()
+        self.assertTrue(self.loading.wait(5))
+        self.assertEqual(self.model_cache.get_yolo_model(self.path), 'model-v1')
+
+        self.release.set()
+        watcher.join(5)
+        self.assertEqual(
+            self.model_cache.get_yolo_model(self.path), 'model-v2-retrained')
+
+    def test_cached_lookup_does_not_stat_weights(self):
+        self.model_cache.get_yolo_model(self.path)
+        with mock.patch.object(self.model_cache, '_identity') as identity:
+            for _ in range(3):
+                self.model_cache.get_yolo_model(self.path)
+        identity.assert_not_called()
+
+
+class PortDetectionWarmupTestCase(TestCase):
+    """Readiness probe reflects the warm-up state of this worker."""
+
+    def setUp(self):
+        from catalog.port_detection import warmup
+
+        self.warmup = warmup
+        patcher = mock.patch.dict(
+            warmup._state, {'status': 'idle', 'seconds': None, 'pid': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    @override_settings(PORT_WARMUP=False)
+    def test_ready_when_warmup_disabled(self):
+        response = self.client.get('/asset/port-analyze/ready')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['ready'])
+
+    @override_settings(PORT_WARMUP=True, PORT_INFERENCE_SOCKET='')
+    def test_not_ready_until_warm_up_finishes(self):
+        with mock.patch.object(self.warmup, 'start_background_warmup') as start:
+            response = self.client.get('/asset/port-analyze/ready')
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        start.assert_called_once()
+
+        with mock.patch.object(self.warmup, '_warm_yolo') as yolo, \
+                mock.patch.object(self.warmup, '_warm_ocr',
+                                  side_effect=ImportError('easyocr')):
+            self.warmup.warm_up()
+        yolo.assert_called_once()
+
+        response = self.client.get('/asset/port-analyze/ready')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'ready')
+
+    @override_settings(PORT_WARMUP=True, PORT_INFERENCE_SOCKET='',
+                       RUNNING_TESTS=False)
+    def test_only_server_processes_warm_up(self):
+        from django.apps import apps
+
+        config = apps.get_app_config('catalog')
+        cases = [
+            (['manage.py', 'migrate'], {}, False),
+            (['manage.py', 'shell'], {}, False),
+            (['celery', '-A', 'datacenter-app', 'worker'], {}, False),
+            # Autoreloader parent vs. the child that serves requests.
+            (['manage.py', 'runserver'], {}, False),
+            (['manage.py', 'runserver'], {'RUN_MAIN': 'true'}, True),
+            (['manage.py', 'runserver', '--noreload'], {}, True),
+            (['gunicorn', 'datacenter-app.wsgi'],
+             {'PORT_DETECTION_SERVER': '1'}, True),
+        ]
+        for argv, env, expected in cases:
+            with self.subTest(argv=argv, env=env), \
+                    mock.patch('sys.argv', argv), \
+                    mock.patch.dict(os.environ, env), \
+                    mock.patch.object(self.warmup, 'start_background_warmup') as start:
+                for name in ('RUN_MAIN', 'PORT_DETECTION_SERVER'):
+                    if name not in env:
+                        os.environ.pop(name, None)
+                config._start_warmup()
+            self.assertEqual(start.called, expected)
+
+
+class YoloBackendSelectionTestCase(TestCase):
+    """PORT_YOLO_BACKEND picks the exported artefact when it exists."""
+
+    def setUp(self):
+        from catalog.port_detection import model_cache
+
+        self.model_cache = model_cache
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'port-yolo.pt')
+        with open(self.path, 'wb') as f:
+            f.write(b'pt')
+
+        for patcher in (
+            mock.patch.object(model_cache, '_cache', model_cache._YoloModelCache()),
+            mock.patch.object(model_cache, '_load_model',
+                              side_effect=lambda p: os.path.basename(p)),
+            mock.patch.object(model_cache, '_ensure_watcher'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @override_settings(PORT_YOLO_BACKEND='onnx')
+    def test_switches_to_onnx_once_exported(self):
+        self.assertEqual(self.model_cache.get_yolo_model(self.path), 'port-yolo.pt')
+
+        with open(os.path.join(self.tmpdir, 'port-yolo.onnx'), 'wb') as f:
+            f.write(b'onnx')
+        self.model_cache._check_for_new_weights()
+        self.assertEqual(self.model_cache.get_yolo_model(self.path), 'port-yolo.onnx')
+
+    @override_settings(PORT_YOLO_BACKEND='torch')
+    def test_torch_backend_ignores_artefacts(self):
+        with open(os.path.join(self.tmpdir, 'port-yolo.onnx'), 'wb') as f:
+            f.write(b'onnx')
+        self.assertEqual(self.model_cache.get_yolo_model(self.path), 'port-yolo.pt')
+
+    @override_settings(PORT_YOLO_BACKEND='onnx')
+    def test_failed_export_drops_stale_artefact(self):
+        stale = os.path.join(self.tmpdir, 'port-yolo.onnx')
+        with open(stale, 'wb') as f:
+            f.write(b'old-onnx')
+        best = os.path.join(self.tmpdir, 'best.pt')
+        with open(best, 'wb') as f:
+            f.write(b'new-pt')
+
+        with mock.patch.object(self.model_cache, 'export_artifact',
+                               side_effect=RuntimeError('no onnx')):
+            self.model_cache.publish_weights(best, self.path)
+
+        self.assertFalse(os.path.exists(stale))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'new-pt')
+
+    @override_settings(PORT_YOLO_BACKEND='onnx')
+    def test_result_cache_key_follows_the_loaded_backend(self):
+        from catalog.port_detection import result_cache
+
+        caches['port_analysis'].clear()
+        image = os.path.join(self.tmpdir, 'panel.jpg')
+        with open(image, 'wb') as f:
+            f.write(b'not-really-a-jpeg')
+        with self.model_cache.track_served() as served:
+            self.model_cache.get_yolo_model(self.path)
+        result_cache.store(image, self.path, [{'name': 'pt'}], served=served)
+        self.assertEqual(result_cache.get(image, self.path), [{'name': 'pt'}])
+
+        with open(os.path.join(self.tmpdir, 'port-yolo.onnx'), 'wb') as f:
+            f.write(b'onnx')
+        self.assertIsNone(result_cache.get(image, self.path))
+
+
+def _fake_box(cx, cy, w, h, conf=0.9, cls=0):
+    import numpy as np
+    return SimpleNamespace(
+        xywhn=np.array([[cx, cy, w, h]]),
+        conf=np.array([conf]),
+        cls=np.array([float(cls)]),
+    )
+
+
+@override_settings(PORT_TILED_INFERENCE=True, PORT_TILE_IMGSZ=640,
+                   PORT_TILE_OVERLAP=0.20)
+class TiledYoloDetectionTestCase(TestCase):
+    """Elongated panels go through the model as one batch of tiles."""
+
+    def setUp(self):
+        import cv2
+        import numpy as np
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.wide = os.path.join(self.tmpdir, 'wide.png')
+        cv2.imwrite(self.wide, np.full((500, 4000, 3), 120, dtype=np.uint8))
+        self.square = os.path.join(self.tmpdir, 'square.png')
+        cv2.imwrite(self.square, np.full((800, 900, 3), 120, dtype=np.uint8))
+
+    def test_tile_count_follows_aspect_ratio(self):
+        from catalog.port_detection.batch_detector import _tile_layout
+
+        self.assertEqual(_tile_layout(900, 800, 0.2), [])
+        tiles = _tile_layout(4000, 500, 0.2)
+        self.assertEqual(len(tiles), 8)
+        self.assertEqual((tiles[0].x0, tiles[-1].x0 + tiles[-1].w), (0, 4000))
+        for a, b in zip(tiles, tiles[1:]):
+            self.assertGreater(a.x0 + a.w, b.x0)   # tiles overlap
+        tall = _tile_layout(300, 1000, 0.2)
+        self.assertEqual([t.x0 for t in tall], [0] * len(tall))
+        self.assertGreater(len(tall), 1)
+
+    def test_single_batched_call_and_seam_merge(self):
+        from catalog.port_detection import batch_detector
+
+        def predict(sources, **kw):
+            results = []
+            for i, _ in enumerate(sources):
+                boxes = [_fake_box(0.5, 0.5, 0.1, 0.2)]
+                if i == 0:
+                    # Cut by the right seam of the first tile.
+                    boxes.append(_fake_box(0.99, 0.5, 0.05, 0.2))
+                results.append(SimpleNamespace(boxes=boxes))
+            return results
+
+        model = mock.Mock()
+        model.predict.side_effect = predict
+        with mock.patch.object(batch_detector, 'get_yolo_model', return_value=model):
+            ports = batch_detector.detect_with_yolo(self.wide)
+
+        self.assertEqual(model.predict.call_count, 1)
+        self.assertEqual(len(model.predict.call_args.args[0]), 8)
+        self.assertEqual(model.predict.call_args.kwargs['imgsz'], 640)
+        self.assertEqual(len(ports), 8)
+        self.assertTrue(all(p['pos_y'] == 50.0 for p in ports))
+        xs = sorted(p['pos_x'] for p in ports)
+        self.assertLess(xs[0], 10.0)
+        self.assertGreater(xs[-1], 90.0)
+
+    def test_square_images_use_full_image_pass(self):
+        from catalog.port_detection import batch_detector
+
+        model = mock.Mock()
+        model.predict.return_value = [SimpleNamespace(boxes=None)]
+        with mock.patch.object(batch_detector, 'get_yolo_model', return_value=model):
+            batch_detector.detect_with_yolo(self.square)
+
+        self.assertEqual(model.predict.call_args.kwargs['imgsz'], 1280)
@@ -3,7 +3,9 @@ from rest_framework.routers import DefaultRouter
 from catalog.views import (
     VendorViewSet, AssetTypeViewSet, AssetModelViewSet, AssetModelPortViewSet,
     AssetModelImportView, CatalogExportView, CatalogImportView,
-    PortAnalyzeView, PortAnnotateView, PortClickAnalyzeView, PortCorrectionView,
+    PortAnalysisJobStatusView, PortAnalysisJobView,
+    PortAnalyzeStreamView, PortAnalyzeView, PortAnnotateView, PortBatchAnalyzeView, PortClickAnalyzeView,
+    PortCorrectionView, PortDetectionReadyView, PortTrainingStatusView,
 )
 
 router = DefaultRouter(trailing_slash=False)
@@ -17,8 +19,14 @@ urlpatterns = [
     path('catalog/export', CatalogExportView.as_view(), name='catalog-export'),
     path('catalog/import', CatalogImportView.as_view(), name='catalog-import'),
     path('port-analyze', PortAnalyzeView.as_view(), name='port-analyze'),
+    path('port-analyze/batch', PortBatchAnalyzeView.as_view(), name='port-analyze-batch'),
+    path('port-analyze/jobs', PortAnalysisJobView.as_view(), name='port-analyze-jobs'),
+    path('port-analyze/jobs/<uuid:job_id>', PortAnalysisJobStatusView.as_view(), name='port-analyze-job-status'),
+    path('port-analyze/ready', PortDetectionReadyView.as_view(), name='port-analyze-ready'),
+    path('port-analyze/stream', PortAnalyzeStreamView.as_view(), name='port-analyze-stream'),
     path('port-annotate', PortAnnotateView.as_view(), name='port-annotate'),
     path('port-click-analyze', PortClickAnalyzeView.as_view(), name='port-click-analyze'),
     path('port-correction', PortCorrectionView.as_view(), name='port-correction'),
+    path('port-training/status', PortTrainingStatusView.as_view(), name='port-training-status'),
     path('', include(router.urls)),
 ]
@@ -1,3 +1,7 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -12,6 +16,8 @@ from accounts.permissions import CatalogResourcePermission, DeleteCatalogPermiss
 from accounts.audit import AuditLogMixin, log_action
 from accounts.models import SecurityAuditLog
 
+logger = logging.getLogger(__name__)
+
 
 class AssetModelViewSet(AuditLogMixin, ImageTransformMixin, viewsets.ModelViewSet):
     audit_resource_type = 'asset_model'
@@ -36,6 +42,41 @@ class AssetModelViewSet(AuditLogMixin, ImageTransformMixin, viewsets.ModelViewSe
     ordering = ['name']
     filterset_fields = ['name', 'vendor', 'type']
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self._schedule_preanalysis(serializer)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._schedule_preanalysis(serializer)
+
+    def _schedule_preanalysis(self, serializer) -> None:
+        """
+        Queue port detection for every image uploaded (or re-transformed) in
+        this request, once the row is committed, so the port mapper opens
+        with cached suggestions instead of a cold analysis.
+        """
+        if not getattr(settings, 'PORT_PREANALYZE_UPLOADS', True):
+            return
+        from catalog.tasks import preanalyze_ports
+
+        for side in ('front', 'rear'):
+            if not serializer.validated_data.get(f'{side}_image'):
+                continue
+            image = getattr(serializer.instance, f'{side}_image')
+            if not image or not image.name:
+                continue
+
+            def enqueue(name=image.name):
+                try:
+                    preanalyze_ports.delay(name)
+                except Exception:
+                    # Broker down: the analyzer simply runs on first visit.
+                    logger.warning('Could not queue port pre-analysis of %s',
+                                   name, exc_info=True)
+
+            transaction.on_commit(enqueue)
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         asset_count = instance.assets.count()
@@ -0,0 +1,39 @@
+"""
+PortAnalysisJobStatusView – progress and result of an async port analysis.
+"""
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.permissions import ViewModelTrainingStatusPermission
+from catalog.models import PortAnalysisJob
+from catalog.serializers import PortAnalysisJobSerializer
+
+
+class PortAnalysisJobStatusView(APIView):
+    """
+    GET /asset/port-analyze/jobs/<id>
+
+    Returns the job submitted through PortAnalysisJobView:
+    ``{ "id": "...", "status": "running", "stage": "infer", "progress": 25,
+        "result": null, "error": "" }``.
+
+    ``stage`` walks preprocess → infer → dedup → naming; ``result`` is set
+    once ``status`` is ``done``.  Only the submitting user can see a job;
+    other ids answer 404.  Not subject to the analysis rate limit, so
+    polling does not consume the user's analysis budget.
+    """
+    permission_classes = [IsAuthenticated, ViewModelTrainingStatusPermission]
+
+    @extend_schema(responses={200: PortAnalysisJobSerializer})
+    def get(self, request, job_id):
+        job = PortAnalysisJob.objects.filter(pk=job_id, user=request.user).first()
+        if job is None:
+            return Response(
+                {'error': 'Job not found.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(PortAnalysisJobSerializer(job).data,
+                        status=status.HTTP_200_OK)
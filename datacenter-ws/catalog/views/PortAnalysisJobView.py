@@ -0,0 +1,92 @@
+"""
+PortAnalysisJobView – asynchronous full-image port detection.
+
+Submitting enqueues ``catalog.tasks.run_port_analysis`` (on the default
+Celery queue, or ``PORT_ANALYSIS_QUEUE`` when set); the client then polls
+PortAnalysisJobStatusView for stage progress and the result.
+"""
+import logging
+import threading
+
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from catalog.models import PortAnalysisJob
+from catalog.port_detection import result_cache
+from catalog.serializers import PortAnalysisJobSerializer
+
+from .PortAnalyzeView import PortAnalyzeView
+
+logger = logging.getLogger(__name__)
+
+
+class PortAnalysisJobView(PortAnalyzeView):
+    """
+    POST /asset/port-analyze/jobs
+
+    Body: { "image_path": "components/switch.jpg", "side": "front",
+            "ocr_names": false }
+
+    Returns 202 with the job (``id``, ``status``, ``stage``, ``progress``);
+    poll ``GET /asset/port-analyze/jobs/<id>`` until ``status`` is ``done``
+    (``result`` holds the same port list PortAnalyzeView returns) or
+    ``failed``.  A cached analysis is returned as an already finished job
+    with 200.
+
+    Validation, permissions and rate limit are those of PortAnalyzeView.
+    """
+
+    @extend_schema(
+        request=inline_serializer(
+            name='PortAnalysisJobRequest',
+            fields={
+                'image_path': serializers.CharField(),
+                'side': serializers.CharField(default='front'),
+                'ocr_names': serializers.BooleanField(default=False),
+            },
+        ),
+        responses={200: PortAnalysisJobSerializer,
+                   202: PortAnalysisJobSerializer},
+    )
+    def post(self, request):
+        abs_image_path, error = self._resolve_image(request)
+        if error is not None:
+            return error
+
+        job = PortAnalysisJob(
+            user=request.user,
+            image_path=request.data.get('image_path', ''),
+        )
+        variant = self._cache_variant(request)
+        cached = result_cache.get(abs_image_path, self._model_path(), variant)
+        if cached is not None:
+            job.status = PortAnalysisJob.Status.DONE
+            job.result = cached
+            job.save()
+            return Response(PortAnalysisJobSerializer(job).data,
+                            status=status.HTTP_200_OK)
+
+        job.save()
+        self._enqueue(str(job.pk), variant == 'ocr')
+        return Response(PortAnalysisJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _enqueue(job_id: str, ocr_names: bool) -> None:
+        from catalog.tasks import run_port_analysis
+        try:
+            run_port_analysis.delay(job_id, ocr_names)
+        except Exception:
+            # Celery unavailable → run in a background thread so the job
+            # still completes (same fallback as YOLO retraining).
+            logger.warning(
+                'Celery unavailable, falling back to threading for port analysis',
+                exc_info=True,
+            )
+            threading.Thread(
+                target=run_port_analysis,
+                args=(job_id, ocr_names),
+                daemon=True,
+                name='port-analysis-job',
+            ).start()
@@ -0,0 +1,199 @@
+"""
+PortAnalyzeStreamView – full-image port detection as server-sent events.
+
+Same pipeline as PortAnalyzeView, but each stage is sent as soon as it is
+ready instead of after the whole chain.  The view itself only validates the
+request; the events come from one generator, handed to the server in the
+form it streams: as is under WSGI (gunicorn / runserver – Django would
+buffer an async iterator into a list first), wrapped in an async generator
+under ASGI, where each step runs in a thread so the event loop is free
+while YOLO and OCR run (in that thread, or in the inference service).
+"""
+import json
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from drf_spectacular.utils import OpenApiResponse, extend_schema, inline_serializer
+from rest_framework import renderers, serializers
+
+from catalog.port_detection import (
+    apply_ocr_labels,
+    assign_names,
+    detect_with_opencv,
+    find_layout,
+    postprocess_yolo,
+)
+from catalog.port_detection import inference_service, result_cache
+from catalog.port_detection.inference_service import (
+    InferenceBusy,
+    InferenceTimeout,
+)
+from catalog.port_detection.model_cache import track_served
+
+from .PortAnalyzeView import PortAnalyzeView
+
+logger = logging.getLogger(__name__)
+
+
+def _event(name: str, data) -> bytes:
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    """Renders validation errors as a single ``error`` event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return _event('error', data)
+
+
+class PortAnalyzeStreamView(PortAnalyzeView):
+    """
+    POST /asset/port-analyze/stream
+
+    Body: as PortAnalyzeView.  Returns ``text/event-stream`` with, in order:
+
+    ``detections``
+        Raw YOLO boxes as soon as the model returns (before dedup; absent
+        when YOLO is unavailable and OpenCV is used).
+    ``ports``
+        Deduplicated detections with template names – the PortAnalyzeView
+        result without OCR.
+    ``names``
+        With ``"ocr_names": true``: the same ports renamed from the labels
+        printed on the panel.
+    ``done``
+        ``{"source": "detection" | "cache" | "layout"}``.  A cache hit or a
+        layout match sends a single ``ports`` event before it.
+
+    A busy or timed-out inference service ends the stream with an
+    ``error`` event (``{"error": ..., "status": 503 | 504}``).  Invalid
+    requests answer 400 / 403 / 404 before any event is sent.
+
+    Validation, permissions and rate limit are those of PortAnalyzeView.
+    """
+    renderer_classes = [renderers.JSONRenderer, EventStreamRenderer]
+
+    @extend_schema(
+        request=inline_serializer(
+            name='PortAnalyzeStreamRequest',
+            fields={
+                'image_path': serializers.CharField(),
+                'side': serializers.CharField(default='front'),
+                'ocr_names': serializers.BooleanField(default=False),
+            },
+        ),
+        responses={200: OpenApiResponse(description='text/event-stream')},
+    )
+    def post(self, request):
+        abs_image_path, error = self._resolve_image(request)
+        if error is not None:
+            return error
+
+        args = (abs_image_path, request.data.get('image_path', ''),
+                self._model_path(), self._cache_variant(request))
+        if isinstance(request._request, ASGIRequest):
+            events = self._async_events(*args)
+        else:
+            events = self._events(*args)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream until it ends.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _lookup(abs_image_path: str, image_name: str, model_path: str,
+                variant: str):
+        layout = find_layout(abs_image_path, image_name)
+        if layout is not None:
+            return 'layout', layout
+        cached = result_cache.get(abs_image_path, model_path, variant)
+        if cached is not None:
+            return 'cache', cached
+        return None, None
+
+    def _events(self, abs_image_path: str, image_name: str, model_path: str,
+                variant: str):
+        source, ports = self._lookup(abs_image_path, image_name, model_path,
+                                     variant)
+        if source is not None:
+            yield _event('ports', ports)
+            yield _event('done', {'source': source})
+            return
+        yield from self._detection_events(abs_image_path, model_path, variant)
+
+    async def _async_events(self, abs_image_path: str, image_name: str,
+                            model_path: str, variant: str):
+        source, ports = await sync_to_async(self._lookup)(
+            abs_image_path, image_name, model_path, variant)
+        if source is not None:
+            yield _event('ports', ports)
+            yield _event('done', {'source': source})
+            return
+
+        # Inference never touches the database: advance the generator off
+        # the main thread so concurrent streams do not serialise.
+        events = self._detection_events(abs_image_path, model_path, variant)
+        step = sync_to_async(next, thread_sensitive=False)
+        while (event := await step(events, None)) is not None:
+            yield event
+
+    @staticmethod
+    def _detection_events(abs_image_path: str, model_path: str, variant: str):
+        cacheable = True
+        raw = []
+        served = []
+        try:
+            if os.path.isfile(model_path):
+                with track_served() as served:
+                    raw = inference_service.submit(
+                        'detect_yolo_raw', abs_image_path, model_path)
+        except InferenceBusy:
+            yield _event('error', {'error': 'Port analysis is busy, retry shortly.',
+                                   'status': 503})
+            return
+        except InferenceTimeout:
+            yield _event('error', {'error': 'Port analysis timed out.',
+                                   'status': 504})
+            return
+        except Exception:
+            # Same policy as PortAnalyzeView: OpenCV fallback, not cached.
+            logger.warning('YOLO failed for %s, using OpenCV', abs_image_path,
+                           exc_info=True)
+            cacheable = False
+
+        if raw:
+            yield _event('detections', [
+                {k: v for k, v in det.items() if not k.startswith('_')}
+                for det in raw
+            ])
+            ports = postprocess_yolo(raw)
+        else:
+            try:
+                ports = detect_with_opencv(abs_image_path)
+            except Exception:
+                ports = []
+
+        named = assign_names(ports)
+        yield _event('ports', named)
+        if cacheable:
+            result_cache.store(abs_image_path, model_path, named, served=served)
+
+        if variant == 'ocr' and named:
+            try:
+                text_entry = inference_service.submit('image_text', abs_image_path)
+            except Exception:
+                logger.warning('OCR port naming failed for %s', abs_image_path,
+                               exc_info=True)
+            else:
+                apply_ocr_labels(named, text_entry)
+                yield _event('names', named)
+                if cacheable:
+                    result_cache.store(abs_image_path, model_path, named, variant,
+                                       served=served)
+        yield _event('done', {'source': 'detection'})
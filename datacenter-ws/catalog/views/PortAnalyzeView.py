@@ -4,6 +4,7 @@ PortAnalyzeView – batch full-image port detection.
 Delegates all detection logic to ``catalog.port_detection`` so this file
 contains only the DRF view wiring.
 """
+import logging
 import os
 
 from drf_spectacular.utils import extend_schema, inline_serializer
@@ -15,39 +16,133 @@ from rest_framework.views import APIView
 from accounts.permissions import ViewModelTrainingStatusPermission
 from accounts.throttles import PortAnalysisThrottle
 from catalog.port_detection import (
+    apply_ocr_labels,
     assign_names,
     can_access_private_media,
     detect_with_opencv,
-    detect_with_yolo,
+    find_layout,
     get_media_root,
     is_private_media_path,
     resolve_safe_path,
 )
+from catalog.port_detection import inference_service, result_cache, timing
+from catalog.port_detection.inference_service import (
+    InferenceBusy,
+    InferenceTimeout,
+)
+from catalog.port_detection.model_cache import track_served
+
+logger = logging.getLogger(__name__)
 
 
 class PortAnalyzeView(APIView):
     """
     POST /asset/port-analyze
 
-    Body: { "image_path": "components/switch.jpg", "side": "front" }
+    Body: { "image_path": "components/switch.jpg", "side": "front",
+            "ocr_names": false }
 
     Returns a list of detected ports:
     [{ "port_type": "RJ45", "pos_x": 12.5, "pos_y": 45.0,
        "name": "GigabitEthernet0/0", "confidence": 0.82 }, ...]
 
     Detection order: YOLO (if model available) then OpenCV fallback.
+    Ports get sequential template names; with ``"ocr_names": true`` one
+    whole-image OCR pass also reads the labels printed on the panel and
+    each port takes its nearest label (template name when none matches).
+    YOLO runs in the local inference service when one is configured; a full
+    queue answers 503 (with ``Retry-After``), a timed-out job 504.
+
+    Results are cached by image content + weights file (see
+    ``catalog.port_detection.result_cache``); a repeat analysis of the same
+    image with the same model is answered from the cache.  Images uploaded
+    through AssetModelViewSet are analysed ahead of time
+    (``catalog.preanalyze_ports``), so with a shared cache (Redis) their
+    first visit is a hit too; a retrain changes the key and the next visit re-analyses.
+
+    Before any of that, an image whose perceptual hash is within
+    ``PORT_LAYOUT_MATCH_DISTANCE`` bits of an already mapped model image
+    returns that model's port layout (``confidence`` 1.0, plus
+    ``matched_model``) without running detection (see
+    ``catalog.port_detection.panel_hash``).
+
+    Admins can add ``?debug_timing=1`` to get
+    ``{"ports": [...], "debug_timing": {"total_ms": …, "stages": {…}}}``
+    (see ``catalog.port_detection.timing``).
+
+    For analyses that may outlast the proxy timeout, submit the same body to
+    ``POST /asset/port-analyze/jobs`` instead (PortAnalysisJobView); to
+    show detections while naming and OCR still run, to
+    ``POST /asset/port-analyze/stream`` (PortAnalyzeStreamView, SSE).
 
     **Rate Limit**: 100 analyses per hour per user (prevents inference spam).
+    Cache hits are not counted.
     """
     permission_classes = [IsAuthenticated, ViewModelTrainingStatusPermission]
     throttle_classes = [PortAnalysisThrottle]
 
+    @staticmethod
+    def _model_path() -> str:
+        return os.path.join(get_media_root(), 'models', 'port-yolo.pt')
+
+    @staticmethod
+    def _cache_variant(request) -> str:
+        """Result-cache variant for the naming options of *request*."""
+        return 'ocr' if request.data.get('ocr_names') in (True, 'true', '1', 1) else ''
+
+    def is_cached_analysis(self, request) -> bool:
+        """
+        Throttle hook: True when this request will be answered without
+        detection – a cache hit or a layout match.
+        """
+        image_path = request.data.get('image_path', '')
+        abs_image_path = resolve_safe_path(image_path)
+        if abs_image_path is None or not os.path.isfile(abs_image_path):
+            return False
+        if is_private_media_path(image_path) and not can_access_private_media(request.user):
+            return False
+        if result_cache.get(abs_image_path, self._model_path(),
+                            self._cache_variant(request)) is not None:
+            return True
+        return find_layout(abs_image_path, image_path) is not None
+
+    @staticmethod
+    def _resolve_image(request):
+        """
+        Validate ``image_path`` from the request body.
+
+        Returns ``(abs_image_path, None)``, or ``(None, response)`` with the
+        400 / 403 / 404 error to send back.
+        """
+        image_path = request.data.get('image_path', '')
+
+        abs_image_path = resolve_safe_path(image_path)
+        if abs_image_path is None:
+            return None, Response(
+                {'error': 'Invalid image path.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if is_private_media_path(image_path) and not can_access_private_media(request.user):
+            return None, Response(
+                {'error': 'Not authorized to analyze private media.'},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if not os.path.isfile(abs_image_path):
+            return None, Response(
+                {'error': 'Image not found.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return abs_image_path, None
+
     @extend_schema(
         request=inline_serializer(
             name='PortAnalyzeRequest',
             fields={
                 'image_path': serializers.CharField(),
                 'side': serializers.CharField(default='front'),
+                'ocr_names': serializers.BooleanField(default=False),
             },
         ),
         responses={
@@ -64,44 +159,71 @@ class PortAnalyzeView(APIView):
             )
         },
     )
+    @timing.timed_view('analyze', list_key='ports')
     def post(self, request):
-        image_path = request.data.get('image_path', '')
-
-        abs_image_path = resolve_safe_path(image_path)
-        if abs_image_path is None:
-            return Response(
-                {'error': 'Invalid image path.'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        if is_private_media_path(image_path) and not can_access_private_media(request.user):
-            return Response(
-                {'error': 'Not authorized to analyze private media.'},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-
-        if not os.path.isfile(abs_image_path):
-            return Response(
-                {'error': 'Image not found.'},
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        model_path = os.path.join(get_media_root(), 'models', 'port-yolo.pt')
-
+        abs_image_path, error = self._resolve_image(request)
+        if error is not None:
+            return error
+
+        layout = find_layout(abs_image_path, request.data.get('image_path', ''))
+        if layout is not None:
+            return Response(layout, status=status.HTTP_200_OK)
+
+        model_path = self._model_path()
+        variant = self._cache_variant(request)
+        with timing.stage('cache'):
+            cached = result_cache.get(abs_image_path, model_path, variant)
+        if cached is not None:
+            return Response(cached, status=status.HTTP_200_OK)
+
+        cacheable = True
+        served = []
         try:
             if os.path.isfile(model_path):
-                ports = detect_with_yolo(abs_image_path, model_path)
+                with track_served() as served:
+                    ports = inference_service.submit(
+                        'detect_yolo', abs_image_path, model_path)
                 if not ports:
                     # YOLO returned nothing (model not yet trained or unrecognisable
                     # panel orientation): fall back to the OpenCV heuristic.
                     ports = detect_with_opencv(abs_image_path)
             else:
                 ports = detect_with_opencv(abs_image_path)
+        except InferenceBusy:
+            return Response(
+                {'error': 'Port analysis is busy, retry shortly.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'},
+            )
+        except InferenceTimeout:
+            return Response(
+                {'error': 'Port analysis timed out.'},
+                status=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
         except Exception:
-            # YOLO crash (missing dependency, corrupt model …): OpenCV fallback.
+            # YOLO crash (missing dependency, corrupt model, inference service
+            # down …): OpenCV fallback.  Not cached, so the next request
+            # retries YOLO once the fault is gone.
+            cacheable = False
             try:
                 ports = detect_with_opencv(abs_image_path)
             except Exception:
                 ports = []
 
-        return Response(assign_names(ports), status=status.HTTP_200_OK)
+        with timing.stage('naming'):
+            named = assign_names(ports)
+        if variant == 'ocr' and named:
+            try:
+                text_entry = inference_service.submit('image_text', abs_image_path)
+                with timing.stage('naming'):
+                    apply_ocr_labels(named, text_entry)
+            except Exception:
+                # OCR is best-effort (easyocr missing, service busy …): keep
+                # the template names, but do not cache them as OCR names.
+                logger.warning('OCR port naming failed for %s', abs_image_path,
+                               exc_info=True)
+                cacheable = False
+        if cacheable:
+            result_cache.store(abs_image_path, model_path, named, variant,
+                               served=served)
+        return Response(named, status=status.HTTP_200_OK)
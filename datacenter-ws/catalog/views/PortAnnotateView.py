@@ -1,8 +1,5 @@
-import hashlib
 import os
-import shutil
 
-import yaml
 from django.conf import settings
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import serializers, status
@@ -13,13 +10,20 @@ from rest_framework.views import APIView
 from accounts.permissions import PortTrainingPermission
 from accounts.throttles import PortTrainingThrottle
 from accounts.models import SecurityAuditLog
-from catalog.port_detection.security import get_media_root, resolve_safe_path
+from catalog.models import TrainingSample
+from catalog.port_detection.dataset import (
+    sample_count,
+    sample_key,
+    save_sample,
+    split_for,
+    training_dir,
+)
+from catalog.port_detection.security import resolve_safe_path
+from catalog.port_detection.training_state import write_data_yaml
 
 # ── Constants ──────────────────────────────────────────────────────────────────
-# Must stay in sync with CLASS_NAMES / PORT_CLASS_ID in train_port_detector.py.
+# Must stay in sync with PORT_CLASS_ID in train_port_detector.py.
 # class 0=RJ45, 1=SFP/SFP+/SFP28, 2=QSFP+/28/DD, 3=USB, 4=SERIAL, 5=LC
-_CLASS_NAMES = ['RJ45', 'SFP/SFP+', 'QSFP', 'USB', 'SERIAL', 'LC']
-
 _PORT_CLASS_ID = {
     'RJ45': 0, 'MGMT': 0,
     'SFP': 1, 'SFP+': 1, 'SFP28': 1,   # same cage
@@ -48,27 +52,6 @@ _PORT_BH = {
     'LC': 0.060, 'SC': 0.060, 'FC': 0.060,
 }
 
-# ── Training helpers ───────────────────────────────────────────────────────────
-
-def _write_data_yaml(training_dir: str) -> str:
-    data_yaml = os.path.join(training_dir, 'data.yaml')
-    train_img = os.path.join(training_dir, 'images', 'train')
-    val_img = os.path.join(training_dir, 'images', 'val')
-    # If there is no dedicated val split yet, fall back to using train images
-    # for validation so YOLO doesn't abort.
-    if not os.path.isdir(val_img) or not os.listdir(val_img):
-        val_img = train_img
-    content = {
-        'train': train_img,
-        'val':   val_img,
-        'nc':    len(_CLASS_NAMES),
-        'names': _CLASS_NAMES,
-    }
-    with open(data_yaml, 'w') as f:
-        yaml.dump(content, f, default_flow_style=False)
-    return data_yaml
-
-
 # ── View ───────────────────────────────────────────────────────────────────────
 
 class PortAnnotateView(APIView):
@@ -134,7 +117,6 @@ class PortAnnotateView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        media_root = get_media_root()
         if not os.path.isfile(abs_image_path):
             return Response(
                 {'error': 'Image not found.'},
@@ -144,53 +126,31 @@ class PortAnnotateView(APIView):
         if not isinstance(annotations, list) or not annotations:
             return Response({'saved': 0, 'total_images': 0})
 
-        # Prepare training directories with train/val split.
-        # The split is deterministic: ~20 % of images land in val based on hash.
-        training_dir = os.path.join(media_root, 'training')
-        images_dir = os.path.join(training_dir, 'images')
-        labels_dir = os.path.join(training_dir, 'labels')
-
-        # Derive a stable, collision-resistant filename from image_path + side
-        hash_key = hashlib.sha256(
-            f'{image_path}|{side}'.encode()
-        ).hexdigest()[:16]
-
-        # First hex char mod 5 == 0  →  val (~20 %);  otherwise  →  train
-        split = 'val' if int(hash_key[0], 16) % 5 == 0 else 'train'
-        images_split_dir = os.path.join(images_dir, split)
-        labels_split_dir = os.path.join(labels_dir, split)
-        os.makedirs(images_split_dir, exist_ok=True)
-        os.makedirs(labels_split_dir, exist_ok=True)
-
-        dest_image = os.path.join(images_split_dir, f'{hash_key}.jpg')
-        dest_label = os.path.join(labels_split_dir, f'{hash_key}.txt')
-
-        # Copy source image (once per image+side combination)
-        if not os.path.isfile(dest_image):
-            shutil.copy2(abs_image_path, dest_image)
+        # Derive a stable, collision-resistant filename from image_path + side.
+        # The split is deterministic (~20 % val) and kept by the manifest.
+        hash_key = sample_key(image_path, side)
+        split = split_for(hash_key)
 
         # Write YOLO format: class_id cx cy bw bh  (all 0–1 fractions)
-        with open(dest_label, 'w') as f:
-            for ann in annotations:
-                port_type = str(ann.get('port_type', 'RJ45'))
-                cls_id = _PORT_CLASS_ID.get(port_type, 0)
-                cx = float(ann.get('pos_x', 50)) / 100.0
-                cy = float(ann.get('pos_y', 50)) / 100.0
-                bw = _PORT_BW.get(port_type, 0.045)
-                bh = _PORT_BH.get(port_type, 0.055)
-                # Keep centre within valid bounds
-                cx = max(bw / 2, min(1.0 - bw / 2, cx))
-                cy = max(bh / 2, min(1.0 - bh / 2, cy))
-                f.write(f'{cls_id} {cx:.4f} {cy:.4f} {bw:.4f} {bh:.4f}\n')
-
-        _write_data_yaml(training_dir)
-
-        label_count = 0
-        for sub in ('train', 'val'):
-            sub_dir = os.path.join(labels_dir, sub)
-            if os.path.isdir(sub_dir):
-                label_count += sum(1 for fn in os.listdir(sub_dir)
-                                   if fn.endswith('.txt'))
+        label_lines = []
+        for ann in annotations:
+            port_type = str(ann.get('port_type', 'RJ45'))
+            cls_id = _PORT_CLASS_ID.get(port_type, 0)
+            cx = float(ann.get('pos_x', 50)) / 100.0
+            cy = float(ann.get('pos_y', 50)) / 100.0
+            bw = _PORT_BW.get(port_type, 0.045)
+            bh = _PORT_BH.get(port_type, 0.055)
+            # Keep centre within valid bounds
+            cx = max(bw / 2, min(1.0 - bw / 2, cx))
+            cy = max(bh / 2, min(1.0 - bh / 2, cy))
+            label_lines.append(f'{cls_id} {cx:.4f} {cy:.4f} {bw:.4f} {bh:.4f}\n')
+
+        # The source image is copied once per image+side combination.
+        save_sample(hash_key, split, abs_image_path, label_lines,
+                    source=TrainingSample.Source.ANNOTATION,
+                    image_name=image_path, side=side)
+        write_data_yaml(training_dir())
+        label_count = sample_count()
 
         # Log audit trail
         SecurityAuditLog.objects.create(
@@ -0,0 +1,157 @@
+"""
+PortBatchAnalyzeView – full-image port detection for many images at once.
+
+Runs all images through YOLO in real batches (one ``model.predict`` call per
+``PORT_BATCH_SIZE`` images) via ``catalog.port_detection``; this file only
+contains the DRF view wiring.
+"""
+import math
+import os
+
+from django.conf import settings
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.permissions import ViewModelTrainingStatusPermission
+from accounts.throttles import PortBatchAnalysisThrottle
+from catalog.port_detection import (
+    assign_names,
+    can_access_private_media,
+    detect_with_opencv,
+    get_media_root,
+    is_private_media_path,
+    resolve_safe_path,
+)
+from catalog.port_detection import inference_service, timing
+from catalog.port_detection.inference_service import (
+    InferenceBusy,
+    InferenceTimeout,
+)
+
+
+class PortBatchAnalyzeView(APIView):
+    """
+    POST /asset/port-analyze/batch
+
+    Body: { "image_paths": ["components/a-front.jpg", "components/a-rear.jpg"] }
+
+    Returns one entry per requested image, in request order:
+    [{ "image_path": "components/a-front.jpg",
+       "ports": [{ "port_type": "RJ45", "pos_x": 12.5, "pos_y": 45.0,
+                   "name": "GigabitEthernet0/0", "confidence": 0.82 }, ...] },
+     { "image_path": "components/missing.jpg", "error": "Image not found." }]
+
+    Per-image problems (invalid path, missing file, private media) are
+    reported inline instead of failing the whole batch.  Detection order
+    per image matches PortAnalyzeView: YOLO, then OpenCV fallback.
+
+    Admins can add ``?debug_timing=1`` to get
+    ``{"results": [...], "debug_timing": {...}}`` with stage timings summed
+    over the batch.
+
+    **Rate Limit**: 20 batches per hour per user, at most
+    ``PORT_BATCH_MAX_IMAGES`` images each.
+    """
+    permission_classes = [IsAuthenticated, ViewModelTrainingStatusPermission]
+    throttle_classes = [PortBatchAnalysisThrottle]
+
+    @extend_schema(
+        request=inline_serializer(
+            name='PortBatchAnalyzeRequest',
+            fields={
+                'image_paths': serializers.ListField(
+                    child=serializers.CharField()),
+            },
+        ),
+        responses={
+            200: inline_serializer(
+                name='PortBatchAnalyzeResult',
+                fields={
+                    'image_path': serializers.CharField(),
+                    'ports': serializers.ListField(
+                        child=serializers.DictField(), required=False),
+                    'error': serializers.CharField(required=False),
+                },
+                many=True,
+            )
+        },
+    )
+    @timing.timed_view('batch', list_key='results')
+    def post(self, request):
+        image_paths = request.data.get('image_paths')
+        max_images = int(getattr(settings, 'PORT_BATCH_MAX_IMAGES', 32))
+
+        if (
+            not isinstance(image_paths, list)
+            or not image_paths
+            or not all(isinstance(p, str) for p in image_paths)
+        ):
+            return Response(
+                {'error': 'image_paths must be a non-empty list of paths.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(image_paths) > max_images:
+            return Response(
+                {'error': f'At most {max_images} images per batch.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        entries = []
+        valid: list = []   # (entry, abs_path)
+        for image_path in image_paths:
+            entry = {'image_path': image_path}
+            entries.append(entry)
+            abs_path = resolve_safe_path(image_path)
+            if abs_path is None:
+                entry['error'] = 'Invalid image path.'
+            elif is_private_media_path(image_path) and not can_access_private_media(request.user):
+                entry['error'] = 'Not authorized to analyze private media.'
+            elif not os.path.isfile(abs_path):
+                entry['error'] = 'Image not found.'
+            else:
+                valid.append((entry, abs_path))
+
+        if not valid:
+            return Response(entries, status=status.HTTP_200_OK)
+
+        abs_paths = [abs_path for _, abs_path in valid]
+        model_path = os.path.join(get_media_root(), 'models', 'port-yolo.pt')
+
+        # One PORT_INFERENCE_TIMEOUT budget per model.predict batch.
+        batch_size = max(1, int(getattr(settings, 'PORT_BATCH_SIZE', 8)))
+        timeout = float(getattr(settings, 'PORT_INFERENCE_TIMEOUT', 30)) * math.ceil(
+            len(abs_paths) / batch_size)
+
+        yolo_results = [[] for _ in abs_paths]
+        if os.path.isfile(model_path):
+            try:
+                yolo_results = inference_service.submit(
+                    'detect_yolo_batch', abs_paths, model_path, timeout=timeout)
+            except InferenceBusy:
+                return Response(
+                    {'error': 'Port analysis is busy, retry shortly.'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={'Retry-After': '30'},
+                )
+            except InferenceTimeout:
+                return Response(
+                    {'error': 'Port analysis timed out.'},
+                    status=status.HTTP_504_GATEWAY_TIMEOUT,
+                )
+            except Exception:
+                # YOLO crash: every image goes through the OpenCV fallback.
+                pass
+
+        for (entry, abs_path), ports in zip(valid, yolo_results):
+            if not ports:
+                try:
+                    ports = detect_with_opencv(abs_path)
+                except Exception:
+                    ports = []
+            with timing.stage('naming'):
+                entry['ports'] = assign_names(ports)
+
+        return Response(entries, status=status.HTTP_200_OK)
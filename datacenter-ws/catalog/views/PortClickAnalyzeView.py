@@ -3,6 +3,7 @@ PortClickAnalyzeView – single-click port detection.
 
 Delegates all detection and OCR logic to ``catalog.port_detection``.
 """
+import logging
 import os
 
 from drf_spectacular.utils import extend_schema, inline_serializer
@@ -17,18 +18,48 @@ from catalog.port_detection.click_detector import (
     detect_with_opencv as click_detect_opencv,
     detect_with_yolo as click_detect_yolo,
 )
-from catalog.port_detection.ocr import read_label_ocr
+from catalog.port_detection import inference_service, timing
+from catalog.port_detection.image_cache import load_image
+from catalog.port_detection.inference_service import (
+    InferenceBusy,
+    InferenceServiceError,
+    InferenceTimeout,
+)
 from catalog.port_detection.security import (
     can_access_private_media,
     is_private_media_path,
     resolve_safe_path,
 )
 
+logger = logging.getLogger(__name__)
+
+
+def _submit_or_default(default, job: str, *args):
+    """
+    Run *job* through the inference service, degrading to *default* when the
+    service fails (unreachable, job crashed) – the same outcome the detectors
+    produce for an in-process failure.  Busy / timeout still propagate so the
+    caller can apply back-pressure.
+    """
+    try:
+        return inference_service.submit(job, *args)
+    except (InferenceBusy, InferenceTimeout):
+        raise
+    except InferenceServiceError:
+        logger.warning('Inference job %s failed', job, exc_info=True)
+        return default
+
 
 class PortClickAnalyzeView(APIView):
     """
     Single-click port detection endpoint.
 
+    YOLO and OCR run in the local inference service when one is configured;
+    a full queue answers 503 (with ``Retry-After``), a timed-out job 504.
+
+    Admins can add ``?debug_timing=1`` to get a ``debug_timing`` field with
+    per-stage timings.
+
     **Rate Limit**: 200 clicks per hour per user (allows interactive exploration).
     """
     permission_classes = [IsAuthenticated, ViewModelTrainingStatusPermission]
@@ -56,6 +87,7 @@ class PortClickAnalyzeView(APIView):
             )
         },
     )
+    @timing.timed_view('click')
     def post(self, request):
         image_path = (request.data.get('image_path') or '').strip()
         click_x = request.data.get('click_x')
@@ -95,8 +127,7 @@ class PortClickAnalyzeView(APIView):
             )
 
         try:
-            import cv2
-            img = cv2.imread(abs_path)
+            img = load_image(abs_path)
             if img is None:
                 return Response(
                     {'error': 'Impossibile leggere l\'immagine'},
@@ -108,17 +139,35 @@ class PortClickAnalyzeView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        # ── 1. Port type detection ────────────────────────────────────────
-        port_type, confidence = click_detect_yolo(img, click_x, click_y)
-        if port_type is None or confidence < 0.20:
-            cv_type, cv_conf = click_detect_opencv(img, click_x, click_y)
-            # Prefer OpenCV result when it scored higher than low-confidence YOLO.
-            if port_type is None or cv_conf > confidence:
-                port_type = cv_type
-                confidence = cv_conf
-
-        # ── 2. Label via OCR ─────────────────────────────────────────────
-        label = read_label_ocr(abs_path, click_x, click_y)
+        try:
+            # ── 1. Port type detection ────────────────────────────────────
+            if inference_service.is_enabled():
+                port_type, confidence = _submit_or_default(
+                    (None, 0.0), 'click_yolo', abs_path, click_x, click_y)
+            else:
+                port_type, confidence = click_detect_yolo(
+                    img, click_x, click_y, image_path=abs_path)
+            if port_type is None or confidence < 0.20:
+                cv_type, cv_conf = click_detect_opencv(img, click_x, click_y)
+                # Prefer OpenCV result when it scored higher than low-confidence YOLO.
+                if port_type is None or cv_conf > confidence:
+                    port_type = cv_type
+                    confidence = cv_conf
+
+            # ── 2. Label via OCR ─────────────────────────────────────────
+            label = _submit_or_default(
+                None, 'read_label', abs_path, click_x, click_y)
+        except InferenceBusy:
+            return Response(
+                {'error': 'Analisi porte occupata, riprova tra poco'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'},
+            )
+        except InferenceTimeout:
+            return Response(
+                {'error': 'Analisi porte scaduta'},
+                status=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
 
         return Response(
             {
@@ -4,13 +4,12 @@ PortCorrectionView – manual correction ingestion and smart retraining trigger.
 Delegates state management and training helpers to
 ``catalog.port_detection.training_state``.
 """
-import hashlib
 import logging
 import os
-import shutil
 import threading
 
 from django.conf import settings
+from django.db import transaction
 from drf_spectacular.utils import extend_schema, inline_serializer
 from rest_framework import serializers, status
 from rest_framework.permissions import IsAuthenticated
@@ -20,14 +19,21 @@ from rest_framework.views import APIView
 from accounts.models import SecurityAuditLog
 from accounts.permissions import PortCorrectionPermission
 from accounts.throttles import PortCorrectionThrottle
+from catalog.models import TrainingSample
 from catalog.port_detection.constants import PORT_CLASS_ID, PORT_BW, PORT_BH
+from catalog.port_detection.dataset import (
+    lock_sample,
+    read_label,
+    sample_key,
+    save_sample,
+    split_for,
+    training_dir,
+)
 from catalog.port_detection.security import get_media_root, resolve_safe_path
 from catalog.port_detection.training_state import (
-    _state_lock,
-    load_state,
-    minutes_since_last_train,
+    choose_mode,
+    record_correction,
     run_background_train,
-    save_state,
     write_data_yaml,
 )
 
@@ -45,7 +51,9 @@ class PortCorrectionView(APIView):
     Receives a manual correction (predicted_type → actual_type) and:
     1. Saves the training sample with the correct type.
     2. Increments the correction counter.
-    3. Triggers background retraining when thresholds are met.
+    3. Triggers background retraining when thresholds are met: a short
+       fine-tune of the current weights for small correction deltas, a full
+       retrain for large ones (``training_mode``).
 
     **Permission**: Requires ``can_provide_port_corrections`` role permission.
     **Audit**: All corrections logged to SecurityAuditLog.
@@ -74,6 +82,7 @@ class PortCorrectionView(APIView):
                     'predicted_type': serializers.CharField(),
                     'actual_type': serializers.CharField(),
                     'training_triggered': serializers.BooleanField(),
+                    'training_mode': serializers.CharField(allow_null=True),
                     'corrections_since_last_train': serializers.IntegerField(),
                     'total_corrections': serializers.IntegerField(),
                 },
@@ -123,20 +132,8 @@ class PortCorrectionView(APIView):
             )
 
         # ── 1. Save training sample with the corrected type ───────────────
-        training_dir = os.path.join(media_root, 'training')
-        hash_key = hashlib.sha256(f'{image_path}|{side}'.encode()).hexdigest()[:16]
-        split = 'val' if int(hash_key[0], 16) % 5 == 0 else 'train'
-
-        images_dir = os.path.join(training_dir, 'images', split)
-        labels_dir = os.path.join(training_dir, 'labels', split)
-        os.makedirs(images_dir, exist_ok=True)
-        os.makedirs(labels_dir, exist_ok=True)
-
-        dest_image = os.path.join(images_dir, f'{hash_key}.jpg')
-        dest_label = os.path.join(labels_dir, f'{hash_key}.txt')
-
-        if not os.path.isfile(dest_image):
-            shutil.copy2(abs_image_path, dest_image)
+        hash_key = sample_key(image_path, side)
+        split = split_for(hash_key)
 
         cx = max(0.0, min(1.0, pos_x / 100.0))
         cy = max(0.0, min(1.0, pos_y / 100.0))
@@ -146,58 +143,50 @@ class PortCorrectionView(APIView):
         cy = max(bh / 2, min(1.0 - bh / 2, cy))
         new_line = f'{cls_id} {cx:.4f} {cy:.4f} {bw:.4f} {bh:.4f}\n'
 
-        existing_lines = []
-        if os.path.isfile(dest_label):
-            with open(dest_label) as f:
-                existing_lines = f.readlines()
-
-        # Replace the label line whose centre is closest to the corrected position.
-        best_idx = None
-        best_dist = float('inf')
-        for i, line in enumerate(existing_lines):
-            parts = line.strip().split()
-            if len(parts) == 5:
-                ecx, ecy = float(parts[1]), float(parts[2])
-                dist = ((ecx - cx) ** 2 + (ecy - cy) ** 2) ** 0.5
-                if dist < best_dist:
-                    best_dist = dist
-                    best_idx = i
-
-        PROXIMITY_THRESH = 0.05  # 5 % of image
-        if best_idx is not None and best_dist < PROXIMITY_THRESH:
-            existing_lines[best_idx] = new_line
-        else:
-            existing_lines.append(new_line)
-
-        with open(dest_label, 'w') as f:
-            f.writelines(existing_lines)
-
-        data_yaml = write_data_yaml(training_dir)
+        # Under the sample's row lock: concurrent corrections of the same
+        # image would otherwise each rewrite the label and drop a line.
+        with transaction.atomic():
+            lock_sample(hash_key, split, TrainingSample.Source.CORRECTION)
+            existing_lines = read_label(hash_key, split)
+
+            # Replace the label line whose centre is closest to the corrected position.
+            best_idx = None
+            best_dist = float('inf')
+            for i, line in enumerate(existing_lines):
+                parts = line.strip().split()
+                if len(parts) == 5:
+                    ecx, ecy = float(parts[1]), float(parts[2])
+                    dist = ((ecx - cx) ** 2 + (ecy - cy) ** 2) ** 0.5
+                    if dist < best_dist:
+                        best_dist = dist
+                        best_idx = i
+
+            PROXIMITY_THRESH = 0.05  # 5 % of image
+            if best_idx is not None and best_dist < PROXIMITY_THRESH:
+                existing_lines[best_idx] = new_line
+            else:
+                existing_lines.append(new_line)
+
+            save_sample(hash_key, split, abs_image_path, existing_lines,
+                        source=TrainingSample.Source.CORRECTION,
+                        image_name=image_path, side=side)
+
+        data_yaml = write_data_yaml(training_dir())
         models_dir = os.path.join(media_root, 'models')
         os.makedirs(models_dir, exist_ok=True)
 
-        # ── 2. Update correction counter ──────────────────────────────────
-        should_train = False
-        with _state_lock:
-            state = load_state()
-            state['corrections_since_last_train'] = state.get('corrections_since_last_train', 0) + 1
-            state['total_corrections'] = state.get('total_corrections', 0) + 1
-
-            # ── 3. Evaluate retraining conditions ─────────────────────────
-            enough_corrections = state['corrections_since_last_train'] >= MIN_CORRECTIONS
-            enough_time = minutes_since_last_train(state) >= MIN_INTERVAL_MIN
-            not_training = not state.get('is_training', False)
-
-            if enough_corrections and enough_time and not_training:
-                state['is_training'] = True
-                should_train = True
-
-            save_state(state)
+        # ── 2–3. Count the correction, take the training lease if due ─────
+        state, lease_token = record_correction(MIN_CORRECTIONS, MIN_INTERVAL_MIN)
+        should_train = lease_token is not None
+        training_mode = (choose_mode(state.corrections_at_lease, models_dir,
+                                     state.last_runs)
+                         if should_train else None)
 
         if should_train:
             try:
                 from catalog.tasks import retrain_yolo
-                retrain_yolo.delay(data_yaml, models_dir)
+                retrain_yolo.delay(data_yaml, models_dir, str(lease_token),
+                                   training_mode)
             except Exception:
                 # Celery unavailable → fall back to background thread so
                 # corrections are never silently dropped.
@@ -207,14 +196,11 @@ class PortCorrectionView(APIView):
                 )
                 threading.Thread(
                     target=run_background_train,
-                    args=(data_yaml, models_dir),
+                    args=(data_yaml, models_dir, lease_token, training_mode),
                     daemon=False,
                     name='yolo-retrain',
                 ).start()
 
-        with _state_lock:
-            state = load_state()
-
         SecurityAuditLog.objects.create(
             user=request.user,
             action=SecurityAuditLog.Action.PORT_CORRECTION,
@@ -226,6 +212,7 @@ class PortCorrectionView(APIView):
                 'position': {'x': pos_x, 'y': pos_y},
                 'side': side,
                 'training_triggered': should_train,
+                'training_mode': training_mode,
             },
             ip_address=self._get_client_ip(request),
         )
@@ -236,8 +223,9 @@ class PortCorrectionView(APIView):
                 'predicted_type': predicted_type,
                 'actual_type': actual_type,
                 'training_triggered': should_train,
-                'corrections_since_last_train': state.get('corrections_since_last_train', 0),
-                'total_corrections': state.get('total_corrections', 0),
+                'training_mode': training_mode,
+                'corrections_since_last_train': state.corrections_since_last_train,
+                'total_corrections': state.total_corrections,
             },
             status=status.HTTP_200_OK,
         )
@@ -0,0 +1,49 @@
+"""
+PortDetectionReadyView – load-balancer readiness probe for port detection.
+"""
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers, status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from catalog.port_detection import image_cache, warmup
+
+
+class PortDetectionReadyView(APIView):
+    """
+    GET /asset/port-analyze/ready
+
+    Returns ``{"ready": true, "status": "ready", "seconds": 11.4}`` with 200
+    once this worker has preloaded YOLO and the OCR reader (``PORT_WARMUP``),
+    and 503 with ``"status": "warming"`` until then.  Always ready when
+    warm-up is disabled.  ``image_cache`` carries this worker's decoded /
+    enhanced image cache counters.
+
+    Unauthenticated and unthrottled so load balancers can poll it.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = []
+
+    @extend_schema(
+        responses={
+            200: inline_serializer(
+                name='PortDetectionReadiness',
+                fields={
+                    'ready': serializers.BooleanField(),
+                    'status': serializers.CharField(),
+                    'seconds': serializers.FloatField(allow_null=True),
+                    'image_cache': serializers.DictField(),
+                },
+            )
+        },
+    )
+    def get(self, request):
+        snapshot = warmup.status()
+        snapshot['image_cache'] = image_cache.stats()
+        return Response(
+            snapshot,
+            status=(status.HTTP_200_OK if snapshot['ready']
+                    else status.HTTP_503_SERVICE_UNAVAILABLE),
+        )
@@ -0,0 +1,55 @@
+"""
+PortTrainingStatusView – correction counters and recent training runs.
+"""
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.permissions import ViewModelTrainingStatusPermission
+from catalog.port_detection.training_state import get_state
+
+
+class PortTrainingStatusView(APIView):
+    """
+    GET /asset/port-training/status
+
+    Returns the shared training state::
+
+        { "corrections_since_last_train": 4, "total_corrections": 112,
+          "is_training": false, "last_training_at": "...",
+          "last_runs": { "full": {...}, "finetune": {...} } }
+
+    ``last_runs`` holds the last report of each training mode (``mode``,
+    ``finished_at``, ``wall_s``, ``epochs``, ``map50``, ``map50_95``,
+    ``weights``) so fine-tune and full retrains can be compared.
+    """
+    permission_classes = [IsAuthenticated, ViewModelTrainingStatusPermission]
+
+    @extend_schema(
+        responses={
+            200: inline_serializer(
+                name='PortTrainingStatus',
+                fields={
+                    'corrections_since_last_train': serializers.IntegerField(),
+                    'total_corrections': serializers.IntegerField(),
+                    'is_training': serializers.BooleanField(),
+                    'last_training_at': serializers.DateTimeField(allow_null=True),
+                    'last_runs': serializers.DictField(),
+                },
+            )
+        },
+    )
+    def get(self, request):
+        state = get_state()
+        return Response(
+            {
+                'corrections_since_last_train': state.corrections_since_last_train,
+                'total_corrections': state.total_corrections,
+                'is_training': state.is_training,
+                'last_training_at': state.last_training_at,
+                'last_runs': state.last_runs,
+            },
+            status=status.HTTP_200_OK,
+        )
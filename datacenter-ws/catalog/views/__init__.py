@@ -6,6 +6,12 @@ from .AssetModelImportView import AssetModelImportView
 from .CatalogExportView import CatalogExportView
 from .CatalogImportView import CatalogImportView
 from .PortAnalyzeView import PortAnalyzeView
+from .PortAnalyzeStreamView import PortAnalyzeStreamView
+from .PortAnalysisJobView import PortAnalysisJobView
+from .PortAnalysisJobStatusView import PortAnalysisJobStatusView
 from .PortAnnotateView import PortAnnotateView
+from .PortBatchAnalyzeView import PortBatchAnalyzeView
 from .PortClickAnalyzeView import PortClickAnalyzeView
+from .PortDetectionReadyView import PortDetectionReadyView
 from .PortCorrectionView import PortCorrectionView
+from .PortTrainingStatusView import PortTrainingStatusView
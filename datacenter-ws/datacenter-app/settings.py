@@ -138,12 +138,25 @@ def _redis_url(db: int) -> str:
     return f'redis://{auth}{REDIS_HOST}:{REDIS_PORT}/{db}'
 
 
+PORT_ANALYSIS_CACHE_TTL = config(
+    'PORT_ANALYSIS_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+PORT_ANALYSIS_CACHE_MAX_ENTRIES = config(
+    'PORT_ANALYSIS_CACHE_MAX_ENTRIES', default=1000, cast=int)
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'datacenter-local-cache',
         'TIMEOUT': 300,
-    }
+    },
+    # Port analysis results (catalog.port_detection.result_cache).  Keys carry
+    # the image and weights hashes, so a retrain invalidates entries implicitly.
+    'port_analysis': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'datacenter-port-analysis',
+        'TIMEOUT': PORT_ANALYSIS_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': PORT_ANALYSIS_CACHE_MAX_ENTRIES},
+    },
 }
 
 if USE_REDIS_CACHE:
@@ -163,7 +176,14 @@ if USE_REDIS_CACHE:
             },
             'KEY_PREFIX': 'datacenter',
             'TIMEOUT': 300,  # 5-minute default cache TTL
-        }
+        },
+        # LRU eviction is Redis' job: run it with maxmemory-policy allkeys-lru.
+        'port_analysis': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _redis_url(REDIS_DB),
+            'KEY_PREFIX': 'datacenter-port-analysis',
+            'TIMEOUT': PORT_ANALYSIS_CACHE_TTL,
+        },
     }
 
 
@@ -251,6 +271,7 @@ REST_FRAMEWORK = {
         'port_training': '10/hour',              # Annotation submissions
         'port_correction': '30/hour',            # Correction submissions
         'port_analysis': '100/hour',             # Full-image analyses
+        'port_batch_analysis': '20/hour',        # Multi-image analyses
         'port_click_analysis': '200/hour',       # Click-based analyses
         'model_training_status': '1000/hour',    # Status polling
         'anon_port_training': '0/hour',          # Block anonymous
@@ -398,7 +419,7 @@ CELERY_BROKER_URL = config('CELERY_BROKER_URL', default=_redis_url(2))
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TIMEZONE = 'UTC'
-# Tasks are fire-and-forget; state is tracked in training_state.json
+# Tasks are fire-and-forget; state is tracked in the database (TrainingState)
 CELERY_TASK_IGNORE_RESULT = True
 # Prevent tasks accumulating if the worker is down for a long time
 CELERY_TASK_SOFT_TIME_LIMIT = 3600   # 1 hour soft limit (signals SIGTERM)
@@ -408,6 +429,81 @@ CELERY_TASK_TIME_LIMIT = 3900        # 1 h 5 min hard limit (signals SIGKILL)
 # 'spawn' is already set in celery_app.py; this key enforces it for all pool types.
 CELERY_WORKER_POOL = 'prefork'
 CELERY_WORKER_POOL_RESTARTS = True
+# Port analysis jobs (and upload pre-analysis) can get their own queue so a
+# training run cannot starve them.  Opt in only together with a consumer:
+#   PORT_ANALYSIS_QUEUE=port_analysis
+#   celery -A datacenter-app worker -Q port_analysis -c 1 -l info
+# Left empty, they go to the default queue that a plain worker consumes –
+# routed to a queue nobody reads, a job would stay 'queued' forever.
+PORT_ANALYSIS_QUEUE = config('PORT_ANALYSIS_QUEUE', default='')
+CELERY_TASK_ROUTES = {
+    task: {'queue': PORT_ANALYSIS_QUEUE}
+    for task in ('catalog.run_port_analysis', 'catalog.preanalyze_ports')
+} if PORT_ANALYSIS_QUEUE else {}
+
+# ── Port detection ────────────────────────────────────────────────────────────
+# Local inference service (manage.py serve_port_inference).  When the socket is
+# empty, YOLO/OCR run inline in the web worker.  Accepts a Unix socket path or
+# host:port.  Jobs beyond WORKERS + QUEUE_SIZE are rejected with 503.
+PORT_INFERENCE_SOCKET = config('PORT_INFERENCE_SOCKET', default='')
+PORT_INFERENCE_WORKERS = config('PORT_INFERENCE_WORKERS', default=1, cast=int)
+PORT_INFERENCE_QUEUE_SIZE = config(
+    'PORT_INFERENCE_QUEUE_SIZE', default=4, cast=int)
+PORT_INFERENCE_TIMEOUT = config('PORT_INFERENCE_TIMEOUT', default=30, cast=int)
+# Preload YOLO + OCR and run a dummy inference at web worker start-up (WSGI /
+# ASGI / runserver only, not management commands or Celery); until it
+# finishes, GET asset/port-analyze/ready answers 503 (load-balancer probe).
+PORT_WARMUP = config('PORT_WARMUP', default=False, cast=bool)
+# Inference backend for port-yolo.pt: 'torch', 'onnx' (needs onnx +
+# onnxruntime) or 'openvino' (needs openvino), see requirements-inference.txt.
+# The artefact is exported after every training run; until it exists the .pt
+# is served.
+PORT_YOLO_BACKEND = config('PORT_YOLO_BACKEND', default='torch')
+# Seconds between checks for retrained weights; new weights load in the
+# background and are swapped in without blocking requests.
+PORT_MODEL_WATCH_INTERVAL = config(
+    'PORT_MODEL_WATCH_INTERVAL', default=5, cast=int)
+# Batched analysis (POST asset/port-analyze/batch): images per request and
+# images per model.predict call.
+PORT_BATCH_MAX_IMAGES = config('PORT_BATCH_MAX_IMAGES', default=32, cast=int)
+PORT_BATCH_SIZE = config('PORT_BATCH_SIZE', default=8, cast=int)
+# Tiled inference for elongated panels (aspect ≥ 2): overlapping tiles at
+# PORT_TILE_IMGSZ, batched in one predict call, merged with global NMS.
+PORT_TILED_INFERENCE = config('PORT_TILED_INFERENCE', default=False, cast=bool)
+PORT_TILE_IMGSZ = config('PORT_TILE_IMGSZ', default=640, cast=int)
+PORT_TILE_OVERLAP = config('PORT_TILE_OVERLAP', default=0.20, cast=float)
+# A retrain holds the TrainingState lease for this long past its last
+# finished epoch (it is renewed every epoch), so a worker that dies
+# mid-training cannot block retraining; keep it above the longest epoch.
+PORT_TRAINING_LEASE_MIN = config('PORT_TRAINING_LEASE_MIN', default=90, cast=int)
+# Correction-triggered retrains fine-tune the current weights (few epochs,
+# low learning rate) until this many corrections accumulate; then, or with
+# no weights yet, they train from scratch.
+PORT_FULL_RETRAIN_CORRECTIONS = config('PORT_FULL_RETRAIN_CORRECTIONS', default=100, cast=int)
+# A full run is also forced after this many fine-tunes in a row, or when the
+# last full run is older than this many days (0 disables either rule).
+PORT_MAX_CONSECUTIVE_FINETUNES = config('PORT_MAX_CONSECUTIVE_FINETUNES', default=10, cast=int)
+PORT_FULL_RETRAIN_MAX_AGE_DAYS = config('PORT_FULL_RETRAIN_MAX_AGE_DAYS', default=30, cast=int)
+PORT_FINETUNE_EPOCHS = config('PORT_FINETUNE_EPOCHS', default=15, cast=int)
+PORT_FINETUNE_LR0 = config('PORT_FINETUNE_LR0', default=0.001, cast=float)
+# Enqueue catalog.preanalyze_ports when AssetModel front/rear images are
+# uploaded, so the port mapper opens with cached suggestions.  The suggestions
+# need USE_REDIS_CACHE: with the per-process LocMemCache the task only indexes
+# the panel hash (layout matching) and logs a warning.
+PORT_PREANALYZE_UPLOADS = config('PORT_PREANALYZE_UPLOADS', default=True, cast=bool)
+# Max Hamming distance (bits of a 64-bit dHash) at which an analysed image
+# reuses the port layout of an already mapped model image; -1 disables.
+PORT_LAYOUT_MATCH_DISTANCE = config('PORT_LAYOUT_MATCH_DISTANCE', default=6, cast=int)
+# Per-process LRU of decoded / enhanced photos shared by the click, OCR and
+# batch paths (catalog.port_detection.image_cache), bounded by array size.
+PORT_IMAGE_CACHE_MB = config('PORT_IMAGE_CACHE_MB', default=256, cast=int)
+# OCR each panel once (three strategies over the whole image, cached by
+# content) and answer clicks by looking up the nearest text box, instead of
+# OCR-ing a crop three times on every click.
+PORT_OCR_WHOLE_IMAGE = config('PORT_OCR_WHOLE_IMAGE', default=False, cast=bool)
+# Every analysis logs one 'port_timing' line with per-stage milliseconds; set a
+# dotted path to a callable(record) to also forward it to a metrics backend.
+PORT_TIMING_SINK = config('PORT_TIMING_SINK', default='')
 
 # AUTH_USER_MODEL = "accounts.CustomUser"
 
@@ -12,5 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'datacenter-app.settings')
+# Lets catalog start the port-detection warm-up (PORT_WARMUP) in server
+# processes only, not in management commands or Celery workers.
+os.environ['PORT_DETECTION_SERVER'] = '1'
 
 application = get_wsgi_application()